@@ -1,4 +1,4 @@
-import React, {useState} from "react";
+import React, {useEffect, useState} from "react";
 import {Button, Dialog, DialogActions, DialogContent, DialogContentText, DialogTitle} from "@material-ui/core";
 import {P, PercentBar} from "./index";
 
@@ -21,7 +21,25 @@ export default function BusyDialog(props) {
     // i don't really understand why these lines are needed (but they are)
     if (! open && (busy !== null && busy.percent < 100)) setOpen(true);
     if (okDisabled && busy !== null && busy.percent === 100) setOkDisabled(false);
-    if (open && busy !== null && busy.percent !== 100) setTimeout(reload, 1000);
+
+    // the server replies when the percent changes (long poll) so we only reload the page when complete
+    const percent = busy === null ? null : busy.percent;
+    useEffect(() => {
+        if (open && percent !== null && percent !== 100) {
+            fetch('/api/busy?percent=' + percent)
+                .then(response => response.json())
+                .then(json => {
+                    if (json.busy.percent === 100) {
+                        reload();
+                    } else if (json.busy.percent === percent) {
+                        setTimeout(reload, 1000);  // server does not support long poll
+                    } else {
+                        setBusy(json.busy);
+                    }
+                })
+                .catch(() => setTimeout(reload, 1000));
+        }
+    }, [open, busy]);
 
     return (<Dialog open={open}>
         <DialogTitle>Busy</DialogTitle>
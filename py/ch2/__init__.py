@@ -1,5 +1,6 @@
+from collections.abc import Mapping
+from importlib import import_module
 from logging import getLogger, NullHandler
-
 from sys import version_info
 
 getLogger('bokeh').addHandler(NullHandler())
@@ -18,30 +19,10 @@ class FatalException(Exception):
 
 from .commands.args import COMMAND, make_parser, NamespaceWithVariables, PROGNAME, HELP, DEV, DIARY, FIT, \
     PACKAGE_FIT_PROFILE, ACTIVITIES, NO_OP, DATABASE, CONSTANTS, CALCULATE, SHOW_SCHEDULE, MONITOR, GARMIN, \
-    UNLOCK, DUMP, FIX_FIT, CH2_VERSION, JUPYTER, KIT, WEB, READ, IMPORT, THUMBNAIL, CHECK, SEARCH, VALIDATE, BASE
+    UNLOCK, DUMP, FIX_FIT, CH2_VERSION, JUPYTER, KIT, WEB, READ, IMPORT, THUMBNAIL, CHECK, SEARCH, VALIDATE, BASE, \
+    METRICS, BENCHMARK, MAINTAIN
 from .global_ import set_global_dev, set_global_data, set_global_state
-from .commands.constants import constants
-from .commands.validate import validate
-from .commands.database import database
-from .commands.fit import fit
-from .commands.fix_fit import fix_fit
-from .commands.garmin import garmin
-from .commands.help import help, Markdown
-from .commands.import_ import import_
-from .commands.jupyter import jupyter
-from .commands.kit import kit
-from .commands.package_fit_profile import package_fit_profile
-from .commands.search import search
-from .commands.calculate import calculate
-from .commands.show_schedule import show_schedule
-from .commands.thumbnail import thumbnail
-from .commands.unlock import unlock
-from .commands.read import read
-from .commands.web import web
 from .lib.log import make_log_from_args, set_log_color
-from .sql.database import SystemConstant
-from .sql.system import System, Data
-
 log = getLogger(__name__)
 
 
@@ -55,26 +36,72 @@ at the command line.
     pass
 
 
-COMMANDS = {CONSTANTS: constants,
-            DATABASE: database,
-            FIT: fit,
-            FIX_FIT: fix_fit,
-            GARMIN: garmin,
-            HELP: help,
-            IMPORT: import_,
-            JUPYTER: jupyter,
-            KIT: kit,
-            CALCULATE: calculate,
-            NO_OP: no_op,
-            PACKAGE_FIT_PROFILE: package_fit_profile,
-            READ: read,
-            SEARCH: search,
-            SHOW_SCHEDULE: show_schedule,
-            THUMBNAIL: thumbnail,
-            UNLOCK: unlock,
-            VALIDATE: validate,
-            WEB: web
-            }
+class Commands(Mapping):
+
+    '''
+    Command names mapped to the functions that implement them.
+
+    Command modules (and everything they import - pandas, bokeh, etc) are only loaded when a command
+    is retrieved, so that parsing arguments, help and small commands start quickly.
+    '''
+
+    def __init__(self, **commands):
+        self.__commands = commands
+        self.__loaded = {}
+
+    def function_name(self, name):
+        path = self.__commands[name]
+        return path.__name__ if callable(path) else path.rsplit('.', 1)[1]
+
+    def __getitem__(self, name):
+        if name not in self.__loaded:
+            path = self.__commands[name]
+            if callable(path):
+                self.__loaded[name] = path
+            else:
+                module, function = path.rsplit('.', 1)
+                log.debug(f'Loading {function} from {module}')
+                self.__loaded[name] = getattr(import_module(module, __name__), function)
+        return self.__loaded[name]
+
+    def __iter__(self):
+        return iter(self.__commands)
+
+    def __len__(self):
+        return len(self.__commands)
+
+
+COMMANDS = Commands(**{BENCHMARK: '.commands.benchmark.benchmark',
+                       CONSTANTS: '.commands.constants.constants',
+                       DATABASE: '.commands.database.database',
+                       FIT: '.commands.fit.fit',
+                       FIX_FIT: '.commands.fix_fit.fix_fit',
+                       GARMIN: '.commands.garmin.garmin',
+                       HELP: '.commands.help.help',
+                       IMPORT: '.commands.import_.import_',
+                       JUPYTER: '.commands.jupyter.jupyter',
+                       KIT: '.commands.kit.kit',
+                       MAINTAIN: '.commands.maintain.maintain',
+                       METRICS: '.commands.metrics.metrics',
+                       CALCULATE: '.commands.calculate.calculate',
+                       NO_OP: no_op,
+                       PACKAGE_FIT_PROFILE: '.commands.package_fit_profile.package_fit_profile',
+                       READ: '.commands.read.read',
+                       SEARCH: '.commands.search.search',
+                       SHOW_SCHEDULE: '.commands.show_schedule.show_schedule',
+                       THUMBNAIL: '.commands.thumbnail.thumbnail',
+                       UNLOCK: '.commands.unlock.unlock',
+                       VALIDATE: '.commands.validate.validate',
+                       WEB: '.commands.web.web'
+                       })
+
+
+def __getattr__(name):
+    # command functions used to be imported here, so keep them available (lazily)
+    for command in COMMANDS:
+        if COMMANDS.function_name(command) == name:
+            return COMMANDS[command]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def args_and_command():
@@ -102,7 +129,7 @@ def main():
             log.debug('If you are seeing the "No command given" error during development ' +
                       'you may have forgotten to set the command name via `set_defaults()`.')
             raise Exception('No command given (try `ch2 help`)')
-        elif command_name not in (DATABASE, PACKAGE_FIT_PROFILE, HELP):
+        elif command_name not in (DATABASE, PACKAGE_FIT_PROFILE, HELP, BENCHMARK):
             db = data.db if command_name not in (PACKAGE_FIT_PROFILE, HELP) else None
             if not db:
                 refuse_until_configured(command_name, False)
@@ -122,6 +149,7 @@ def main():
 
 
 def refuse_until_configured(command_name, uri):
+    from .commands.help import Markdown
     Markdown().print(f'''
 Welcome to Choochoo.
 
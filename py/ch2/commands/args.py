@@ -14,7 +14,7 @@ from ..names import UNDEF
 log = getLogger(__name__)
 
 # this can be modified during development.  it will be reset from setup.py on release.
-CH2_VERSION = '0.34.4'
+CH2_VERSION = '0.35.0'
 # new database on minor releases.  not sure this will always be a good idea.  we will see.
 DB_VERSION = '-'.join(CH2_VERSION.split('.')[:2])
 DB_EXTN = '.db'   # used to use .sql but auto-complete for sqlite3 didn't work
@@ -25,6 +25,7 @@ COMMAND = 'command'
 WEB_PORT = 8000
 JUPYTER_PORT = 8001
 
+BENCHMARK = 'benchmark'
 CALCULATE = 'calculate'
 CONSTANTS = 'constants'
 DATABASE = 'database'
@@ -37,6 +38,8 @@ H, HELP = 'h', 'help'
 IMPORT = 'import'
 JUPYTER = 'jupyter'
 KIT = 'kit'
+MAINTAIN = 'maintain'
+METRICS = 'metrics'
 LOAD = 'load'
 NO_OP = 'no-op'
 PACKAGE_FIT_PROFILE = 'package-fit-profile'
@@ -55,10 +58,12 @@ ACTIVITY_GROUP = 'activity-group'
 ACTIVITY_GROUPS = 'activity-groups'
 ACTIVITY_JOURNALS = 'activity-journals'
 ACTIVITY_JOURNAL_ID = 'activity-journal-id'
+ACTIVITY_RECORDS = 'activity-records'
 ACTIVITIES = 'activities'
 ADD = 'add'
 ADD_HEADER = 'add-header'
 ADVANCED = 'advanced'
+ADVISE = 'advise'
 AFTER = 'after'
 AFTER_BYTES = 'after-bytes'
 AFTER_RECORDS = 'after-records'
@@ -78,6 +83,7 @@ COMPACT = 'compact'
 COMPONENT = 'component'
 CONSTRAINT = 'constraint'
 CONTEXT = 'context'
+CREATE = 'create'
 CSV = 'csv'
 D = 'd'
 DARK = 'dark'
@@ -111,6 +117,7 @@ GREP = 'grep'
 GROUP = 'group'
 HEADER_SIZE = 'header-size'
 HEIGHT = 'height'
+INDEXES = 'indexes'
 INTERNAL = 'internal'
 ITEM = 'item'
 K = 'k'
@@ -119,9 +126,12 @@ LABEL = 'label'
 LATITUDE = 'latitude'
 LIGHT = 'light'
 LIKE = 'like'
+LIMIT = 'limit'
 LIMIT_BYTES = 'limit-bytes'
 LIMIT_RECORDS = 'limit-records'
 LOG = 'log'
+LOG_QUEUE = 'log-queue'
+LOG_VERBOSITY = 'log-verbosity'
 LOGS = 'logs'
 LONGITUDE = 'longitude'
 LIST = 'list'
@@ -138,6 +148,8 @@ MAX_RECORD_LEN = 'max-record-len'
 MIN_SYNC_CNT = 'min-sync-cnt'
 MODEL = 'model'
 MONITOR = 'monitor'
+MONITOR_RECORDS = 'monitor-records'
+MONITORS = 'monitors'
 MONTH = 'month'
 MONTHS = 'months'
 NAME = 'name'
@@ -150,6 +162,7 @@ NOTEBOOKS = 'notebooks'
 O, OUTPUT = 'o', 'output'
 OFF = 'off'
 OWNER = 'owner'
+PARTITION = 'partition'
 PASS = 'pass'
 PATH = 'path'
 P, PATTERN = 'p', 'pattern'
@@ -159,6 +172,7 @@ PLAN = 'plan'
 PORT = 'port'
 PRINT = 'print'
 PROFILE = 'profile'
+PROFILE_SQL = 'profile-sql'
 PROFILE_VERSION = 'profile-version'
 PROTOCOL_VERSION = 'protocol-version'
 PROXY = 'proxy'
@@ -169,6 +183,7 @@ READ_ONLY = 'read-only'
 REBUILD = 'rebuild'
 RECORDS = 'records'
 REMOVE = 'remove'
+REQUESTS = 'requests'
 RETIRE = 'retire'
 ROOT = 'root'
 RUN = 'run'
@@ -181,6 +196,7 @@ SECURE = 'secure'
 SHOW = 'show'
 SINGLE = 'single'
 SLICES = 'slices'
+SNAPSHOT = 'snapshot'
 SOURCE = 'source'
 SOURCES = 'sources'
 SOURCE_ID = 'source-id'
@@ -190,11 +206,13 @@ STATISTICS = 'statistics'
 STATISTIC_NAMES = 'statistic-names'
 STATISTIC_JOURNALS = 'statistic-journals'
 STATUS = 'status'
+STEPS = 'steps'
 STOP = 'stop'
 SUB_COMMAND = 'sub-command'
 SYSTEM = 'system'
 TABLE = 'table'
 TABLES = 'tables'
+THREADS = 'threads'
 TOKENS = 'tokens'
 TOPIC = 'topic'
 UNDO = 'undo'
@@ -274,12 +292,18 @@ def make_parser(with_noop=False):
                         help='read-only database (so errors on write)')
     parser.add_argument(mm(LOG), metavar='FILE',
                         help='the file name for the log (command name by default)')
+    parser.add_argument(mm(LOG_VERBOSITY), type=int, metavar='N',
+                        help='output level for the log file (0: silent; 5:noisy, the default)')
+    parser.add_argument(mm(LOG_QUEUE), action='store_true',
+                        help='write the log from a background thread and drop repeated messages')
     parser.add_argument(mm(COLOR), type=color,
                         help=f'pretty stdout log - {LIGHT}|{DARK}|{OFF} (CAPS to save)')
     parser.add_argument(m(V), mm(VERBOSITY), default=UNDEF, type=int, metavar='N',
                         help='output level for stderr (0: silent; 5:noisy)')
     parser.add_argument(mm(DEV), action='store_true',
                         help='verbose log and stack trace on error')
+    parser.add_argument(mm(PROFILE_SQL), action='store_true',
+                        help='count and time sql statements by pipeline and web route (see metrics)')
     parser.add_argument(m(V.upper()), mm(VERSION), action='version', version=CH2_VERSION,
                         help='display version and exit')
 
@@ -310,6 +334,16 @@ def make_parser(with_noop=False):
         cmd.add_argument(mm(prefix + PORT), default=default_port, type=int, metavar='PORT',
                          help=f'port' + f' (default {default_port})' if default_port else '')
 
+    def add_threads_arg(cmd):
+        cmd.add_argument(mm(WEB + '-' + THREADS), type=int, default=0, metavar='N',
+                         help='serve requests from a pool of N threads, sharing N open database sessions '
+                              '(default 0 - a single threaded development server)')
+
+    def add_snapshot_arg(cmd):
+        cmd.add_argument(mm(WEB + '-' + SNAPSHOT), action='store_true',
+                         help='read data (GET requests) from a consistent, read-only snapshot of the database, '
+                              'so that browsing is not blocked while data are loaded (sqlite only)')
+
     def add_warning_args(cmd):
         prefix = WARN + '-'
         cmd.add_argument(mm(prefix + DATA), action='store_true', help='warn user that data may be lost')
@@ -319,6 +353,8 @@ def make_parser(with_noop=False):
     add_web_server_args(web_start, prefix=WEB)
     add_web_server_args(web_start, prefix=JUPYTER, default_port=JUPYTER_PORT)
     add_web_server_args(web_start, prefix=PROXY, default_port=None, default_address=None)
+    add_threads_arg(web_start)
+    add_snapshot_arg(web_start)
     add_warning_args(web_start)
     web_cmds.add_parser(STOP, help='stop the web server', description='stop the web server')
     web_cmds.add_parser(STATUS, help='display status of web server', description='display status of web server')
@@ -327,6 +363,8 @@ def make_parser(with_noop=False):
     add_web_server_args(web_service, prefix=WEB)
     add_web_server_args(web_service, prefix=JUPYTER, default_port=JUPYTER_PORT)
     add_web_server_args(web_service, prefix=PROXY, default_port=None, default_address=None)
+    add_threads_arg(web_service)
+    add_snapshot_arg(web_service)
     add_warning_args(web_service)
     add_uri_options(web_service, False)
 
@@ -475,6 +513,8 @@ def make_parser(with_noop=False):
     database_list = database_cmds.add_parser(LIST, help='list available profiles')
     database_load = database_cmds.add_parser(LOAD, help='configure using the given profile')
     database_load.add_argument(mm(FORCE), action='store_true', help='overwrite existing database')
+    database_load.add_argument(mm(PARTITION), action='store_true',
+                               help='partition statistics by time (postgresql only)')
     add_uri_options(database_load, True)
     database_profiles = database_load.add_subparsers(title='profile', dest=PROFILE, required=True)
     from ..config.utils import profiles
@@ -626,8 +666,11 @@ def make_parser(with_noop=False):
 
     thumbnail = subparsers.add_parser(THUMBNAIL,
                                       help='generate a thumbnail map of an activity')
-    thumbnail.add_argument(ACTIVITY, metavar='ACTIVITY',
-                           help='an activity ID or date')
+    thumbnail_activity = thumbnail.add_mutually_exclusive_group(required=True)
+    thumbnail_activity.add_argument(ACTIVITY, metavar='ACTIVITY', nargs='?',
+                                    help='an activity ID or date')
+    thumbnail_activity.add_argument(mm(ALL), action='store_true', help='generate all missing thumbnails')
+    thumbnail.add_argument(mm(FORCE), action='store_true', help='with --all, delete existing thumbnails first')
 
     if with_noop:
         noop = subparsers.add_parser(NO_OP,
@@ -647,6 +690,31 @@ def make_parser(with_noop=False):
 
     unlock = subparsers.add_parser(UNLOCK, help='remove database locking')
 
+    maintain = subparsers.add_parser(MAINTAIN, help='maintain the databases')
+    maintain.add_argument(STEPS, metavar='STEP', nargs='*',
+                          help='steps to run (analyze, optimize, vacuum, checkpoint, check; default all but vacuum)')
+
+    metrics = subparsers.add_parser(METRICS, help='report resources used by pipelines')
+    metrics.add_argument(RUN, metavar='RUN', nargs='*', help='one run to show, or two to compare')
+    metrics.add_argument(mm(LIMIT), type=int, default=10, metavar='N', help='number of runs to list')
+    metrics.add_argument(mm(PLAN), action='store_true', help='show query plans for profiled statements')
+    metrics.add_argument(mm(ADVISE), action='store_true', help='suggest covering indexes for profiled statements')
+    metrics.add_argument(mm(CREATE), action='store_true', help='create (and validate) the suggested indexes')
+    add_uri_options(metrics, False)
+
+    benchmark = subparsers.add_parser(BENCHMARK, help='time processing of synthetic data in a scratch database')
+    benchmark.add_argument(mm(ACTIVITIES), type=int, default=3, metavar='N', help='number of activity files')
+    benchmark.add_argument(mm(ACTIVITY_RECORDS), type=int, default=3600, metavar='N',
+                           help='records (seconds) per activity')
+    benchmark.add_argument(mm(MONITORS), type=int, default=3, metavar='N', help='number of monitor files')
+    benchmark.add_argument(mm(MONITOR_RECORDS), type=int, default=1440, metavar='N',
+                           help='records (minutes) per monitor file')
+    benchmark.add_argument(mm(REQUESTS), type=int, default=50, metavar='N', help='requests per web path')
+    benchmark.add_argument(mm(THREADS), type=int, default=4, metavar='N', help='web server threads and clients')
+    benchmark.add_argument(mm(DIR), metavar='DIR', help='directory for the scratch database (default temporary)')
+    benchmark.add_argument(mm(INDEXES), action='store_true',
+                           help='compare timings without and with suggested covering indexes')
+
     return parser
 
 
@@ -0,0 +1,200 @@
+
+from contextlib import contextmanager
+from io import BytesIO
+from json import dumps
+from logging import getLogger
+from os.path import join
+from tempfile import TemporaryDirectory
+from threading import Thread
+from urllib.parse import quote
+
+from .args import ACTIVITIES, ACTIVITY_RECORDS, MONITORS, MONITOR_RECORDS, REQUESTS, THREADS, DIR, SQLITE, \
+    CH2_VERSION, INDEXES
+from .calculate import run_statistic_pipelines
+from .database import load
+from .metrics import by_pipeline
+from .read import upload_files, uploaded_paths, STREAM, NAME, ACTIVITY, MONITOR
+from ..data.constraint import constrained_sources, activity_conversion
+from ..fit.synthetic import synthetic_files
+from ..global_ import global_data, set_global_data
+from ..lib.date import time_to_local_date
+from ..lib.log import Record
+from ..lib.metrics import measure, new_run
+from ..pipeline.pipeline import run_pipeline
+from ..sql import PipelineType, ActivityJournal
+from ..sql.database import PROFILER
+from ..sql.index import advise, applies, create_indexes, describe, index_name, is_valid
+from ..sql.system import Data
+
+log = getLogger(__name__)
+
+PROFILE = 'default'
+QUERIES = ('ActivityJournal.start > 2000', 'active-distance > 1 and active-time < 86400')
+WRITES = ('upload', 'read-activity', 'read-monitor', 'calculate')
+READS = ('search',)
+BASELINE, INDEXED = 'baseline', 'indexed'
+
+
+def benchmark(args, data):
+    '''
+## benchmark
+
+    > ch2 benchmark [--activities N] [--activity-records N] [--monitors N] [--monitor-records N]
+                    [--requests N] [--threads N] [--dir DIR] [--indexes]
+
+Generate synthetic FIT files (rides with one record per second and monitor files with one record per minute),
+then time storing, reading, calculating, searching and serving the data.
+A scratch database is used (in a temporary directory, unless --dir is given) so the current data are not affected.
+
+The results are printed to stdout as JSON.
+Each phase includes wall and cpu time (seconds), the number of sql queries made by the main process and,
+where it makes sense, the number of items and records processed.
+Resources used by individual pipelines (including worker processes) are also included.
+
+### Examples
+
+    > ch2 benchmark --activities 10 --activity-records 7200 > before.json
+
+Time reading and processing ten two hour rides.
+
+    > ch2 benchmark --indexes
+
+Run the benchmark twice, in separate scratch databases.
+The first run profiles the sql and the statements are used to suggest covering indexes (see `ch2 metrics`).
+The second run creates those indexes before reading any data, so that ingest pays the cost of maintaining them.
+The results include both runs, the indexes (and whether the queries used them), and a comparison of
+write (upload, read, calculate) and read (search, web latency) times.
+Only indexes that help sqlite are created (those that only help PostgreSQL are listed but not used).
+    '''
+    run = compare_indexes if args[INDEXES] else run_benchmark
+    if args[DIR]:
+        results = run(args[DIR], args)
+    else:
+        with TemporaryDirectory() as base:
+            results = run(base, args)
+    print(dumps(results, indent=2))
+
+
+def run_benchmark(base, args, indexes=tuple()):
+    log.info(f'Running benchmark in {base}')
+    data = Data(base)
+    previous = global_data()
+    set_global_data(data)  # some code (eg interval cleaning) uses the global system database
+    try:
+        load(data.sys, base, PROFILE, SQLITE)
+        data.reset()
+        if indexes: create_indexes(data.db.engine, indexes)  # before reading, so ingest includes their cost
+        return run_phases(data, args)
+    finally:
+        set_global_data(previous)
+
+
+def compare_indexes(base, args):
+    enabled = PROFILER.enabled
+    PROFILER.enable()  # for both runs, so that the overhead is the same
+    try:
+        baseline = run_benchmark(join(base, BASELINE), args)
+        data = Data(join(base, BASELINE))
+        with data.db.session_context() as s:
+            advice = advise(s, data.sys.get_query_profiles())
+        indexed = run_benchmark(join(base, INDEXED), args,
+                                indexes=[entry.index for entry in advice
+                                         if applies(data.db.engine.dialect, entry.index)])
+        data = Data(join(base, INDEXED))
+        with data.db.session_context() as s:
+            indexes = [{'name': index_name(entry.index), 'index': describe(entry.index), 'time': entry.time,
+                        'created': applies(data.db.engine.dialect, entry.index),
+                        'used': applies(data.db.engine.dialect, entry.index) and is_valid(s, entry)}
+                       for entry in advice]
+    finally:
+        if not enabled: PROFILER.disable()
+    return {BASELINE: baseline, INDEXED: indexed, 'indexes': indexes, 'comparison': compare(baseline, indexed)}
+
+
+def compare(baseline, indexed):
+    # wall times for writes and reads (p50 latency for the web), with the ratio indexed / baseline
+
+    def entry(before, after):
+        return {BASELINE: before, INDEXED: after, 'ratio': after / before if before else None}
+
+    return {'write': dict((name, entry(baseline['phases'][name]['wall'], indexed['phases'][name]['wall']))
+                          for name in WRITES),
+            'read': dict([(name, entry(baseline['phases'][name]['wall'], indexed['phases'][name]['wall']))
+                          for name in READS] +
+                         [(before['path'], entry(before['p50'], after['p50']))
+                          for before, after in zip(baseline['web'], indexed['web'])])}
+
+
+def run_phases(data, args):
+    phases, pipelines = {}, {}
+    results = {'version': CH2_VERSION,
+               'parameters': {name: args[name] for name in
+                              (ACTIVITIES, ACTIVITY_RECORDS, MONITORS, MONITOR_RECORDS, REQUESTS, THREADS)},
+               'phases': phases, 'pipelines': pipelines}
+
+    with phase(phases, 'generate') as result:
+        files = list(synthetic_files(args[ACTIVITIES], args[ACTIVITY_RECORDS],
+                                     args[MONITORS], args[MONITOR_RECORDS]))
+        result.update(items=len(files), bytes=sum(len(contents) for _, contents in files))
+
+    with phase(phases, 'upload') as result:
+        streams = [{NAME: name, STREAM: BytesIO(contents)} for name, contents in files]
+        uploaded = upload_files(Record(log), data, files=streams, nfiles=len(streams))
+        result.update(items=len(uploaded))
+
+    for name, type, kind, n, records in (('read-activity', PipelineType.READ_ACTIVITY, ACTIVITY,
+                                          args[ACTIVITIES], args[ACTIVITY_RECORDS]),
+                                         ('read-monitor', PipelineType.READ_MONITOR, MONITOR,
+                                          args[MONITORS], args[MONITOR_RECORDS])):
+        with phase(phases, name, pipelines, data) as result:
+            run_pipeline(data, type, **uploaded_paths(uploaded, kind))
+            result.update(items=n, records=n * records)
+
+    with phase(phases, 'calculate', pipelines, data) as result:
+        run_statistic_pipelines(data)
+        result.update(items=args[ACTIVITIES])
+
+    with phase(phases, 'search') as result:
+        with data.db.session_context() as s:
+            result.update(items=sum(len(constrained_sources(s, query, conversion=activity_conversion))
+                                    for query in QUERIES))
+
+    results['web'] = web_benchmark(data, args[REQUESTS], args[THREADS])
+    return results
+
+
+@contextmanager
+def phase(phases, name, pipelines=None, data=None):
+    log.info(f'Benchmark phase {name}')
+    run = new_run()
+    result = {}
+    with measure() as measurement:
+        yield result
+    result.update(wall=measurement.wall, cpu=measurement.cpu, queries=measurement.queries)
+    if 'records' in result: result['records_per_second'] = result['records'] / measurement.wall
+    phases[name] = result
+    if pipelines is not None:
+        for key, total in by_pipeline(data.sys.get_metrics(run=run), run).items():
+            pipelines[f'{name}: {key}'] = {'wall': total.wall, 'cpu': total.cpu + total.worker_cpu,
+                                           'workers': total.workers, 'rss': total.rss, 'items': total.items,
+                                           'rows': total.rows, 'queries': total.queries}
+
+
+def web_benchmark(data, requests, threads):
+    from ..web.load import load_test
+    from ..web.server import WebServer, PooledWSGIServer
+    with data.db.session_context() as s:
+        activities = s.query(ActivityJournal).order_by(ActivityJournal.start).all()
+        day = time_to_local_date(activities[0].start).strftime('%Y-%m-%d') if activities else '2020-01-01'
+        ids = [activity.id for activity in activities]
+    paths = [f'/api/diary/{day}', f'/api/diary/{day[:7]}', f'/api/diary/{day[:4]}',
+             f'/api/diary/active-days/{day[:7]}', f'/api/search/activity/{quote(QUERIES[0])}']
+    if ids: paths.append(f'/api/thumbnail/{ids[0]}')
+    server = PooledWSGIServer('localhost', 0, WebServer(data, None, None, sessions=threads), threads=threads)
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f'http://localhost:{server.server_port}'
+        return [load_test(url, path, concurrency=threads, requests=requests)._asdict() for path in paths]
+    finally:
+        server.shutdown()
+        server.server_close()
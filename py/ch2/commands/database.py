@@ -6,13 +6,14 @@ from sqlalchemy_utils import create_database, drop_database, database_exists
 from uritools import urisplit
 
 from .args import mm, SUB_COMMAND, LIST, PROFILE, BASE, SHOW, DB_VERSION, URI, SQLITE, POSTGRESQL, \
-    FORCE, DELETE
+    FORCE, DELETE, PARTITION
 from .help import Markdown
 from ..config.utils import profiles, get_profile
 from ..lib import log_current_exception
 from ..lib.utils import clean_path
 from ..sql import SystemConstant
-from ..sql.database import sqlite_uri, postgresql_uri
+from ..sql.database import sqlite_uri, postgresql_uri, scheme
+from ..sql.partition import create_partitioned_schema
 
 log = getLogger(__name__)
 
@@ -21,9 +22,11 @@ def database(args, data):
     '''
 ## database
 
-    > ch2 database load (--sqlite|--pgsql|--uri URI) [--delete] PROFILE
+    > ch2 database load (--sqlite|--pgsql|--uri URI) [--delete] [--partition] PROFILE
 
 Load the initial database schema.
+With --partition (PostgreSQL only) statistic values are stored in a table partitioned by year,
+so that queries over a range of times only read the relevant partitions.
 
     > ch2 database list
 
@@ -47,7 +50,7 @@ Delete the current database.
         if not uri: raise Exception('No current database is defined')
         delete(uri, data.sys)
     else:
-        load(data.sys, args[BASE], args[PROFILE], args[URI], args[FORCE])
+        load(data.sys, args[BASE], args[PROFILE], args[URI], args[FORCE], args[PARTITION])
 
 
 def database_really_exists(uri):
@@ -137,8 +140,11 @@ def create(uri):
     create_database(uri)
 
 
-def load(sys, base, profile, scheme_or_uri, force=False):
+def load(sys, base, profile, scheme_or_uri, force=False, partition=False):
     uri = make_uri(base, scheme_or_uri)
+    if partition and scheme(uri) != POSTGRESQL:
+        raise Exception(f'Partitioning is only supported for {POSTGRESQL} (not {uri})')
     delete_and_check(uri, force, sys)
     create(uri)
+    if partition: create_partitioned_schema(uri)
     write(uri, profile, sys, base)
@@ -43,7 +43,9 @@ https://www.garmin.com/en-US/account/datamanagement/
 
 
 def run_garmin(sys, s, dir=None, base=None, user=None, password=None, dates=None, force=False, progress=None):
+    # returns the files downloaded (as file dicts, empty for the old format)
 
+    downloaded = []
     if not dates: dates = list(missing_dates(s, force=force))
     local_progress = ProgressTree(len(dates), parent=progress)
     if not (base or dir):
@@ -52,7 +54,7 @@ def run_garmin(sys, s, dir=None, base=None, user=None, password=None, dates=None
     try:
         if not dates:
             log.info('No missing data to download')
-            return
+            return downloaded
 
         old_format = bool(dir)
         data_dir = dir or base_system_path(base, version=PERMANENT)
@@ -62,7 +64,7 @@ def run_garmin(sys, s, dir=None, base=None, user=None, password=None, dates=None
         last = sys.get_constant(SystemConstant.LAST_GARMIN, none=True)
         if last and (now() - local_time_to_time(last)).total_seconds() < 12 * 60 * 60:
             log.info(f'Too soon since previous call ({last}; 12 hours minimum)')
-            return
+            return downloaded
 
         connect = GarminConnect(log_response=False)
         connect.login(user, password)
@@ -72,7 +74,7 @@ def run_garmin(sys, s, dir=None, base=None, user=None, password=None, dates=None
                 sleep(1)
             log.info('Downloading data for %s' % date)
             try:
-                connect.get_monitoring_to_fit_file(date, data_dir, old_format=old_format)
+                downloaded.extend(connect.get_monitoring_to_fit_file(date, data_dir, old_format=old_format))
                 local_progress.increment()
             except HTTPError:
                 log_current_exception(traceback=False)
@@ -83,7 +85,7 @@ def run_garmin(sys, s, dir=None, base=None, user=None, password=None, dates=None
                     break
 
         sys.set_constant(SystemConstant.LAST_GARMIN, time_to_local_time(now()), True)
-        return
+        return downloaded
 
     finally:
         local_progress.complete()
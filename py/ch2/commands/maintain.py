@@ -0,0 +1,38 @@
+
+from logging import getLogger
+
+from .args import STEPS
+from ..lib.metrics import new_run
+from ..sql.maintenance import Maintenance, DEFAULT_STEPS
+
+log = getLogger(__name__)
+
+
+def maintain(args, data):
+    '''
+## maintain
+
+    > ch2 maintain [STEP ...]
+
+Maintain the activity and system databases.  The steps are:
+
+* analyze - update the statistics used to plan queries.
+* optimize - `PRAGMA optimize` for SQLite (ANALYZE for PostgreSQL).
+* vacuum - rebuild the database, reclaiming space.  This can be slow and needs exclusive access.
+* checkpoint - copy the write-ahead log to the database and truncate it (SQLite).
+* check - check the integrity of the database, including indices (SQLite).
+
+By default all steps except vacuum are run.
+The time taken for each step is recorded and can be displayed with `ch2 metrics`.
+
+Optimize and checkpoint are also run automatically after reading a large amount of new data.
+
+### Examples
+
+    > ch2 maintain vacuum
+
+Rebuild the databases (eg after deleting many activities).
+    '''
+    run = new_run()
+    Maintenance(data, steps=args[STEPS] or DEFAULT_STEPS).run()
+    log.info(f'Maintenance complete (ch2 metrics {run})')
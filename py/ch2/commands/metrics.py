@@ -0,0 +1,195 @@
+
+from collections import defaultdict
+from logging import getLogger
+
+from .args import RUN, LIMIT, WEB, PLAN, SQLITE, ADVISE, CREATE, URI, BASE
+from ..sql.database import query_plan, scheme
+from .database import make_uri
+from ..sql.index import advise, applies, describe, index_name, create_and_validate
+from ..sql.types import short_cls
+
+log = getLogger(__name__)
+
+
+def metrics(args, data):
+    '''
+## metrics
+
+    > ch2 metrics [--limit N]
+
+List recent runs (commands that ran pipelines) with total times.
+
+    > ch2 metrics RUN
+
+Show the resources used by each pipeline in a run (times in seconds, memory in MB).
+Worker processes are included in the totals for their pipeline.
+
+If the run was made with `ch2 --profile-sql ...` then the most expensive sql statements
+(grouped by pipeline or web route, and normalised so that values are ignored) are also shown
+(up to --limit statements).
+
+    > ch2 metrics RUN --plan
+
+As above, but also show how the database (sqlite only) reads the data for each select statement.
+Steps that read more than an index (full scans, table lookups after an index search, and sorts) are marked
+and are candidates for (covering) indexes.
+
+    > ch2 metrics RUN --advise [--create [--sqlite|--postgresql|--uri URI]]
+
+Suggest covering indexes for the profiled statements (using sqlite query plans).
+Each index is keyed on the columns searched and includes the other columns the statements read
+(so the table is not needed).  Lookups by primary key (eg the values of statistics) only benefit on PostgreSQL,
+where the index can include the value.
+
+With --create the suggested indexes are added to the current database (or the one given) and checked:
+on sqlite the query plans must use the index (unused indexes are dropped); on PostgreSQL the index must be valid.
+Use `ch2 benchmark --indexes` to compare read and write times with and without the indexes.
+
+    > ch2 metrics RUN1 RUN2
+
+Compare two runs, pipeline by pipeline.
+
+RUN can be the full name (as listed) or a negative index (-1 is the most recent run).
+    '''
+    all_metrics = data.sys.get_metrics()
+    runs = list(dict.fromkeys(metric.run for metric in all_metrics))
+    web_runs = profiled_web_runs(data)
+    names = [resolve_run(runs, run, web_runs) for run in args[RUN]]
+    if not names:
+        list_runs(all_metrics, runs[-args[LIMIT]:])
+        for run in web_runs[-args[LIMIT]:]: print(f'{run:32s} (web server sql profile)')
+    elif len(names) == 1:
+        show_run(all_metrics, names[0])
+        profiles = data.sys.get_query_profiles(run=names[0])
+        show_queries(profiles, args[LIMIT], data if args[PLAN] else None)
+        if args[ADVISE]:
+            show_advice(data, profiles, args[LIMIT], create=args[CREATE],
+                        uri=args[URI] and make_uri(args[BASE], args[URI]))
+    elif len(names) == 2:
+        compare_runs(all_metrics, *names)
+    else:
+        raise Exception('Give at most two runs')
+
+
+def profiled_web_runs(data):
+    # web servers profile queries without running pipelines
+    return [run for run in data.sys.get_query_profile_runs() if run.startswith(WEB)]
+
+
+def resolve_run(runs, run, others=tuple()):
+    try:
+        index = int(run)
+        if index >= 0: raise Exception(f'Run index must be negative ({run})')
+        return runs[index]
+    except ValueError:
+        if run not in runs and run not in others: raise Exception(f'No run {run}')
+        return run
+    except IndexError:
+        raise Exception(f'Only {len(runs)} runs')
+
+
+class Total:
+
+    def __init__(self):
+        self.wall = self.cpu = self.worker_cpu = 0
+        self.rss = self.items = self.rows = self.queries = 0
+        self.workers = 0
+
+    def add(self, metric):
+        if metric.worker:
+            self.workers += 1
+            self.worker_cpu += metric.cpu
+        else:
+            self.wall += metric.wall
+            self.cpu += metric.cpu
+            self.items += metric.items or 0
+            self.rows += metric.rows or 0
+        self.rss = max(self.rss, metric.rss)
+        self.queries += metric.queries
+
+
+def by_pipeline(all_metrics, run):
+    totals = defaultdict(Total)
+    for metric in all_metrics:
+        if metric.run == run:
+            key = short_cls(metric.owner)
+            if metric.label: key += f' ({metric.label})'
+            totals[key].add(metric)
+    return totals
+
+
+def list_runs(all_metrics, runs):
+    print(f'{"run":32s} {"version":>8s} {"wall":>8s} {"cpu":>8s} {"queries":>8s}')
+    for run in runs:
+        totals = by_pipeline(all_metrics, run).values()
+        version = next(metric.version for metric in all_metrics if metric.run == run)
+        print(f'{run:32s} {version:>8s} {sum(total.wall for total in totals):8.1f} '
+              f'{sum(total.cpu + total.worker_cpu for total in totals):8.1f} '
+              f'{sum(total.queries for total in totals):8d}')
+
+
+def show_run(all_metrics, run):
+    print(f'{"pipeline":40s} {"wall":>8s} {"cpu":>8s} {"workers":>7s} {"rss":>6s} '
+          f'{"items":>6s} {"rows":>8s} {"queries":>8s}')
+    for key, total in by_pipeline(all_metrics, run).items():
+        print(f'{key:40s} {total.wall:8.1f} {total.cpu + total.worker_cpu:8.1f} {total.workers:7d} '
+              f'{total.rss / 1e6:6.0f} {total.items:6d} {total.rows:8d} {total.queries:8d}')
+
+
+def compare_runs(all_metrics, run1, run2):
+    totals1, totals2 = by_pipeline(all_metrics, run1), by_pipeline(all_metrics, run2)
+    print(f'{"pipeline":40s} {"wall 1":>8s} {"wall 2":>8s} {"ratio":>6s} {"cpu 1":>8s} {"cpu 2":>8s} '
+          f'{"items 1":>7s} {"items 2":>7s}')
+    for key in dict.fromkeys(list(totals1) + list(totals2)):
+        total1, total2 = totals1.get(key, Total()), totals2.get(key, Total())
+        ratio = f'{total2.wall / total1.wall:6.2f}' if total1.wall else f'{"-":>6s}'
+        print(f'{key:40s} {total1.wall:8.1f} {total2.wall:8.1f} {ratio} '
+              f'{total1.cpu + total1.worker_cpu:8.1f} {total2.cpu + total2.worker_cpu:8.1f} '
+              f'{total1.items:7d} {total2.items:7d}')
+
+
+def show_queries(profiles, limit, data=None):
+    if profiles:
+        totals = defaultdict(lambda: [0, 0.0])
+        for profile in profiles:
+            total = totals[(profile.context, profile.statement)]
+            total[0] += profile.count
+            total[1] += profile.time
+        print()
+        print(f'{"time":>8s} {"count":>8s} {"context":40s} statement')
+        for (context, statement), (count, time) in sorted(totals.items(), key=lambda item: -item[1][1])[:limit]:
+            print(f'{time:8.2f} {count:8d} {context:40s} {statement}')
+            if data: show_plan(data, statement)
+
+
+def show_plan(data, statement):
+    if scheme(data.db.uri) != SQLITE:
+        raise Exception('Query plans are only available for sqlite')
+    if statement.upper().startswith('SELECT'):
+        with data.db.session_context() as s:
+            for step, note in query_plan(s, statement):
+                print(f'{"":18s} {"!" if note else " "} {step}' + (f'  ({note})' if note else ''))
+
+
+def show_advice(data, profiles, limit, create=False, uri=None):
+    if scheme(data.db.uri) != SQLITE:
+        raise Exception('Index advice is only available for sqlite')
+    with data.db.session_context() as s:
+        advice = advise(s, profiles)[:limit]
+    print()
+    print(f'{"time":>8s} {"count":>8s} index')
+    for entry in advice:
+        note = '' if applies(data.db.engine.dialect, entry.index) else '  (postgresql only)'
+        print(f'{entry.time:8.2f} {len(entry.statements):8d} {describe(entry.index)}{note}')
+    if create:
+        db = data.sys.get_database(uri) if uri else data.db
+        valid = create_and_validate(db, advice)
+        print()
+        for entry in advice:
+            if entry in valid:
+                status = 'created'
+            elif applies(db.engine.dialect, entry.index):
+                status = 'not used (dropped)'
+            else:
+                status = 'not needed'
+            print(f'{index_name(entry.index):50s} {status}')
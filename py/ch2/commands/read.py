@@ -13,6 +13,7 @@ from ..commands.args import KIT, READ, BASE, FORCE, PATH, base_system_path, PERM
 from ..lib.date import time_to_local_time, Y, YMDTHMS
 from ..lib.io import data_hash, split_fit_path, touch
 from ..lib.log import log_current_exception, Record
+from ..lib.metrics import new_run
 from ..lib.utils import clean_path
 from ..lib.workers import ProgressTree, SystemProgressTree
 from ..pipeline.pipeline import run_pipeline
@@ -20,6 +21,7 @@ from ..pipeline.read.activity import ActivityReader
 from ..pipeline.read.monitor import MonitorReader
 from ..pipeline.read.utils import AbortImportButMarkScanned
 from ..sql import KitItem, FileHash, ActivityJournal, PipelineType
+from ..sql.maintenance import maintain_after_ingest
 
 log = getLogger(__name__)
 
@@ -203,6 +205,8 @@ def write_file(file):
 
 
 def upload_files(record, data, files=tuple(), nfiles=1, items=tuple(), progress=None):
+    # returns the files written (dicts with WRITE_PATH, HASH and TYPE)
+    uploaded = []
     try:
         local_progress = ProgressTree(len(files), parent=progress)
     except TypeError:
@@ -221,40 +225,73 @@ def upload_files(record, data, files=tuple(), nfiles=1, items=tuple(), progress=
                         check_file(s, file)
                         write_file(file)
                         record.info(f'Uploaded {file[NAME]} to {file[WRITE_PATH]}')
+                        uploaded.append(file)
                     except SkipFile as e:
                         record.warning(e)
             local_progress.complete()  # catch no files case
+    return uploaded
 
 
 def upload_files_and_update(record, data, files=tuple(), nfiles=1, force=False, items=tuple(),
                             flags=None, **kargs):
     # this expects files to be a list of maps from name to stream (or an iterator, if nfiles provided)
-    if not flags:
-        flags = defaultdict(lambda: True)
-    n_options = sum(1 if flags[name] else 0 for name in FLAGS)
-    if flags[MONITOR]: n_options += 2
-    progress = SystemProgressTree(data.sys, READ, [1] * (n_options + 1))
+    flags, progress = read_progress(data, flags)
     log.info(f'Uploading files')
     try:
         upload_files(record, data, files=files, nfiles=nfiles, items=items, progress=progress)
         # todo - add record to pipelines?
-        if flags[ACTIVITIES]:
-            log.info('Running activity pipelines')
-            run_pipeline(data, PipelineType.READ_ACTIVITY, force=force, progress=progress, **kargs)
-        if flags[MONITOR]:
-            # run before and after so we know what exists before we update, and import what we read
-            log.info('Running monitor pipelines')
-            run_pipeline(data, PipelineType.READ_MONITOR, force=force, progress=progress, **kargs)
-            with data.db.session_context() as s:
-                try:
-                    log.info('Running Garmin download')
-                    run_garmin(data.sys, s, base=data.base, progress=progress)
-                except Exception as e:
-                    log.warning(f'Could not get data from Garmin: {e}')
-            log.info('Running monitor pipelines (again)')
-            run_pipeline(data, PipelineType.READ_MONITOR, force=force, progress=progress, **kargs)
-        if flags[CALCULATE]:
-            log.info('Running statistics pipelines')
-            run_statistic_pipelines(data, force=force, progress=progress, **kargs)
+        update(data, progress, force=force, flags=flags, **kargs)
     finally:
         progress.complete()
+
+
+def read_progress(data, flags=None):
+    if not flags:
+        flags = defaultdict(lambda: True)
+    n_options = sum(1 if flags[name] else 0 for name in FLAGS)
+    if flags[MONITOR]: n_options += 2
+    return flags, SystemProgressTree(data.sys, READ, [1] * (n_options + 1))
+
+
+def uploaded_paths(uploaded, type):
+    # restrict reading to files that were just uploaded (and avoid re-hashing)
+    if uploaded is None:
+        return {}
+    else:
+        files = [file for file in uploaded if file[TYPE] == type]
+        return {'paths': [file[WRITE_PATH] for file in files],
+                'hashes': dict((file[WRITE_PATH], file[HASH]) for file in files)}
+
+
+def update(data, progress, force=False, flags=None, uploaded=None, **kargs):
+    # if uploaded is given (as returned by upload_files) then only those files are read (not the whole archive)
+    run = new_run()  # for metrics
+    if not flags:
+        flags = defaultdict(lambda: True)
+    if flags[ACTIVITIES]:
+        log.info('Running activity pipelines')
+        run_pipeline(data, PipelineType.READ_ACTIVITY, force=force, progress=progress,
+                     **uploaded_paths(uploaded, ACTIVITY), **kargs)
+    if flags[MONITOR]:
+        # run before and after so we know what exists before we update, and import what we read
+        log.info('Running monitor pipelines')
+        run_pipeline(data, PipelineType.READ_MONITOR, force=force, progress=progress,
+                     **uploaded_paths(uploaded, MONITOR), **kargs)
+        downloaded = []
+        with data.db.session_context() as s:
+            try:
+                log.info('Running Garmin download')
+                downloaded = run_garmin(data.sys, s, base=data.base, progress=progress)
+            except Exception as e:
+                log.warning(f'Could not get data from Garmin: {e}')
+        if downloaded:
+            # only the new files - the rest of the archive was read above
+            log.info('Running monitor pipelines (again)')
+            run_pipeline(data, PipelineType.READ_MONITOR, force=force, progress=progress,
+                         **uploaded_paths(downloaded, MONITOR), **kargs)
+        elif progress:
+            ProgressTree(0, parent=progress)  # nothing more to read
+    if flags[CALCULATE]:
+        log.info('Running statistics pipelines')
+        run_statistic_pipelines(data, force=force, progress=progress, **kargs)
+    maintain_after_ingest(data, sum(metric.rows or 0 for metric in data.sys.get_metrics(run=run)))
@@ -1,15 +1,18 @@
 
+from heapq import heappush, heappop
 from logging import getLogger
 from os.path import exists
 
-from matplotlib import use
-from matplotlib.pyplot import show, figure
+import numpy as np
 
-from .args import ACTIVITY, base_system_path, THUMBNAIL, BASE
+from .args import ACTIVITY, BASE, ALL, FORCE
 from ..data.query import Statistics
 from ..names import Names
+from ..pipeline.calculate.thumbnail import ThumbnailCalculator, thumbnail_path, PNG, SVG
+from ..pipeline.pipeline import run_pipeline
 from ..pipeline.read.segment import SegmentReader
-from ..sql import ActivityJournal
+from ..sql import ActivityJournal, Pipeline, PipelineType
+from ..sql.types import short_cls
 
 log = getLogger(__name__)
 
@@ -22,11 +25,29 @@ def thumbnail(args, data):
     > ch2 thumbnail DATE
 
 Generate a thumbnail map of the activity route.
+
+    > ch2 thumbnail --all [--force]
+
+Generate all missing thumbnails (in parallel), so that the web interface only needs to read files.
     '''
+    if args[ALL]:
+        create_all(data, force=args[FORCE])
+    else:
+        with data.db.session_context() as s:
+            activity_id = parse_activity(s, args[ACTIVITY])
+            # display(s, activity_id)
+            create_in_cache(args[BASE], s, activity_id)
+
+
+def create_all(data, force=False):
     with data.db.session_context() as s:
-        activity_id = parse_activity(s, args[ACTIVITY])
-        # display(s, activity_id)
-        create_in_cache(args[BASE], s, activity_id)
+        configured = Pipeline.count(s, PipelineType.CALCULATE, like=[short_cls(ThumbnailCalculator)])
+    if configured:
+        run_pipeline(data, PipelineType.CALCULATE, like=[short_cls(ThumbnailCalculator)], force=force)
+    else:
+        # older configurations don't include the pipeline, and workers need a pipeline id
+        log.warning('Thumbnail pipeline not configured; rendering in a single process')
+        ThumbnailCalculator(data, force=force, n_cpu=1).run()
 
 
 def parse_activity(s, text):
@@ -41,30 +62,30 @@ def read_activity(s, activity_id, decimate=10):
         activity_journal = s.query(ActivityJournal).filter(ActivityJournal.id == activity_id).one()
         df = Statistics(s, activity_journal=activity_journal). \
             by_name(SegmentReader, Names.SPHERICAL_MERCATOR_X, Names.SPHERICAL_MERCATOR_Y).df
-        return df.iloc[::decimate, :]
+        return df[[Names.SPHERICAL_MERCATOR_X, Names.SPHERICAL_MERCATOR_Y]].iloc[::decimate, :]
     except:
         raise Exception(f'{activity_id} is not a valid activity ID')
 
 
 def stats(zs):
-    lo, hi = min(zs), max(zs)
+    lo, hi = zs.min(), zs.max()
     mid = (lo + hi) / 2
     return lo, mid, hi, hi - lo
 
 
-def normalize(points):
-    xs, ys = zip(*points)
+def normalize(xs, ys):
     xlo, xmid, xhi, dx = stats(xs)
     ylo, ymid, yhi, dy = stats(ys)
     if dx > dy:
         ylo -= (dx - dy) / 2
     else:
         xlo -= (dy - dx) / 2
-    d = max(dx, dy)
-    return [(x - xlo) / d - 0.5 for x in xs], [(y - ylo) / d - 0.5 for y in ys], d
+    d = max(dx, dy) or 1
+    return (xs - xlo) / d - 0.5, (ys - ylo) / d - 0.5, d
 
 
 def make_figure(xs, ys, side, grid, cm, border):
+    from matplotlib.pyplot import figure
     fig = figure(frameon=False)
     fig.set_size_inches(cm / 2.54, cm / 2.54)
     ax = fig.add_subplot(1, 1, 1)
@@ -88,27 +109,94 @@ def make_figure(xs, ys, side, grid, cm, border):
 
 
 def fig_from_df(df, grid=10, cm=1.5, border=0.2):
-    points = [(x, y) for _, (x, y) in df.iterrows()]
-    if points:
-        xs, ys, side = normalize(points)
+    df = df.dropna()
+    if len(df):
+        xs, ys, side = normalize(df.iloc[:, 0].values, df.iloc[:, 1].values)
     else:
         xs, ys, side = [0, 0], [0, 0], 1
     return make_figure(xs, ys, side, grid, cm, border)
 
 
+def simplify(xs, ys, budget):
+    '''
+    Douglas-Peucker simplification to (at most) budget points.
+
+    Rather than fix a tolerance, segments are split in order of decreasing distance until the
+    budget is reached, which gives the same points as the tolerance that would keep that many.
+    '''
+
+    def split(i, j):
+        if j - i > 1:
+            dx, dy = xs[j] - xs[i], ys[j] - ys[i]
+            px, py = xs[i+1:j] - xs[i], ys[i+1:j] - ys[i]
+            length = np.hypot(dx, dy)
+            distance = np.abs(px * dy - py * dx) / length if length else np.hypot(px, py)
+            k = np.argmax(distance)
+            heappush(heap, (-distance[k], i, j, i + 1 + k))
+
+    n = len(xs)
+    if n <= budget: return xs, ys
+    keep, heap = [0, n - 1], []
+    split(0, n - 1)
+    while heap and len(keep) < budget:
+        _, i, j, k = heappop(heap)
+        keep.append(k)
+        split(i, k)
+        split(k, j)
+    keep = sorted(keep)
+    return xs[keep], ys[keep]
+
+
+def svg_from_df(df, grid=10, cm=1.5, border=0.2, budget=60):
+    df = df.dropna()
+    if len(df):
+        xs, ys, side = normalize(df.iloc[:, 0].values, df.iloc[:, 1].values)
+        xs, ys = simplify(xs, -ys, budget)  # svg y axis points down
+    else:
+        xs, ys, side = np.zeros(2), np.zeros(2), 1
+    lim = 0.5 * (1 + border)
+    km = 1000 / side
+    n = int(lim / (grid * km)) + 1
+    ticks = [km * d * grid for d in range(-n, n+1)]
+    ticks = [tick for tick in ticks if -lim < tick < lim]
+    unit = 2 * lim / (cm * 72 / 2.54)  # one point in svg units
+    grid = ''.join(f'M{tick:.3f} {-lim:.3f}V{lim:.3f}M{-lim:.3f} {tick:.3f}H{lim:.3f}' for tick in ticks)
+    points = ' '.join(f'{x:.3f},{y:.3f}' for x, y in zip(xs, ys))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{cm}cm" height="{cm}cm" '
+            f'viewBox="{-lim} {-lim} {2 * lim} {2 * lim}">'
+            f'<path d="{grid}" stroke="#535353" stroke-width="{0.8 * unit:.3f}"/>'
+            f'<polyline points="{points}" fill="none" stroke="white" stroke-width="{1.5 * unit:.3f}" '
+            f'stroke-linejoin="round"/>'
+            f'<circle cx="{xs[0]:.3f}" cy="{ys[0]:.3f}" r="{1.5 * cm * unit:.3f}" fill="green"/>'
+            f'<circle cx="{xs[-1]:.3f}" cy="{ys[-1]:.3f}" r="{0.75 * cm * unit:.3f}" fill="red"/>'
+            f'</svg>')
+
+
 def display(s, activity_id):
+    from matplotlib import use
+    from matplotlib.pyplot import show
     df = read_activity(s, activity_id)
     use('PyQt5')
     fig = fig_from_df(df)
     show()
 
 
-def create_in_cache(base, s, activity_id):
-    path = base_system_path(base, subdir=THUMBNAIL, file=f'{activity_id}.png')
-    if not exists(path):
+def create_in_cache(base, s, activity_id, format=PNG):
+    path = thumbnail_path(base, activity_id, format=format)
+    if exists(path):
+        pass
+    elif format == SVG:
+        # full resolution, since simplify is smarter than decimation
+        svg = svg_from_df(read_activity(s, activity_id, decimate=1))
+        with open(path, 'w') as output:
+            output.write(svg)
+    else:
+        from matplotlib import use
+        from matplotlib.pyplot import close
         df = read_activity(s, activity_id)
         use('agg')
         fig = fig_from_df(df)
         fig.savefig(path, transparent=True)
+        close(fig)  # otherwise figures accumulate when rendering many
     log.info(f'Thumbnail in {path}')
     return path
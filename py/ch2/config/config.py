@@ -21,6 +21,7 @@ from ..pipeline.calculate.nearby import SimilarityCalculator, NearbyCalculator
 from ..pipeline.calculate.response import ResponseCalculator
 from ..pipeline.calculate.segment import SegmentCalculator
 from ..pipeline.calculate.summary import SummaryCalculator
+from ..pipeline.calculate.thumbnail import ThumbnailCalculator
 from ..pipeline.display.activity.achievement import AchievementDelegate
 from ..pipeline.display.activity.utils import ActivityDisplayer, ActivityDelegate
 from ..pipeline.display.activity.jupyter import JupyterDelegate
@@ -173,6 +174,7 @@ your FF-model parameters (fitness and fatigue).
         self._load_standard_statistics(s, c)
         self._load_summary_statistics(s, c)
         add_statistics(s, AchievementCalculator, c, owner_in=short_cls(ActivityCalculator))
+        add_statistics(s, ThumbnailCalculator, c)
 
     def _load_diary_pipeline(self, s, c):
         add_displayer(s, DiaryDisplayer, c)
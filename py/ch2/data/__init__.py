@@ -4,13 +4,25 @@ from .frame import session, nearby_activities, bookmarks, present, linear_resamp
     groups_by_time, transform, drop_empty, read_query
 from .heart_rate import *
 from .lib import chisq, fit, inplace_decay
-from .plot import col_to_boxstats, box_plot, line_plotter, dot_plotter, bar_plotter, add_climbs, multi_plot, \
-    multi_dot_plot, multi_bar_plot, multi_line_plot, map_thumbnail, map_intensity, map_plot, histogram_plot, \
-    cumulative_plot, htile, vtile, comparison_line_plot, map_intensity_signed, add_hr_zones, \
-    add_multi_line_at_index, std_distance_time_plot, add_band, get_renderer, add_curve, add_climb_zones
 from .power import fit_power
 from .query import Statistics, std_health_statistics, std_activity_statistics
 from ..pipeline.display.activity.nearby import nearby_earlier, nearby_any_time
 
 # avoid cleaning of imports
 nearby_earlier, nearby_any_time, session, Statistics
+
+# plotting pulls in bokeh (slow to import), so is only loaded when one of these is used
+PLOT = ('col_to_boxstats', 'box_plot', 'line_plotter', 'dot_plotter', 'bar_plotter', 'add_climbs', 'multi_plot',
+        'multi_dot_plot', 'multi_bar_plot', 'multi_line_plot', 'map_thumbnail', 'map_intensity', 'map_plot',
+        'histogram_plot', 'cumulative_plot', 'htile', 'vtile', 'comparison_line_plot', 'map_intensity_signed',
+        'add_hr_zones', 'add_multi_line_at_index', 'std_distance_time_plot', 'add_band', 'get_renderer', 'add_curve',
+        'add_climb_zones')
+
+__all__ = [name for name in globals() if not name.startswith('_') and name != 'PLOT'] + list(PLOT)
+
+
+def __getattr__(name):
+    if name in PLOT:
+        from . import plot
+        return getattr(plot, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
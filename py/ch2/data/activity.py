@@ -5,8 +5,8 @@ import numpy as np
 import pandas as pd
 from math import atan2, cos, sin, sqrt, pi
 
-from .frame import linear_resample, median_dt, present, linear_resample_time
-from ..lib.data import safe_dict
+from .frame import median_dt, present, linear_resample_time
+from ..lib.data import safe_dict, safe_none
 from ..names import Names
 
 log = getLogger(__name__)
@@ -39,20 +39,39 @@ def copy_times(ajournal):
             Names.TIME: (ajournal.finish - ajournal.start).total_seconds()}
 
 
+def distance_time(df):
+    # distance (km) and elapsed time (s) as sorted arrays, keeping the last time for repeated distances
+    distance = df[Names.DISTANCE].values
+    time = (df.index.values - df.index.values[0]).astype(np.int64) / 1e9
+    ok = ~np.isnan(distance)
+    distance, time = distance[ok], time[ok]
+    order = np.argsort(distance, kind='stable')
+    distance, time = distance[order], time[order]
+    last = np.append(distance[1:] != distance[:-1], True)
+    return distance[last], time[last]
+
+
+def resample_distance_time(distance, time, delta):
+    # time at regular (quantised) distance intervals, restricted to the range of the data
+    start, finish = int(distance[0] / delta) * delta, (1 + int(distance[-1] / delta)) * delta
+    grid = np.arange(start, finish, delta)
+    lo, hi = np.searchsorted(grid, distance[0], side='left'), np.searchsorted(grid, distance[-1], side='right')
+    return np.interp(grid[lo:hi], distance, time)
+
+
 @safe_dict
 def times_for_distance(df, km=None, delta=0.01):  # all units of km
     stats, km = {}, km or round_km()
-    tmp = pd.DataFrame({Names.TIME: df.index}, index=df[Names.DISTANCE])
-    tmp = tmp[~tmp.index.duplicated(keep='last')]
-    t4d = pd.DataFrame({Names.TIME: (tmp[Names.TIME] - tmp[Names.TIME].iloc[0]).astype(np.int64) / 1e9},
-                       index=df[Names.DISTANCE])
-    lt4d = linear_resample(t4d, d=delta)
-    for target in km:
-        n = target / delta
-        dlt4d = lt4d.diff(periods=n).dropna()
-        if present(dlt4d, Names.TIME):
-            stats[Names.MIN_KM_TIME % target] = dlt4d[Names.TIME].min()
-            stats[Names.MED_KM_TIME % target] = dlt4d[Names.TIME].median()
+    distance, time = distance_time(df)
+    if len(distance) > 1:
+        # elapsed time is cumulative, so the time for each distance is a difference at a fixed offset
+        time = resample_distance_time(distance, time, delta)
+        for target in km:
+            n = int(round(target / delta))
+            if 0 < n < len(time):
+                dtime = time[n:] - time[:-n]
+                stats[Names.MIN_KM_TIME % target] = dtime.min()
+                stats[Names.MED_KM_TIME % target] = np.median(dtime)
     return stats
 
 
@@ -70,54 +89,80 @@ def hrz_stats(df, zones=None):
     return stats
 
 
+@safe_none
+def resample_active(df, delta=10):
+    # a single resample in time that can be shared between the max_xxx_stats below
+    ldf = linear_resample_time(df, dt=delta, with_timespan=False, add_time=False)
+    active = ldf[Names.TIMESPAN_ID].isin(df[Names.TIMESPAN_ID].unique()).values
+    return ldf, active
+
+
+def windowed_sums(values, n):
+    # sums over all windows of n consecutive values (nan if the window ends on a missing value)
+    cumsum = np.cumsum(np.nan_to_num(values))
+    cumsum[np.isnan(values)] = np.nan
+    return cumsum[n:] - cumsum[:-n]
+
+
 @safe_dict
-def max_mean_stats(df, params=((Names.POWER_ESTIMATE, Names.MAX_MEAN_PE_M),), mins=None, delta=10, zero=0):
+def max_mean_stats(df, params=((Names.POWER_ESTIMATE, Names.MAX_MEAN_PE_M),), mins=None, delta=10, zero=0,
+                   resampled=None):
     stats, mins = {}, mins or MAX_MINUTES
-    ldf = linear_resample_time(df, dt=delta, with_timespan=True, keep_nan=True)
+    ldf, active = resampled or resample_active(df, delta=delta)
+    active = active & ldf[Names.TIMESPAN_ID].notna().values
     for name, template in params:
         if name in ldf.columns:
-            ldf.loc[ldf[Names.TIMESPAN_ID].isnull(), [name]] = zero
-            cumsum = ldf[name].cumsum()
+            values = np.where(active, ldf[name].values, zero).astype(float)
             for target in mins:
                 n = (target * 60) // delta
-                diff = cumsum.diff(periods=n).dropna()
-                if present(diff, name):
-                    stats[template % target] = diff.max() / n
+                if 0 < n < len(values):
+                    sums = windowed_sums(values, n)
+                    sums = sums[~np.isnan(sums)]
+                    if len(sums):
+                        stats[template % target] = sums.max() / n
         else:
             log.warning(f'Missing {name}')
     return stats
 
 
 @safe_dict
-def max_med_stats(df, params=((Names.HEART_RATE, Names.MAX_MED_HR_M),), mins=None, delta=10, gap=0.01):
+def max_med_stats(df, params=((Names.HEART_RATE, Names.MAX_MED_HR_M),), mins=None, delta=10, gap=0.01,
+                  resampled=None):
     stats, mins = {}, mins or MAX_MINUTES
-    ldf_all = linear_resample_time(df, dt=delta, with_timespan=False, add_time=False)
-    ldf_all.interpolate('nearest')
-    ldf_tstamp = ldf_all.loc[ldf_all[Names.TIMESPAN_ID].isin(df[Names.TIMESPAN_ID].unique())].copy()
-    ldf_tstamp.loc[:, 'gap'] = ldf_tstamp.index.astype(np.int64) / 1e9
-    ldf_tstamp.loc[:, 'gap'] = ldf_tstamp['gap'].diff()
-    log.debug(f'Largest gap is {ldf_tstamp["gap"].max()}s')
+    ldf, active = resampled or resample_active(df, delta=delta)
+    active = np.flatnonzero(active)
+    # gaps[i] is the time between active[i] and active[i+1]
+    gaps = np.diff(ldf.index.values[active]).astype(np.int64) / 1e9
+    log.debug(f'Largest gap is {gaps.max() if len(gaps) else np.nan}s')
     for target in mins:
         n = target * 60 // delta
         log.debug(f'Target {target}m is {n} samples (delta {delta}s)')
-        splits, remain = [], ldf_all.copy()
         max_gap = max(gap * target * 60, 1.5 * delta)
-        for after in ldf_tstamp.index[ldf_tstamp['gap'] > max_gap].tolist():
-            before = ldf_tstamp.index[ldf_tstamp.index.get_loc(after)-1]
-            splits.append(remain.loc[:before])
-            remain = remain.loc[after:]
-        splits.append(remain)
-        log.debug(f'Split data into {len(splits)} sections for {target}m with max gap of {max_gap}s')
+        # index ranges (lo inclusive, hi exclusive) that avoid large gaps
+        breaks = np.flatnonzero(gaps > max_gap)
+        lo = np.concatenate([[0], active[breaks + 1]])
+        hi = np.concatenate([active[breaks] + 1, [len(ldf)]])
+        log.debug(f'Split data into {len(lo)} sections for {target}m with max gap of {max_gap}s')
         for name, template in params:
-            stat_name = template % target
-            for split in splits:
-                split['med'] = split[name].rolling(n).median()
-                if present(split, 'med'):
-                    max_med = split['med'].dropna().max()
-                    if stat_name in stats:
-                        stats[stat_name] = max(stats[stat_name], max_med)
-                    else:
-                        stats[stat_name] = max_med
+            if name not in ldf.columns:
+                log.warning(f'Missing {name}')
+                continue
+            values, stat_name = ldf[name].values, template % target
+            for a, b in zip(lo, hi):
+                if b - a >= n:
+                    med = pd.Series(values[a:b]).rolling(n).median().dropna()
+                    if len(med):
+                        max_med = med.max()
+                        stats[stat_name] = max(stats.get(stat_name, max_med), max_med)
+    return stats
+
+
+def best_effort_stats(df, delta=10):
+    # all best efforts for an activity, with a single resample in time
+    resampled = resample_active(df, delta=delta)
+    stats = times_for_distance(df)
+    stats.update(max_med_stats(df, delta=delta, resampled=resampled))
+    stats.update(max_mean_stats(df, delta=delta, resampled=resampled))
     return stats
 
 
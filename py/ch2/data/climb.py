@@ -6,8 +6,8 @@ from logging import getLogger
 
 import numpy as np
 
-from .frame import linear_resample, present
-from ..lib.data import nearest_index, get_index_loc, safe_yield, safe_none
+from .frame import linear_resample
+from ..lib.data import nearest_index, safe_yield, safe_none
 from ..names import Names as N
 from ..sql import StatisticName, StatisticJournal, Source
 
@@ -38,9 +38,11 @@ Climb = namedtuple('Climb', 'phi, min_elevation, min_gradient, max_gradient, max
 @safe_yield
 def find_climbs(df, params=Climb()):
     df = df.drop_duplicates(subset=[N.DISTANCE])
-    by_dist = df.set_index(df[N.DISTANCE])
+    by_dist = df[[N.ELEVATION]].set_index(df[N.DISTANCE])
     by_dist = linear_resample(by_dist, quantise=False)
-    for dlo, dhi in find_climb_distances(by_dist, params=params):
+    distance, elevation = by_dist.index.values, by_dist[N.ELEVATION].values
+    for ilo, ihi in find_climb_ranges(distance, elevation, 0, len(elevation), params=params):
+        dlo, dhi = distance[ilo], distance[ihi]
         tlo, thi = nearest_index(df, N.DISTANCE, dlo), nearest_index(df, N.DISTANCE, dhi)
         log.debug(f'Found climb from {tlo} - {thi} ({dlo}km - {dhi}km)')
         up = df[N.ELEVATION].loc[thi] - df[N.ELEVATION].loc[tlo]
@@ -59,41 +61,34 @@ def find_climbs(df, params=Climb()):
         yield climb
 
 
-def find_climb_distances(df, params=Climb()):
-    mn, mx = df[N.ELEVATION].min(), df[N.ELEVATION].max()
-    if mx - mn > params.min_elevation:
-        score, lo, hi = biggest_climb(df, params=params)
+# the functions below work with numpy arrays of (evenly spaced) distance and elevation.
+# rather than copying sections of data they pass around index ranges (lo inclusive, hi exclusive)
+# into the original arrays (or return indices relative to the array views they are given).
+
+def find_climb_ranges(distance, elevation, lo, hi, params=Climb()):
+    # yields (ilo, ihi) index pairs (both inclusive) for each climb
+    known = elevation[lo:hi][~np.isnan(elevation[lo:hi])]
+    if len(known) and known.max() - known.min() > params.min_elevation:
+        score, ilo, ihi = biggest_climb(distance, elevation, lo, hi, params=params)
         if score:
-            a, b, c = split(df, lo, hi)
-            yield from find_climb_distances(a, params=params)
-            yield from contiguous(b, params=params)
-            yield from find_climb_distances(c, params=params)
-
-
-def split(df, lo, hi, inside=True):
-    ilo, ihi = get_index_loc(df, lo), get_index_loc(df, hi)
-    if ilo > ihi:
-        ilo, ihi = ihi, ilo
-    if inside:
-        ihi += 1
-    else:
-        ilo += 1
-    return df.iloc[:ilo].copy(), df.iloc[ilo:ihi].copy(), df.iloc[ihi:].copy()
+            yield from find_climb_ranges(distance, elevation, lo, ilo, params=params)
+            yield from contiguous(distance, elevation, ilo, ihi + 1, params=params)
+            yield from find_climb_ranges(distance, elevation, ihi + 1, hi, params=params)
 
 
-def contiguous(df, params=Climb()):
-    up = df[N.ELEVATION].iloc[-1] - df[N.ELEVATION].iloc[0]
+def contiguous(distance, elevation, lo, hi, params=Climb()):
+    up = elevation[hi-1] - elevation[lo]
     if up >= params.min_elevation:
-        down, lo, hi = biggest_reversal(df)
+        down, rlo, rhi = biggest_reversal(elevation[lo:hi])
         if down and down > params.max_reversal * up:
-            a, b, c = split(df, lo, hi, inside=False)
-            yield from contiguous(a, params=params)
-            yield from find_climb_distances(b, params=params)
-            yield from contiguous(c, params=params)
+            ilo, ihi = lo + min(rlo, rhi), lo + max(rlo, rhi)
+            yield from contiguous(distance, elevation, lo, ilo + 1, params=params)
+            yield from find_climb_ranges(distance, elevation, ilo + 1, ihi, params=params)
+            yield from contiguous(distance, elevation, ihi, hi, params=params)
         else:
-            along = df.index[-1] - df.index[0]
+            along = distance[hi-1] - distance[lo]
             if along and PERCENT * up / along < params.max_gradient:
-                yield df.index[0], df.index[-1]
+                yield lo, hi-1
 
 
 def first_or_none(generator):
@@ -103,52 +98,54 @@ def first_or_none(generator):
         return None
 
 
-def biggest_reversal(df):
-    max_elevation, max_indices, d = 0, (None, None), df.index[1] - df.index[0]
-    for offset in range(1, len(df)-1):
-        df[N._delta(N.ELEVATION)] = df[N.ELEVATION].diff(-offset)
-        if present(df, N._delta(N.ELEVATION)):
-            d_elevation = df[N._delta(N.ELEVATION)].dropna().max()
-            if d_elevation > max_elevation:
-                max_elevation = d_elevation
-                hi = df.loc[df[N._delta(N.ELEVATION)] == max_elevation].index[0]  # break ties
-                lo = df.index[get_index_loc(df, hi) + offset]
-                max_indices = (lo, hi)
+def biggest_reversal(elevation):
+    # returns (drop, ilo, ihi) where ilo is the (later) low point and ihi the (earlier) high point
+    max_elevation, max_indices = 0, (None, None)
+    for offset in range(1, len(elevation)-1):
+        d_elevation = elevation[:-offset] - elevation[offset:]
+        known = d_elevation[~np.isnan(d_elevation)]
+        if len(known):
+            max_d_elevation = known.max()
+            if max_d_elevation > max_elevation:
+                max_elevation = max_d_elevation
+                hi = np.flatnonzero(d_elevation == max_elevation)[0]  # break ties
+                max_indices = (hi + offset, hi)
     return max_elevation, max_indices[0], max_indices[1]
 
 
-def biggest_climb(df, params=Climb(), grid=10):
-    # returns (score, dlo, dhi))
-    # use distances (indices) rather than ilocs because we're subdividing the data
-    if len(df) > 100 * grid:
-        score, lo, hi = search(df.iloc[::grid].copy())
+def biggest_climb(distance, elevation, lo, hi, params=Climb(), grid=10):
+    # returns (score, ilo, ihi) with indices into the full arrays
+    if hi - lo > 100 * grid:
+        score, ilo, ihi = search(distance[lo:hi:grid], elevation[lo:hi:grid])
         if score:
-            # need to pass through iloc to extend range
-            ilo, ihi = get_index_loc(df, lo), get_index_loc(df, hi)
-            return search(df.iloc[max(0, ilo-grid):min(ihi+grid, len(df)-1)].copy(), params=params)
+            # extend range on the full resolution data
+            flo, fhi = lo + max(0, ilo * grid - grid), lo + min(ihi * grid + grid, hi - lo - 1)
+            score, ilo, ihi = search(distance[flo:fhi], elevation[flo:fhi], params=params)
+            return (score, flo + ilo, flo + ihi) if score else (0, None, None)
         else:
             return 0, None, None
     else:
-        return search(df, params=params)
+        score, ilo, ihi = search(distance[lo:hi], elevation[lo:hi], params=params)
+        return (score, lo + ilo, lo + ihi) if score else (0, None, None)
 
 
-def search(df, params=Climb()):
-    # returns (score, dlo, dhi)
-    # use times (indices) rather than ilocs because we're subdividing the data
-    max_score, max_indices, d = 0, (None, None), df.index[1] - df.index[0]
-    for offset in range(len(df)-1, 0, -1):
-        df[N._delta(N.ELEVATION)] = df[N.ELEVATION].diff(offset)
+def search(distance, elevation, params=Climb()):
+    # returns (score, ilo, ihi) with indices into the arrays given
+    max_score, max_indices, d = 0, (None, None), distance[1] - distance[0]
+    for offset in range(len(elevation)-1, 0, -1):
+        d_elevation = elevation[offset:] - elevation[:-offset]
         d_distance = d * offset
         min_elevation = max(params.min_elevation, params.min_gradient * d_distance / PERCENT)
-        if df[N._delta(N.ELEVATION)].max() > min_elevation:  # avoid some work
+        above = d_elevation > min_elevation
+        if above.any():  # avoid some work
             # factor of 1000 below to convert km to m
-            df[SCORE] = (df[N._delta(N.ELEVATION)] / (1000 * d_distance)) ** params.phi
-            score = df.loc[df[N._delta(N.ELEVATION)] > min_elevation, SCORE].max()
-            if not np.isnan(score) and score > max_score:
-                max_score = score
-                hi = df.loc[df[SCORE] == max_score].index[0]  # arbitrarily pick one if tied (error here w item())
-                lo = df.index[get_index_loc(df, hi) - offset]
-                max_indices = (lo, hi)
+            with np.errstate(invalid='ignore'):
+                score = (d_elevation / (1000 * d_distance)) ** params.phi
+            max_offset_score = score[above].max()
+            if max_offset_score > max_score:
+                max_score = max_offset_score
+                ilo = np.flatnonzero(score == max_score)[0]  # arbitrarily pick one if tied
+                max_indices = (ilo, ilo + offset)
     return max_score, max_indices[0], max_indices[1]
 
 
@@ -1,15 +1,17 @@
 
 import datetime as dt
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from functools import lru_cache
 from logging import getLogger
-from re import escape
+from re import escape, sub
+from threading import Lock
+from time import perf_counter
 
-from sqlalchemy import union, intersect, not_
+from sqlalchemy import union, intersect, not_, bindparam
 from sqlalchemy.orm import aliased
 
 from ..lib import local_time_to_time, to_time
 from ..lib.peg import transform, choice, pattern, sequence, Recursive, drop, exhaustive, single
-from ..lib.utils import timing
 from ..names import UNDEF
 from ..sql import ActivityJournal, StatisticName, StatisticJournalType, ActivityGroup, ActivityTopicJournal, Source, \
     FileHash, StatisticJournal
@@ -97,19 +99,90 @@ def trace(f):
     return wrapper
 
 
+# parsed and checked constraints, with values replaced by parameters, are cached (as sql statements).
+# the compiled sql is also cached (by sqlalchemy), so similar queries share the same statement.
+MAX_CACHE = 256
+STATEMENTS = {}
+COMPILED = {}
+CACHE_LOCK = Lock()  # the web server searches from several threads
+TIMINGS = defaultdict(float)
+
+Parameter = namedtuple('Parameter', 'name, types')
+
+
 def constrained_sources(s, query, conversion=None):
-    with timing('parse AST'):
-        ast = constraint(query)[0]
+    start = perf_counter()
+    template, values = parse_constraint(query)
+    parsed = perf_counter()
+    statement, cached = cached_statement(s, template, conversion)
+    built = perf_counter()
+    results = s.query(Source).from_statement(statement).params(**values). \
+        execution_options(compiled_cache=COMPILED).all()
+    executed = perf_counter()
+    TIMINGS['parse'] += parsed - start
+    TIMINGS['build'] += built - parsed
+    TIMINGS['execute'] += executed - built
+    log.debug(f'Constraint {"(cached) " if cached else ""}parse {1000 * (parsed - start):.1f}ms, '
+              f'build {1000 * (built - parsed):.1f}ms, execute {1000 * (executed - built):.1f}ms '
+              f'({len(results)} results)')
+    return results
+
+
+def normalise(query):
+    # collapse whitespace outside quoted strings
+    return sub(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|\s+''',
+               lambda m: m.group(1) or ' ', query).strip()
+
+
+def parse_constraint(query):
+    '''
+    Returns an AST where values are replaced by parameters, and the values for those parameters.
+    '''
+    return _parse_constraint(normalise(query))
+
+
+@lru_cache(MAX_CACHE)
+def _parse_constraint(query):
+    ast = constraint(query)[0]
     log.debug(f'AST: {ast}')
+    values = {}
+    return to_template(ast, values), values
+
+
+def to_template(ast, values):
+    l, op, r = ast
+    if op in (AND, OR):
+        return to_template(l, values), op, to_template(r, values)
+    elif r is None:
+        return ast  # null values change the query structure
+    else:
+        name = f'p{len(values)}'
+        values[name] = r
+        return l, op, Parameter(name, tuple(infer_types(r)))
+
+
+def cached_statement(s, template, conversion):
+    key = (str(s.get_bind().engine.url), template, conversion)
+    statement = STATEMENTS.get(key)  # a single read, since another thread may clear the cache
+    if statement is not None:
+        return statement, True
     attrs = set()
-    with timing('check AST'):
-        check_constraints(s, ast, attrs)
+    check_constraints(s, template, attrs)
     log.debug('Checked constraints')
-    with timing('build SQL'):
-        q = build_source_query(s, ast, attrs, conversion=conversion)
+    q = build_source_query(s, template, attrs, conversion=conversion)
     log.debug(f'Query: {q}')
-    with timing('execute SQL'):
-        return q.all()
+    # labelled so that sqlalchemy uses the same statement (and so compiled cache) on each call
+    statement = q.with_labels().statement
+    with CACHE_LOCK:
+        if len(STATEMENTS) >= MAX_CACHE:
+            STATEMENTS.clear()
+            COMPILED.clear()
+        STATEMENTS[key] = statement
+    return statement, False
+
+
+def bind(value):
+    return bindparam(value.name) if isinstance(value, Parameter) else value
 
 
 def check_constraints(s, ast, attrs):
@@ -122,6 +195,7 @@ def check_constraints(s, ast, attrs):
 
 
 def infer_types(value):
+    if isinstance(value, Parameter): return list(value.types)
     if value is None: return list(StatisticJournalType)
     if isinstance(value, str): return [StatisticJournalType.TEXT]
     if isinstance(value, dt.datetime): return [StatisticJournalType.TIMESTAMP]
@@ -149,7 +223,8 @@ def check_statistic_name(s, qname, value):
                StatisticName.statistic_journal_type.in_(infer_types(value)))
     if owner: q = q.filter(StatisticName.owner.like(owner))
     if not q.count():
-        raise Exception(f'No match for statistic {qname} for type {value.__class__.__name__}')
+        types = ', '.join(type.name for type in infer_types(value))
+        raise Exception(f'No match for statistic {qname} for type {types}')
 
 
 def check_source_property(qname, value):
@@ -199,9 +274,9 @@ def build_property(s, ast):
     op_attr = get_op_attr(op, value)
     q = s.query(cls.id)
     if attr == 'nlike':
-        q = q.filter(not_(getattr(cls, attr).ilike(value)))
+        q = q.filter(not_(getattr(cls, attr).ilike(bind(value))))
     else:
-        q = q.filter(getattr(getattr(cls, attr), op_attr)(value))
+        q = q.filter(getattr(getattr(cls, attr), op_attr)(bind(value)))
     return q
 
 
@@ -209,6 +284,7 @@ def build_property(s, ast):
 def build_comparisons(s, ast, with_conversion):
     qname, op, value = ast
     owner, name, group = StatisticName.parse(qname, default_activity_group=UNDEF)
+    types = infer_types(value)
     if value is None:
         if op == '=':
             return get_source_ids_for_null(s, owner, name, group, with_conversion), True
@@ -216,9 +292,9 @@ def build_comparisons(s, ast, with_conversion):
             return aliased(union(*[get_source_ids(s, owner, name, op, value, group, type)
                                    for type in StatisticJournalType
                                    if type != StatisticJournalType.STATISTIC])).select(), False
-    elif isinstance(value, str):
+    elif types == [StatisticJournalType.TEXT]:
         return get_source_ids(s, owner, name, op, value, group, StatisticJournalType.TEXT), False
-    elif isinstance(value, dt.datetime):
+    elif types == [StatisticJournalType.TIMESTAMP]:
         return get_source_ids(s, owner, name, op, value, group, StatisticJournalType.TIMESTAMP), False
     else:
         qint = get_source_ids(s, owner, name, op, value, group, StatisticJournalType.INTEGER)
@@ -228,7 +304,7 @@ def build_comparisons(s, ast, with_conversion):
 
 def get_op_attr(op, value):
     attrs = {'=': '__eq__', '!=': '__ne__', '>': '__gt__', '>=': '__ge__', '<': '__lt__', '<=': '__le__'}
-    if isinstance(value, str): attrs.update({'=': 'ilike', '!=': 'nlike'})
+    if infer_types(value) == [StatisticJournalType.TEXT]: attrs.update({'=': 'ilike', '!=': 'nlike'})
     return attrs[op]
 
 
@@ -247,9 +323,9 @@ def get_source_ids(s, owner, name, op, value, group, type):
         else:
             q = q.filter(Source.activity_group_id == None)
     if op_attr == 'nlike':  # no way to negate like in a single attribute
-        q = q.filter(not_(statistic_journal.value.ilike(value)))
+        q = q.filter(not_(statistic_journal.value.ilike(bind(value))))
     else:
-        q = q.filter(getattr(statistic_journal.value, op_attr)(value))
+        q = q.filter(getattr(statistic_journal.value, op_attr)(bind(value)))
     return q
 
 
@@ -20,7 +20,7 @@ def decay_params(period):
     return decay, alpha
 
 
-def inplace_decay(data, column, period):
+def decay(series, period):
     # ewm has y(t) = y(t-1) * (1 - alpha) + alpha * x(t)
     # we want y(t) = y(t-1) * exp(-dt/T) + x(t)
     # clearly that won't work exactly, but we can get to within a scaling
@@ -31,8 +31,11 @@ def inplace_decay(data, column, period):
     decay = exp(-1 / period)
     alpha = 1 - decay
     log.debug(f'Exponential decay: {decay}; alpha: {alpha}; period {period} (intervals)')
-    data[column] = data[column] / alpha
-    data[column] = data[column].ewm(alpha=alpha, adjust=False).mean()
+    return (series / alpha).ewm(alpha=alpha, adjust=False).mean()
+
+
+def inplace_decay(data, column, period):
+    data[column] = decay(data[column], period)
 
 
 def fit(observed, modeled, initial_data, initial_params, evaluate, *vary,
@@ -65,24 +68,26 @@ def fit(observed, modeled, initial_data, initial_params, evaluate, *vary,
 
 def chisq(observed, modeled, data):
     delta = (data[observed] - data[modeled]).dropna()
-    return sum(delta * delta)
+    return (delta * delta).sum()
 
 
 def auto_fit(observed, modeled, initial_data, initial_params, evaluate, *vary,
              tol=0.01, forwards=None, backwards=None, max_iter=3):
-    count, prev_csq = 0, None
-    data = evaluate(initial_data, initial_params)
+    # each fit starts from the previous result (with a tighter tolerance)
+    count, prev_csq, params = 0, None, initial_params
+    data = evaluate(initial_data, params)
     csq = chisq(observed, modeled, data)
     while count < max_iter:
         abs_tol = tol * csq
         log.debug(f'Fitting with tol={abs_tol} (chisq {csq})')
-        result = fit(observed, modeled, initial_data, initial_params, evaluate, *vary,
+        params = fit(observed, modeled, initial_data, params, evaluate, *vary,
                      tol=abs_tol, forwards=forwards, backwards=backwards)
-        data = evaluate(initial_data, result)
+        data = evaluate(initial_data, params)
         csq = chisq(observed, modeled, data)
         if prev_csq is not None and abs(prev_csq - csq) / csq < tol:
-            return result
+            return params
         count, prev_csq = count + 1, csq
+    return params
 
 
 def interpolate_to_index(df, extra, *names):
@@ -10,9 +10,6 @@ from bokeh.models import PanTool, ZoomInTool, ZoomOutTool, ResetTool, HoverTool,
     ColumnDataSource
 from bokeh.plotting import figure
 from math import sqrt
-from sklearn.linear_model import Ridge
-from sklearn.pipeline import make_pipeline
-from sklearn.preprocessing import PolynomialFeatures
 
 from .utils import tooltip, make_range
 from ..frame import present
@@ -357,6 +354,9 @@ def add_band(f, x, ylo, yhi, source, color, alpha=0.3, y_range_name='default'):
 def add_curve(f, x, y, source, group_size=30, color='black', alpha=1, smooth=1, y_range_name='default'):
     if f:
         # https://scikit-learn.org/stable/auto_examples/linear_model/plot_polynomial_interpolation.html
+        from sklearn.linear_model import Ridge  # slow to import and rarely used
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import PolynomialFeatures
         source = source[[x, y]].dropna()
         degree = min(10, max(1, len(source) // group_size))
         log.debug(f'Fitting polynomial of degree {degree} (ridge alpha {smooth})')
@@ -4,59 +4,96 @@ from logging import getLogger
 
 # hide from imports of this package
 import numpy as _np
+import pandas as _pd
 import scipy as _sp
 from math import pi
 
 from .frame import median_dt
-from .lib import fit, inplace_decay
-from ..lib.data import tmp_name, safe_first
+from .lib import fit, decay
+from ..lib.data import safe_first
 from ..names import Names as N
 
 log = getLogger(__name__)
 RAD_TO_DEG = 180 / pi
 
 
-def add_differentials(df, max_gap=None):
+def add_differentials(df, max_gap=None, starts=None):
     return _add_differentials(df, N.SPEED, N.DISTANCE, N.ELEVATION, N.SPEED, N.SPEED_2,
-                              N.LATITUDE, N.LONGITUDE, max_gap=max_gap)
+                              N.LATITUDE, N.LONGITUDE, max_gap=max_gap, starts=starts)
 
 
 @safe_first
-def add_air_speed(df, wind_speed=0, wind_heading=0, max_gap=None):
+def add_air_speed(df, wind_speed=0, wind_heading=0, max_gap=None, starts=None):
     df[N.AIR_SPEED] = df[N.SPEED] + wind_speed * _np.cos((df[N.HEADING] - wind_heading) / RAD_TO_DEG)
-    return _add_differentials(df, N.AIR_SPEED, N.AIR_SPEED, max_gap=max_gap)
+    return _add_differentials(df, N.AIR_SPEED, N.AIR_SPEED, max_gap=max_gap, starts=starts)
 
 
-def _add_differentials(df, speed, *names, max_gap=None):
+def find_gaps(df, max_gap=None, starts=None):
+    '''
+    Rows that do not continue from the previous row: the first row, any row more than max_gap seconds
+    after the previous, and (when several activities are stacked) the first row of each activity.
+    '''
+    gaps = _np.ones(len(df), dtype=bool)
+    if max_gap:
+        gaps[1:] = _np.diff(df.index.values) / _np.timedelta64(1, 's') > max_gap
+    else:
+        gaps[1:] = False
+    if starts is not None:
+        gaps |= starts
+    return gaps
+
+
+def _add_differentials(df, speed, *names, max_gap=None, starts=None):
 
     # rather than use timespans (old approach) it's more reliable to discard any intervals
     # over a certain time gap.
 
+    gaps = find_gaps(df, max_gap=max_gap, starts=starts)
+
     speed_2 = N._sqr(speed)
     df[speed_2] = df[speed] ** 2
 
-    tmp = tmp_name()
-    df[tmp] = df.index
-    df[tmp] = df[tmp].diff().dt.seconds
-
     for name in names:
-        df[N._delta(name)] = df[name].diff()
-        df.loc[df[tmp] > max_gap, [N._delta(name)]] = _np.nan
+        df[N._delta(name)] = df[name].diff().mask(gaps)
 
     if N.LATITUDE in names and N.LONGITUDE in names and N.HEADING not in df.columns and \
             not df[N._delta(N.LONGITUDE)].dropna().empty and not df[N._delta(N.LATITUDE)].dropna().empty:
         df[N.HEADING] = _np.arctan2(df[N._delta(N.LONGITUDE)], df[N._delta(N.LATITUDE)]) * RAD_TO_DEG
-        df.loc[df[tmp] > max_gap, [N.HEADING]] = _np.nan
 
-    avg_speed_2 = [(a**2 + a*b + b**2)/3 for a, b in zip(df[speed], df[speed][1:])]
-    df[N._avg(speed_2)] = [_np.nan] + avg_speed_2
-    if max_gap:
-        df.loc[df[tmp] > max_gap, [N._avg(speed_2)]] = _np.nan
+    a, b = df[speed].shift(), df[speed]
+    df[N._avg(speed_2)] = ((a ** 2 + a * b + b ** 2) / 3).mask(gaps)
 
-    df.drop(columns=[tmp], inplace=True)
     return df
 
 
+def stack_activities(dfs):
+    '''
+    Combine the frames for several activities so that they can be evaluated together.
+    Returns the combined frame and a boolean array marking the first row of each activity
+    (the starts argument to the functions here).
+    '''
+    lengths = [len(df) for df in dfs]
+    starts = _np.zeros(sum(lengths), dtype=bool)
+    starts[_np.cumsum([0] + lengths[:-1])[_np.array(lengths) > 0]] = True
+    return _pd.concat(dfs), starts
+
+
+def unstack_activities(df, starts):
+    return [df.iloc[lo:hi] for lo, hi in zip(*_activity_ranges(starts))]
+
+
+def _activity_ranges(starts):
+    lo = _np.flatnonzero(starts)
+    return lo, _np.append(lo[1:], len(starts))
+
+
+def _by_activity(series, starts, f):
+    if starts is None:
+        return f(series)
+    else:
+        return series.groupby(_np.cumsum(starts), sort=False).transform(f)
+
+
 @safe_first
 def add_energy_budget(df, m, g=9.8):
     # if DELTA_ELEVATION is +ve we've gone uphill.  so this is the total amount of energy
@@ -86,25 +123,31 @@ def add_loss_estimate(df, m, cda=0.45, crr=0, p=1.225, g=9.8):
 
 
 @safe_first
-def add_power_estimate(df):
+def add_power_estimate(df, starts=None):
     # power input must balance the energy budget.
-    df[N.POWER_ESTIMATE] = (df[N.DELTA_ENERGY] + df[N.LOSS]) / df[N.DELTA_TIME].dt.total_seconds()
-    df[N.POWER_ESTIMATE].clip(lower=0, inplace=True)
-    if N.CADENCE in df.columns: df.loc[df[N.CADENCE] < 1, [N.POWER_ESTIMATE]] = 0
-    df.loc[df[N.POWER_ESTIMATE].isna(), [N.POWER_ESTIMATE]] = 0
-    energy = (df[N.POWER_ESTIMATE].iloc[1:] * df[N.DELTA_TIME].iloc[1:]).cumsum()
-    df[N.ENERGY] = 0
-    df.loc[1:, [N.ENERGY]] = energy
+    seconds = df[N.DELTA_TIME].dt.total_seconds()
+    power = ((df[N.DELTA_ENERGY] + df[N.LOSS]) / seconds).clip(lower=0)
+    if N.CADENCE in df.columns: power = power.mask(df[N.CADENCE] < 1, 0)
+    df[N.POWER_ESTIMATE] = power.fillna(0)
+    work = df[N.POWER_ESTIMATE] * seconds
+    if starts is None:
+        work.iloc[:1] = 0
+    else:
+        work[starts] = 0
+    df[N.ENERGY] = _by_activity(work.fillna(0), starts, lambda x: x.cumsum())
     return df
 
 
-def add_modeled_hr(df, window, slope, delay):
+def add_modeled_hr(df, window, slope, delay, starts=None):
     dt = median_dt(df)
     window, delay = int(0.5 + window / dt), delay / dt
-    df[N.DETRENDED_HEART_RATE] = df[N.HEART_RATE] - df[N.HEART_RATE].rolling(window, center=True, min_periods=1).median()
-    df[N.PREDICTED_HEART_RATE] = df[N.POWER_ESTIMATE] * slope
-    inplace_decay(df, N.PREDICTED_HEART_RATE, delay)
-    df[N.PREDICTED_HEART_RATE] -= df[N.PREDICTED_HEART_RATE].rolling(window, center=True, min_periods=1).median()
+
+    def detrend(x):
+        return x - x.rolling(window, center=True, min_periods=1).median()
+
+    df[N.DETRENDED_HEART_RATE] = _by_activity(df[N.HEART_RATE], starts, detrend)
+    df[N.PREDICTED_HEART_RATE] = _by_activity(df[N.POWER_ESTIMATE] * slope, starts,
+                                              lambda x: detrend(decay(x, delay)))
     return df
 
 
@@ -134,22 +177,33 @@ PowerModel = namedtuple('PowerModel', 'cda, crr, slope, window, delay, m,  wind_
                         defaults=[0.5, 0,   200,   60*60,  13.5,  70, 0,          0])
 
 
-def evaluate(df, model, quiet=True):
+def evaluate(df, model, quiet=True, starts=None):
     if not quiet: log.debug(f'Evaluating {model}')
     df = add_energy_budget(df, model.m)
-    df = add_air_speed(df, model.wind_speed, model.wind_heading)
+    df = add_air_speed(df, model.wind_speed, model.wind_heading, starts=starts)
     df = add_loss_estimate(df, model.m, cda=model.cda, crr=model.crr)
-    df = add_power_estimate(df)
+    df = add_power_estimate(df, starts=starts)
     return df
 
 
+def evaluate_activities(dfs, model, max_gap=None, quiet=True):
+    '''
+    Add differentials and evaluate the model for many activities in a single pass over
+    a combined frame (eg when refitting parameters across history).
+    Returns the combined frame and the starts array (see stack_activities).
+    '''
+    df, starts = stack_activities(dfs)
+    df = add_differentials(df, max_gap=max_gap, starts=starts)
+    return evaluate(df, model, quiet=quiet, starts=starts), starts
+
+
 MIN_DELAY = 1
 
 
-def fit_power(df, model, *vary, tol=0.1):
+def fit_power(df, model, *vary, tol=0.1, starts=None):
 
     log.debug(f'Fit power: varying {vary}')
-    df = evaluate(df, model)
+    df = evaluate(df, model, starts=starts)
     slope, intercept, delay = measure_initial_scaling(df)
     # we ignore intercept because removing the median makes it very weakly constrained
     model = model._replace(slope=slope, delay=delay)
@@ -169,8 +223,8 @@ def fit_power(df, model, *vary, tol=0.1):
         return kargs
 
     def evaluate_and_extend(df, model):
-        df = evaluate(df, model)
-        df = add_modeled_hr(df, model.window, model.slope, model.delay)
+        df = evaluate(df, model, starts=starts)
+        df = add_modeled_hr(df, model.window, model.slope, model.delay, starts=starts)
         return df
 
     model = fit(N.DETRENDED_HEART_RATE, N.PREDICTED_HEART_RATE, df, model, evaluate_and_extend,
@@ -5,10 +5,11 @@ from logging import getLogger
 
 import numpy as np
 from math import exp
-from pandas import DataFrame, Series
+from pandas import DataFrame, Series, date_range
 from scipy import optimize
+from scipy.signal import lfilter
 
-from .lib import decay_params, inplace_decay
+from .lib import decay_params
 from ..lib.data import safe_dict
 from ..names import Titles, like, N, SPACE
 
@@ -32,18 +33,40 @@ def sum_to_hour(source, column):
     return data
 
 
-def calc_response(data, params):
-    # data is a DataFrame mainly because that's what inplace_decay takes
-    response = data.rename(columns={IMPULSE_3600: RESPONSE})  # copy
+def decay_response(impulses, period, initial=0):
+    # the numpy equivalent of inplace_decay: y(t) = y(t-1) * exp(-dt/T) + x(t), with y(-1) = initial.
+    # this is a simple IIR filter, so can be evaluated in C by lfilter.
+    decay, alpha = decay_params(period)
+    return lfilter([1], [1, -decay], impulses, zi=[decay * initial])[0]
+
+
+def response_values(impulses, params, initial=None):
+    # impulses is a numpy array (evenly sampled).
+    # if initial is given then the response continues from that value (one sample before the impulses).
     period = 10 ** params[LOG10_PERIOD]
-    if len(params) > LOG10_START:
-        decay, alpha = decay_params(period)
-        # correct by alpha so that the value matches the plot (see decay_inplace)
-        start = 10 ** params[LOG10_START] * alpha
-        # we replace the very first value which is strictly cheating, but there are so many...
-        response.at[response.index[0], RESPONSE] = start
-    inplace_decay(response, RESPONSE, period)
-    return response[RESPONSE]
+    decay, alpha = decay_params(period)
+    if initial is None:
+        if len(params) > LOG10_START:
+            # correct by alpha so that the value matches the plot (see decay_inplace)
+            # we replace the very first value which is strictly cheating, but there are so many...
+            impulses = np.array(impulses, dtype=float)
+            impulses[0] = 10 ** params[LOG10_START] * alpha
+        # match inplace_decay, which takes the first value as x(0) / alpha
+        initial = impulses[0] / alpha if len(impulses) else 0
+    return decay_response(impulses, period, initial=initial)
+
+
+def calc_response(data, params, initial=None):
+    # data is a DataFrame (typically from sum_to_hour)
+    # initial allows the response to continue from a checkpoint (the value at the hour before the data)
+    values = response_values(data[IMPULSE_3600].values.astype(float), params, initial=initial)
+    return Series(values, index=data.index, name=RESPONSE)
+
+
+def extend_to_hour(data, start, finish):
+    # data from sum_to_hour, padded with zeroes so that it covers every hour after start until finish
+    index = date_range(start=start + dt.timedelta(hours=1), end=finish, freq='1h')
+    return data.reindex(index=data.index.union(index), fill_value=0).loc[start + dt.timedelta(hours=1):]
 
 
 def restrict_response(response, performances):
@@ -52,6 +75,12 @@ def restrict_response(response, performances):
             for performance in performances]
 
 
+def nearest_positions(index, performances):
+    # the positions in the (response) index of the values that restrict_response would select.
+    # calculating these once means that restricting a response is just indexing an array.
+    return [index.get_indexer(performance.index, method='nearest') for performance in performances]
+
+
 def calc_observed(measureds, performances):
     # this is a bit tricky.  we don't know the exact relationship between 'fitness' and how fast we are.
     # all we know is that it should track changes in a useful manner.
@@ -134,17 +163,24 @@ def fit_ff_params(data, params, performances, method='L1', max_reject=0, thresho
     # data should be a DataFrame with an IMPULSE3600 entry
     # performances should be Series
     # threshold can be None, a value, or a pair.  a pair gives +ve and -ve thresholds
+    # each fit (after rejecting a point) starts from the previous optimum
 
     result, rejected = None, []
-
-    def cost(params):
-        response = calc_response(data, params)
-        restricted = restrict_response(response, performances)
-        observed = calc_observed(restricted, performances)
-        return calc_cost(restricted, observed, method=method)
+    # extract the impulses once, rather than copying the DataFrame on each evaluation
+    impulses = data[IMPULSE_3600].values.astype(float)
 
     while True:
+        positions = nearest_positions(data.index, performances)
+
+        def cost(params):
+            response = response_values(impulses, params)
+            restricted = [Series(response[position], performance.index)
+                          for position, performance in zip(positions, performances)]
+            observed = calc_observed(restricted, performances)
+            return calc_cost(restricted, observed, method=method)
+
         result = optimize.minimize(cost, params, **kargs)
+        params = result.x
         print(fmt_params(result.x))
         print(f'Currently have {len(rejected)} dropped points (max {max_reject})')
         if len(rejected) >= max_reject:
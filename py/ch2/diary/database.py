@@ -1,12 +1,15 @@
 
+from collections import defaultdict
 from logging import getLogger
 
+from sqlalchemy.orm import contains_eager, with_polymorphic
+
 from .model import text, value
 from ..lib import to_date
 from ..lib.date import YMD
 from ..pipeline.calculate.summary import SummaryCalculator
 from ..pipeline.display.utils import Displayer
-from ..sql import StatisticJournal, Pipeline, PipelineType, StatisticName
+from ..sql import StatisticJournal, Pipeline, PipelineType, StatisticName, Interval
 
 log = getLogger(__name__)
 
@@ -44,12 +47,51 @@ def read_pipeline(session, date, schedule=None):
                 yield data
 
 
+def session_cache(s, key, read):
+    '''
+    values that are expensive to read and do not change while a diary is displayed are cached in the session.
+    '''
+    cache = s.info.setdefault(__name__, {})
+    if key not in cache:
+        cache[key] = read()
+    return cache[key]
+
+
+def statistic_names_like(s, pattern, owner):
+    return session_cache(s, ('names', pattern, owner),
+                         lambda: [statistic_name.name
+                                  for statistic_name in s.query(StatisticName).
+                                      filter(StatisticName.name.like(pattern),
+                                             StatisticName.owner == owner).all()])
+
+
+def interval_journals(s, interval, owner):
+    '''
+    the statistics for the interval, read (in a single query) along with those for all other intervals
+    with the same schedule and start (ie all activity groups).
+    '''
+
+    def read():
+        journal = with_polymorphic(StatisticJournal, '*')
+        by_interval = defaultdict(list)
+        for statistic_journal in s.query(journal). \
+                join(StatisticName, StatisticName.id == journal.statistic_name_id). \
+                join(Interval, Interval.id == journal.source_id). \
+                options(contains_eager(journal.statistic_name)). \
+                filter(Interval.schedule == interval.schedule,
+                       Interval.start == interval.start,
+                       StatisticName.owner == owner). \
+                order_by(journal.source_id, journal.statistic_name_id).all():
+            by_interval[statistic_journal.source_id].append(statistic_journal)
+        return by_interval
+
+    return session_cache(s, ('intervals', str(interval.schedule), interval.start, owner), read)[interval.id]
+
+
 def interval_column(s, interval, name, owner):
-    statistic_journals = s.query(StatisticJournal). \
-        join(StatisticName). \
-        filter(StatisticJournal.source == interval,
-               StatisticName.owner == owner,
-               StatisticName.name.like('%' + name)).all()
+    if not interval: return
+    statistic_journals = [statistic_journal for statistic_journal in interval_journals(s, interval, owner)
+                          if statistic_journal.statistic_name.name.endswith(name)]
     for named, statistic_journal in enumerate(statistic_journal
                                               for statistic_journal in statistic_journals
                                               if statistic_journal.value != 0):
@@ -128,9 +128,11 @@ class GarminConnect:
         log.info('Downloaded data for %s to %s' % (date, path))
 
     def get_monitoring_to_fit_file(self, date, data_dir, old_format=False):
+        # returns the file dicts written (new format only) so that the caller can read just those
         from ...commands.read import write_file, DATA, hash_file, NAME, parse_fit_data, build_path
         response = self.get_monitoring(date)
         zipfile = ZipFile(BytesIO(response.content))
+        files = []
         for name in zipfile.namelist():
             if old_format:
                 path = zipfile.extract(name, path=data_dir)
@@ -141,3 +143,5 @@ class GarminConnect:
                 parse_fit_data(file)
                 build_path(data_dir, file)
                 write_file(file)
+                files.append(file)
+        return files
@@ -0,0 +1,141 @@
+
+import datetime as dt
+from collections import namedtuple
+from logging import getLogger
+from math import sin, cos, radians
+from random import Random
+from struct import pack, calcsize
+
+from .format.tokens import Checksum, FIT
+from .profile.types import time_to_timestamp
+
+log = getLogger(__name__)
+
+# synthetic FIT files (used for benchmarks).
+# only the small subset of the FIT format needed to write activity and monitor files is supported:
+# a 14 byte header, definition and data messages (no compressed timestamps or developer fields),
+# and the final checksum.
+
+BaseType = namedtuple('BaseType', 'code, format')
+
+ENUM = BaseType(0x00, 'B')
+UINT8 = BaseType(0x02, 'B')
+UINT16 = BaseType(0x84, 'H')
+SINT32 = BaseType(0x85, 'i')
+UINT32 = BaseType(0x86, 'I')
+UINT32Z = BaseType(0x8c, 'I')
+
+# global message numbers and (field number, type) pairs, in the order values are given
+FILE_ID = 0, ((0, ENUM), (1, UINT16), (2, UINT16), (3, UINT32Z), (4, UINT32))
+SPORT = 12, ((0, ENUM), (1, ENUM))
+EVENT = 21, ((253, UINT32), (0, ENUM), (1, ENUM))
+RECORD = 20, ((253, UINT32), (0, SINT32), (1, SINT32), (78, UINT32), (3, UINT8), (5, UINT32), (73, UINT32),
+              (4, UINT8))
+MONITORING_INFO = 103, ((253, UINT32), (0, UINT32))
+MONITORING = 55, ((253, UINT32), (5, ENUM), (3, UINT32), (27, UINT8))
+
+# enum values from the profile
+ACTIVITY_FILE, MONITORING_B_FILE = 4, 32
+DEVELOPMENT = 255
+CYCLING = 2
+TIMER, START, STOP_ALL = 0, 0, 4
+WALKING = 6
+
+SEMICIRCLES = 2 ** 31 / 180
+M_PER_DEG = 111320
+
+
+class FitWriter:
+    '''
+    Accumulate messages and return the data for a complete FIT file.
+    '''
+
+    def __init__(self, protocol_version=0x10, profile_version=0x07de):
+        self.__protocol_version = protocol_version
+        self.__profile_version = profile_version
+        self.__records = bytearray()
+        self.__formats = {}
+        self.__local = {}
+
+    def write(self, message, *values):
+        number, fields = message
+        if number not in self.__local:
+            self.__define(number, fields)
+        local = self.__local[number]
+        self.__records += pack(self.__formats[local], local, *values)
+
+    def __define(self, number, fields):
+        local = len(self.__local)
+        if local > 15: raise Exception('Too many message types')
+        self.__local[number] = local
+        self.__formats[local] = '<B' + ''.join(type.format for _, type in fields)
+        self.__records += pack('<BBBHB', 0x40 | local, 0, 0, number, len(fields))
+        for field, type in fields:
+            self.__records += pack('<BBB', field, calcsize(type.format), type.code)
+
+    def data(self):
+        header = pack('<BBHI4s', 14, self.__protocol_version, self.__profile_version, len(self.__records), FIT)
+        data = header + pack('<H', Checksum.crc(header)) + self.__records
+        return data + pack('<H', Checksum.crc(data))
+
+
+def synthetic_activity(start, n_records, seed=0, latitude=-33.4, longitude=-70.6):
+    '''
+    A ride of n_records seconds, starting at the given time, around a loop near the given position,
+    with varying speed, heart rate, elevation and cadence.
+    '''
+    random = Random(seed)
+    writer = FitWriter()
+    writer.write(FILE_ID, ACTIVITY_FILE, DEVELOPMENT, 0, seed + 1, time_to_timestamp(start))
+    writer.write(EVENT, time_to_timestamp(start), TIMER, START)
+    writer.write(SPORT, CYCLING, 0)
+    radius = 1000 + random.uniform(0, 2000)  # m
+    distance, heart_rate = 0, 100
+    for i in range(n_records):
+        time = time_to_timestamp(start) + i
+        speed = 6 + 2 * sin(i / 300) + random.gauss(0, 0.3)
+        distance += speed
+        angle = distance / radius
+        lat = latitude + radius * sin(angle) / M_PER_DEG
+        lon = longitude + radius * (1 - cos(angle)) / (M_PER_DEG * cos(radians(latitude)))
+        altitude = 800 + 50 * sin(3 * angle)
+        target = 140 + 10 * sin(i / 600)
+        heart_rate = min(190, max(60, heart_rate + random.gauss(0, 1) + (target - heart_rate) / 30))
+        cadence = 80 + random.randint(-5, 5)
+        writer.write(RECORD, time, int(lat * SEMICIRCLES), int(lon * SEMICIRCLES), int((altitude + 500) * 5),
+                     int(heart_rate), int(distance * 100), int(speed * 1000), cadence)
+    writer.write(EVENT, time_to_timestamp(start) + n_records - 1, TIMER, STOP_ALL)
+    return writer.data()
+
+
+def synthetic_monitor(start, n_records, seed=0):
+    '''
+    Monitor data at one minute intervals, starting at the given time, with cumulative steps
+    (reset every 24 hours from start) and heart rate.
+    '''
+    random = Random(seed)
+    writer = FitWriter()
+    writer.write(FILE_ID, MONITORING_B_FILE, DEVELOPMENT, 0, seed + 1, time_to_timestamp(start))
+    writer.write(MONITORING_INFO, time_to_timestamp(start), time_to_timestamp(start))
+    steps = 0
+    for i in range(n_records):
+        minute = i % (24 * 60)
+        if not minute: steps = 0
+        active = 8 * 60 < minute < 22 * 60
+        if active: steps += random.randint(0, 100)
+        heart_rate = 50 + (20 if active else 0) + random.randint(-5, 5)
+        writer.write(MONITORING, time_to_timestamp(start) + 60 * i, WALKING, steps, heart_rate)
+    return writer.data()
+
+
+def synthetic_files(n_activities, activity_records, n_monitors, monitor_records,
+                    start=dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)):
+    '''
+    Generate (name, data) pairs - one activity and / or monitor file per day.
+    '''
+    for i in range(n_activities):
+        time = start + dt.timedelta(days=i, hours=12)
+        yield f'activity-{i}.fit', synthetic_activity(time, activity_records, seed=i)
+    for i in range(n_monitors):
+        time = start + dt.timedelta(days=i)
+        yield f'monitor-{i}.fit', synthetic_monitor(time, monitor_records, seed=i)
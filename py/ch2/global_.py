@@ -31,8 +31,10 @@ def global_data():
 
 def set_global_state(args):
     from .sql.system import Data
-    from .commands.args import DEV, BASE
+    from .sql.database import PROFILER
+    from .commands.args import DEV, BASE, PROFILE_SQL
     set_global_dev(args[DEV])
+    if args[PROFILE_SQL]: PROFILER.enable()
     make_log_from_args(args)
     data = Data(args[BASE])
     set_global_data(data)
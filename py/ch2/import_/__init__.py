@@ -3,17 +3,20 @@ from logging import getLogger
 
 from sqlalchemy.orm.exc import NoResultFound
 
-from ..commands.args import DB_VERSION
+from ..commands.args import DB_VERSION, SQLITE, POSTGRESQL
 from ..commands.database import database_really_exists
-from ..lib import format_date, time_to_local_date, to_time
+from ..lib import to_time
 from ..sql import StatisticJournal, StatisticName, StatisticJournalType
-from ..sql.database import sqlite_uri, postgresql_uri
+from ..pipeline.loader import SqliteLoader, PostgresqlLoader
+from ..sql.database import sqlite_uri, postgresql_uri, scheme
 from ..sql.tables.statistic import STATISTIC_JOURNAL_CLASSES
 from ..sql.types import short_cls
-from ..sql.utils import add
 
 log = getLogger(__name__)
 
+BATCH = 1000
+LOADERS = {SQLITE: SqliteLoader, POSTGRESQL: PostgresqlLoader}
+
 
 def journal_imported(record, new, cls, name, allow_time_zero=False):
     # true if already installed
@@ -44,36 +47,79 @@ def match_statistic_name(record, old_statistic_name, new_s, owner):
                       f'for {short_cls(owner)}')
 
 
-def copy_statistic_journal(record, old_s, old, old_statistic_name, old_statistic_journal,
-                           new_s, new_statistic_name, source, name=None):
-    name = name if name else new_statistic_name.name
+def read_statistic_journals(old_s, old, old_statistic_name, *conditions):
+    '''
+    old statistic journal entries (id, time, source_id, value) for the given statistic name, in a single query.
+    '''
+    statistic_journal = old.meta.tables['statistic_journal']
     old_journals = {StatisticJournalType.INTEGER.value: old.meta.tables['statistic_journal_integer'],
                     StatisticJournalType.FLOAT.value: old.meta.tables['statistic_journal_float'],
                     StatisticJournalType.TEXT.value: old.meta.tables['statistic_journal_text']}
     old_journal = old_journals[old_statistic_name.statistic_journal_type]
-    old_value = old_s.query(old_journal).filter(old_journal.c.id == old_statistic_journal.id).one()
-    log.debug(f'Resolved old statistic_journal {old_value}')
+    return old_s.query(statistic_journal.c.id, statistic_journal.c.time, statistic_journal.c.source_id,
+                       old_journal.c.value). \
+        join(old_journal, old_journal.c.id == statistic_journal.c.id). \
+        filter(statistic_journal.c.statistic_name_id == old_statistic_name.id, *conditions).all()
+
+
+def time_key(time):
+    # times are stored to 2dp (see sql.types.Time)
+    return int(100 * to_time(time).timestamp())
+
+
+def journal_loader(new_s, owner):
+    # values are written as by the pipelines - with pre-assigned ids and bulk inserts (executemany) per table
+    scheme_ = scheme(str(new_s.get_bind().url))
+    if scheme_ not in LOADERS:
+        raise Exception(f'Unknown scheme: {scheme_}')
+    kargs = {}
+    if scheme_ == POSTGRESQL:
+        # batch inserting is enabled by a session callback, so only once per session
+        kargs['batch'] = not new_s.info.get(__name__)
+        new_s.info[__name__] = True
+    return LOADERS[scheme_](new_s, owner, add_serial=False, clear_timestamp=False, **kargs)
+
+
+def copy_statistic_journals(record, old_journals, new_s, new_statistic_name, new_source_id, name=None):
+    '''
+    copy old entries (from read_statistic_journals) for a single statistic name.
+    new_source_id is called with each old entry and returns the id of the new source.
+    existing values are read in a single query and new values are bulk inserted in batches.
+    '''
+    name = name if name else new_statistic_name.name
     new_journal = STATISTIC_JOURNAL_CLASSES[StatisticJournalType(new_statistic_name.statistic_journal_type)]
-    previous = new_s.query(new_journal). \
-        filter(new_journal.time == old_statistic_journal.time,
-               new_journal.statistic_name == new_statistic_name).one_or_none()
-    # drop ugly auto-titles if nicer ones available (bug fix 0-32 to 0-33)
-    if previous and new_statistic_name.name == 'name' and \
-            new_statistic_name.statistic_journal_type == StatisticJournalType.TEXT and \
-            previous.value.startswith('20'):
-        record.warning(f'Dropping previous ({previous}) for {name}')
-        new_s.delete(previous)
-        new_s.commit()
-        previous = None
-    if previous:
-        record.warning(f'Value already exists for {name} ({previous})')
-    else:
-        new_value = add(new_s,
-                        new_journal(value=old_value.value, time=old_statistic_journal.time,
-                                    statistic_name=new_statistic_name, source=source))
-        new_s.commit()  # avoid logging below if error
-        date = format_date(time_to_local_date(to_time(new_value.time)))
-        record.info(f'Statistic value {new_value.value} at {date} for {name}')
+    previous = {time_key(journal.time): journal
+                for journal in new_s.query(new_journal).filter(new_journal.statistic_name == new_statistic_name).all()}
+    added, loader, n_previous = set(), None, 0
+    for old_journal in old_journals:
+        key = time_key(old_journal.time)
+        journal = previous.get(key)
+        # drop ugly auto-titles if nicer ones available (bug fix 0-32 to 0-33)
+        if journal and new_statistic_name.name == 'name' and \
+                new_statistic_name.statistic_journal_type == StatisticJournalType.TEXT and \
+                journal.value.startswith('20'):
+            record.warning(f'Dropping previous ({journal}) for {name}')
+            new_s.delete(journal)
+            new_s.flush()
+            del previous[key]
+            journal = None
+        if journal or key in added:
+            n_previous += 1
+        else:
+            if not loader: loader = journal_loader(new_s, new_statistic_name.owner)
+            loader.add_journal(new_journal(value=old_journal.value, time=old_journal.time,
+                                           statistic_name_id=new_statistic_name.id,
+                                           source_id=new_source_id(old_journal)))
+            added.add(key)
+            if not len(added) % BATCH:
+                loader.load()
+                loader = None
+    if loader: loader.load()
+    new_s.commit()
+    if n_previous:
+        record.warning(f'{n_previous} value(s) already exist for {name}')
+    if added:
+        record.info(f'{len(added)} value(s) for {name}')
 
 
 def any_attr(instance, *names):
@@ -1,7 +1,7 @@
 
 from logging import getLogger
 
-from . import journal_imported, match_statistic_name, copy_statistic_journal, any_attr
+from . import journal_imported, match_statistic_name, any_attr, read_statistic_journals, copy_statistic_journals
 from ..lib.log import log_current_exception
 from ..sql import ActivityTopicJournal, FileHash, ActivityTopic, ActivityGroup
 from ..names import simple_name
@@ -12,12 +12,13 @@ log = getLogger(__name__)
 def import_activity(record, old, new):
     if not activity_imported(record, new):
         record.info('Importing activity entries')
+        source_ids = {}  # old activity_topic_journal id to new, shared across fields
         with old.session_context() as old_s:
-            copy_activity_topic_fields(record, old_s, old, None, new)
+            copy_activity_topic_fields(record, old_s, old, None, new, source_ids)
             activity_topic = old.meta.tables['activity_topic']
             for old_activity_topic in old_s.query(activity_topic).filter(activity_topic.c.parent_id == None).all():
                 log.info(f'Found old (root) activity_topic {old_activity_topic}')
-                copy_activity_topic_fields(record, old_s, old, old_activity_topic, new)
+                copy_activity_topic_fields(record, old_s, old, old_activity_topic, new, source_ids)
     else:
         record.warning('Activity entries already imported')
 
@@ -26,7 +27,7 @@ def activity_imported(record, new):
     return journal_imported(record, new, ActivityTopicJournal, 'Activity')
 
 
-def copy_activity_topic_fields(record, old_s, old, old_activity_topic, new):
+def copy_activity_topic_fields(record, old_s, old, old_activity_topic, new, source_ids):
     log.debug(f'Trying to copy activity_topic_fields for activity_topic {old_activity_topic}')
     activity_topic_field = old.meta.tables['activity_topic_field']
     for old_activity_topic_field in old_s.query(activity_topic_field). \
@@ -41,32 +42,40 @@ def copy_activity_topic_fields(record, old_s, old, old_activity_topic, new):
             with new.session_context() as new_s:
                 new_statistic_name = match_statistic_name(record, old_statistic_name, new_s, ActivityTopic)
                 copy_activity_topic_journal_entries(record, old_s, old, old_statistic_name, new_s,
-                                                    new_statistic_name)
+                                                    new_statistic_name, source_ids)
         except:
             log_current_exception()
+            source_ids.clear()  # new sources may have been rolled back
     if old_activity_topic:
         parent_id = old_activity_topic.id
         activity_topic = old.meta.tables['activity_topic']
         for old_activity_topic in old_s.query(activity_topic).filter(activity_topic.c.parent_id == parent_id).all():
             log.info(f'Found old activity_topic {old_activity_topic}')
-            copy_activity_topic_fields(record, old_s, old, old_activity_topic, new)
+            copy_activity_topic_fields(record, old_s, old, old_activity_topic, new, source_ids)
 
 
-def copy_activity_topic_journal_entries(record, old_s, old, old_statistic_name, new_s, new_statistic_name):
+def copy_activity_topic_journal_entries(record, old_s, old, old_statistic_name, new_s, new_statistic_name,
+                                        source_ids):
     log.debug(f'Trying to find statistic_journal entries for {old_statistic_name}')
     statistic_journal = old.meta.tables['statistic_journal']
     activity_topic_journal = old.meta.tables['activity_topic_journal']
-    for old_statistic_journal in old_s.query(statistic_journal). \
-            join(activity_topic_journal, statistic_journal.c.source_id == activity_topic_journal.c.id). \
-            filter(statistic_journal.c.statistic_name_id == old_statistic_name.id).all():
-        log.debug(f'Found old statistic_journal {old_statistic_journal}')
-        old_activity_topic_journal = old_s.query(activity_topic_journal). \
-            filter(activity_topic_journal.c.id == old_statistic_journal.source_id).one()
-        log.debug(f'Found old activity_topic_journal {old_activity_topic_journal}')
-        new_activity_topic_journal = create_activity_topic_journal(record, old_s, old, old_activity_topic_journal,
-                                                                   old_statistic_name, new_s)
-        copy_statistic_journal(record, old_s, old, old_statistic_name, old_statistic_journal,
-                               new_s, new_statistic_name, new_activity_topic_journal)
+    old_statistic_journals = read_statistic_journals(
+        old_s, old, old_statistic_name,
+        statistic_journal.c.source_id.in_(old_s.query(activity_topic_journal.c.id)))
+    log.debug(f'Found {len(old_statistic_journals)} old statistic_journal entries')
+
+    def new_source_id(old_statistic_journal):
+        if old_statistic_journal.source_id not in source_ids:
+            old_activity_topic_journal = old_s.query(activity_topic_journal). \
+                filter(activity_topic_journal.c.id == old_statistic_journal.source_id).one()
+            log.debug(f'Found old activity_topic_journal {old_activity_topic_journal}')
+            new_activity_topic_journal = create_activity_topic_journal(record, old_s, old, old_activity_topic_journal,
+                                                                       old_statistic_name, new_s)
+            new_s.flush()
+            source_ids[old_statistic_journal.source_id] = new_activity_topic_journal.id
+        return source_ids[old_statistic_journal.source_id]
+
+    copy_statistic_journals(record, old_statistic_journals, new_s, new_statistic_name, new_source_id)
 
 
 def create_activity_topic_journal(record, old_s, old, old_activity_topic_journal, old_statistic_name, new_s):
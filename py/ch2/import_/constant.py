@@ -1,6 +1,6 @@
 from logging import getLogger
 
-from . import copy_statistic_journal
+from . import read_statistic_journals, copy_statistic_journals
 from ..lib.log import log_current_exception
 from ..sql import StatisticName, Constant, StatisticJournal
 
@@ -69,10 +69,9 @@ def copy_constant(record, old_s, old, old_constant, old_statistic_name, new_s, n
                           StatisticJournal.id == None).count())
     if missing:
         statistic_journal = old.meta.tables['statistic_journal']
-        for old_statistic_journal in old_s.query(statistic_journal). \
-                filter(statistic_journal.c.source_id == old_constant.id,
-                       statistic_journal.c.statistic_name_id == old_constant.statistic_name_id).all():
-            copy_statistic_journal(record, old_s, old, old_statistic_name, old_statistic_journal,
-                                   new_s, new_constant.statistic_name, new_constant, name=old_constant.name)
+        old_statistic_journals = read_statistic_journals(old_s, old, old_statistic_name,
+                                                         statistic_journal.c.source_id == old_constant.id)
+        copy_statistic_journals(record, old_statistic_journals, new_s, new_constant.statistic_name,
+                                lambda old_statistic_journal: new_constant.id, name=old_constant.name)
     else:
         record.warning(f'Constant {old_constant.name} already has values defined')
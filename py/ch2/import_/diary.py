@@ -3,7 +3,8 @@ from logging import getLogger
 
 from sqlalchemy.orm.exc import MultipleResultsFound
 
-from . import journal_imported, match_statistic_name, copy_statistic_journal, clone_with
+from . import journal_imported, match_statistic_name, clone_with, read_statistic_journals, \
+    copy_statistic_journals
 from ..lib.log import log_current_exception
 from ..sql import DiaryTopic, DiaryTopicJournal
 
@@ -14,11 +15,12 @@ def import_diary(record, old, new):
     if not diary_imported(record, new):
         record.info('Importing diary entries')
         log.debug(f'Trying to copy diary topic data from {old} to {new}')
+        source_ids = {}  # old diary_topic_journal id to new, shared across fields
         with old.session_context() as old_s:
             diary_topic = old.meta.tables['diary_topic']
             for old_diary_topic in old_s.query(diary_topic).filter(diary_topic.c.parent_id == None).all():
                 log.info(f'Found old (root) diary_topic {old_diary_topic}')
-                copy_diary_topic_fields(record, old_s, old, old_diary_topic, new)
+                copy_diary_topic_fields(record, old_s, old, old_diary_topic, new, source_ids)
     else:
         record.warning('Diary entries already imported')
 
@@ -27,7 +29,7 @@ def diary_imported(record, new):
     return journal_imported(record, new, DiaryTopicJournal, 'Diary', allow_time_zero=True)
 
 
-def copy_diary_topic_fields(record, old_s, old, old_diary_topic, new):
+def copy_diary_topic_fields(record, old_s, old, old_diary_topic, new, source_ids):
     log.debug(f'Trying to copy diary_topic_fields for diary_topic {old_diary_topic}')
     diary_topic_field = old.meta.tables['diary_topic_field']
     for old_diary_topic_field in old_s.query(diary_topic_field). \
@@ -50,33 +52,40 @@ def copy_diary_topic_fields(record, old_s, old, old_diary_topic, new):
             with new.session_context() as new_s:
                 try:
                     new_statistic_name = match_statistic_name(record, old_statistic_name, new_s, DiaryTopic)
-                    copy_diary_topic_journal_entries(record, old_s, old, old_statistic_name, new_s, new_statistic_name)
+                    copy_diary_topic_journal_entries(record, old_s, old, old_statistic_name, new_s, new_statistic_name,
+                                                     source_ids)
                 except MultipleResultsFound:
                     record.warning(f'Multiple statistics for {old_statistic_name} - '
                                    f'skipping field under topic {old_diary_topic}')
         except:
             log_current_exception()
+            source_ids.clear()  # new sources may have been rolled back
     parent_id = old_diary_topic.id
     diary_topic = old.meta.tables['diary_topic']
     for old_diary_topic in old_s.query(diary_topic).filter(diary_topic.c.parent_id == parent_id).all():
         log.info(f'Found old diary_topic {old_diary_topic}')
-        copy_diary_topic_fields(record, old_s, old, old_diary_topic, new)
+        copy_diary_topic_fields(record, old_s, old, old_diary_topic, new, source_ids)
 
 
-def copy_diary_topic_journal_entries(record, old_s, old, old_statistic_name, new_s, new_statistic_name):
+def copy_diary_topic_journal_entries(record, old_s, old, old_statistic_name, new_s, new_statistic_name,
+                                     source_ids):
     log.debug(f'Trying to find statistic_journal entries for {old_statistic_name}')
     statistic_journal = old.meta.tables['statistic_journal']
     diary_topic_journal = old.meta.tables['diary_topic_journal']
-    for old_statistic_journal in old_s.query(statistic_journal). \
-            join(diary_topic_journal, statistic_journal.c.source_id == diary_topic_journal.c.id). \
-            filter(statistic_journal.c.statistic_name_id == old_statistic_name.id).all():
-        log.debug(f'Found old statistic_journal {old_statistic_journal}')
-        old_diary_topic_journal = old_s.query(diary_topic_journal). \
-            filter(diary_topic_journal.c.id == old_statistic_journal.source_id).one()
-        log.debug(f'Found old diary_topic_journal {old_diary_topic_journal}')
-        new_diary_topic_journal = DiaryTopicJournal.get_or_add(new_s, old_diary_topic_journal.date)
-        log.debug(f'Found new diary_topic_journal {new_diary_topic_journal}')
-        copy_statistic_journal(record, old_s, old, old_statistic_name, old_statistic_journal,
-                               new_s, new_statistic_name, new_diary_topic_journal)
+    old_statistic_journals = read_statistic_journals(
+        old_s, old, old_statistic_name,
+        statistic_journal.c.source_id.in_(old_s.query(diary_topic_journal.c.id)))
+    log.debug(f'Found {len(old_statistic_journals)} old statistic_journal entries')
 
+    def new_source_id(old_statistic_journal):
+        if old_statistic_journal.source_id not in source_ids:
+            old_diary_topic_journal = old_s.query(diary_topic_journal). \
+                filter(diary_topic_journal.c.id == old_statistic_journal.source_id).one()
+            log.debug(f'Found old diary_topic_journal {old_diary_topic_journal}')
+            new_diary_topic_journal = DiaryTopicJournal.get_or_add(new_s, old_diary_topic_journal.date)
+            new_s.flush()
+            log.debug(f'Found new diary_topic_journal {new_diary_topic_journal}')
+            source_ids[old_statistic_journal.source_id] = new_diary_topic_journal.id
+        return source_ids[old_statistic_journal.source_id]
 
+    copy_statistic_journals(record, old_statistic_journals, new_s, new_statistic_name, new_source_id)
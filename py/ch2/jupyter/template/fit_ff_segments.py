@@ -126,7 +126,8 @@ def fit_ff_segments(group, *segment_titles):
     print(result)
     plot_params(result.x, rejected=rejected)
 
-    result, rejected = fit_ff_params(hr3600, (initial_period, 0), copy_of_performances(),
+    # start from the previous optimum
+    result, rejected = fit_ff_params(hr3600, (result.x[0], 0), copy_of_performances(),
                                      method='L1', tol=0.01,
                                      max_reject=n_performances // 2, threshold=(2, 0.2))
     print(result)
@@ -147,7 +148,7 @@ def fit_ff_segments(group, *segment_titles):
     print(result)
     plot_params(result.x, rejected=rejected)
 
-    result, rejected = fit_ff_params(hr3600, (initial_period, 0), copy_of_performances(),
+    result, rejected = fit_ff_params(hr3600, (result.x[0], 0), copy_of_performances(),
                                      method='L2', tol=0.01,
                                      max_reject=n_performances // 2, threshold=(500, 50))
     print(result)
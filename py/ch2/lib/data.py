@@ -7,7 +7,6 @@ from random import choice
 from re import sub, compile
 from string import ascii_letters
 
-import pandas as pd
 from binascii import hexlify
 
 from .log import log_current_exception
@@ -173,6 +172,7 @@ def sorted_numeric_labels(labels, text=None):
 
 
 def interpolate_freq(df, freq, **kargs):
+    import pandas as pd  # not at module level - this module is loaded on startup
     left = pd.DataFrame(index=pd.date_range(df.index.min(), df.index.max(), freq=freq))
     return left_interpolate(left, df, **kargs)
 
@@ -191,6 +191,7 @@ def left_interpolate(left, right, **kargs):
 
 def bookend(df, column=Titles.BOOKMARK):
     # https://stackoverflow.com/questions/53927414/get-only-the-first-and-last-rows-of-each-group-with-pandas
+    import pandas as pd
     g = df.groupby(column)
     return pd.concat([g.head(1), g.tail(1)]).drop_duplicates().sort_index()
 
@@ -7,6 +7,7 @@ from pathlib import Path
 from shutil import get_terminal_size
 
 from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 
 from .date import to_time
 from ..sql.tables.file import FileScan, FileHash
@@ -40,27 +41,36 @@ def data_hash(data):
     return hash.hexdigest()
 
 
-def modified_file_scans(s, paths, owner, force=False):
+def modified_file_scans(s, paths, owner, force=False, hashes=None):
+    '''
+    Return the file scans (for owner) that need processing.
+
+    Existing scans are loaded in a single query.  Every file is hashed (even if the modification
+    time is unchanged, since copies may preserve that) unless the hash is supplied (by path).
+    '''
 
     modified = []
+    hashes = hashes or {}
+    file_scans = dict((file_scan.path, file_scan) for file_scan in
+                      s.query(FileScan).options(joinedload(FileScan.file_hash)).filter(FileScan.owner == owner))
 
     for path in paths:
 
         # log.debug(f'Scanning {path}')
         last_modified = to_time(stat(path).st_mtime)
-        hash = file_hash(path)
-        file_scan_from_path = s.query(FileScan). \
-            filter(FileScan.path == path,
-                   FileScan.owner == owner).one_or_none()
+        hash = hashes.get(path) or file_hash(path)
+        file_scan_from_path = file_scans.get(path)
 
         # get last scan and make sure it's up-to-date
         if file_scan_from_path:
             if hash != file_scan_from_path.file_hash.hash:
-                log.warning('File at %s appears to have changed since last read on %s')
+                log.warning('File at %s appears to have changed since last read on %s',
+                            path, file_scan_from_path.last_scan)
                 file_scan_from_path.file_hash = FileHash.get_or_add(s, hash)
-                file_scan_from_path.last_scan = 0.0
+                file_scan_from_path.last_scan = to_time(0.0)
         else:
             file_scan_from_path = FileScan.add(s, path, owner, hash)
+            file_scans[path] = file_scan_from_path
             s.flush()  # want this to appear in queries below
 
         # only look at hash if we are going to process anyway
@@ -1,7 +1,12 @@
+from atexit import register
 from contextlib import contextmanager
-from logging import getLogger, DEBUG, Formatter, INFO, StreamHandler, WARNING
-from logging.handlers import RotatingFileHandler
+from logging import getLogger, DEBUG, Formatter, INFO, StreamHandler, WARNING, Filter
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from os import environ
+from queue import SimpleQueue
 from sys import exc_info
+from threading import Lock
+from time import monotonic
 from traceback import format_tb
 
 from colorlog import ColoredFormatter
@@ -11,10 +16,15 @@ from ..names import UNDEF
 log = getLogger(__name__)
 
 STDERR_HANDLER = None
+LISTENERS = []
+
+# in the environment so that workers log in the same way
+QUEUE_LOG = 'CH2_QUEUE_LOG'
+FILE_VERBOSITY = 'CH2_FILE_VERBOSITY'
 
 
 def make_log_from_args(args):
-    from ..commands.args import LOG, COMMAND, VERBOSITY, PROGNAME, LOGS, DEV
+    from ..commands.args import LOG, COMMAND, VERBOSITY, PROGNAME, LOGS, DEV, LOG_QUEUE, LOG_VERBOSITY
     name = args[LOG] if LOG in args and args[LOG] else (
             (args[COMMAND] if COMMAND in args and args[COMMAND] else PROGNAME) + f'.{LOG}')
     path = args.system_path(LOGS, name)
@@ -22,21 +32,54 @@ def make_log_from_args(args):
         verbosity = 5 if args[DEV] else 2
     else:
         verbosity = args[VERBOSITY]
-    make_log(path, verbosity=verbosity)
+    if LOG_QUEUE in args and args[LOG_QUEUE]:
+        environ[QUEUE_LOG] = '1'
+    if LOG_VERBOSITY in args and args[LOG_VERBOSITY] is not None:
+        environ[FILE_VERBOSITY] = str(args[LOG_VERBOSITY])
+    make_log(path, verbosity=verbosity, file_verbosity=int(environ.get(FILE_VERBOSITY, 5)),
+             queue=bool(environ.get(QUEUE_LOG)))
+
+
+def verbosity_to_level(verbosity):
+    return 10 * (6 - verbosity)
+
+
+def make_log(path, verbosity=4, file_verbosity=5, queue=False):
+    '''
+    by default, messages are written to the file (and stderr) by the thread that logs them.
 
+    with queue, messages are added to an in-memory queue and written by a background thread, so that
+    slow disks (and stderr) do not delay the caller.  repeated messages (from the same line of code)
+    are also rate-limited.
 
-def make_log(path, verbosity=4):
+    the level of the ch2 logger is the lowest level that is written anywhere, so disabled levels
+    are discarded before any formatting.
+    '''
 
     global STDERR_HANDLER
 
     if not getLogger('ch2').handlers:
 
-        level = 10 * (6 - verbosity)
+        level = verbosity_to_level(verbosity)
 
         file_formatter = Formatter('%(levelname)-8s %(asctime)s: %(message)s')
         file_handler = RotatingFileHandler(path, maxBytes=1e6, backupCount=10)
-        file_handler.setLevel(DEBUG)
+        file_handler.setLevel(verbosity_to_level(file_verbosity))
         file_handler.setFormatter(file_formatter)
+        levels = [file_handler.level]
+
+        stderr_handler = None
+        if verbosity:
+            stderr_formatter = Formatter('%(levelname)8s: %(message)s')
+            STDERR_HANDLER = StreamHandler()
+            STDERR_HANDLER.setLevel(level)
+            STDERR_HANDLER.setFormatter(stderr_formatter)
+            stderr_handler = STDERR_HANDLER
+            levels.append(level)
+
+        if queue:
+            file_handler = queued(file_handler)
+            if stderr_handler: stderr_handler = queued(stderr_handler)
 
         slog = getLogger('sqlalchemy')
         slog.setLevel(WARNING)
@@ -63,7 +106,7 @@ def make_log(path, verbosity=4):
         wlog.addHandler(file_handler)
 
         clog = getLogger('ch2')
-        clog.setLevel(DEBUG)
+        clog.setLevel(min(levels))
         clog.addHandler(file_handler)
 
         # capture logging from an executing module, if one exists
@@ -71,16 +114,67 @@ def make_log(path, verbosity=4):
         xlog.setLevel(DEBUG)
         xlog.addHandler(file_handler)
 
-        if verbosity:
-            stderr_formatter = Formatter('%(levelname)8s: %(message)s')
-            STDERR_HANDLER = StreamHandler()
-            STDERR_HANDLER.setLevel(level)
-            STDERR_HANDLER.setFormatter(stderr_formatter)
-            blog.addHandler(STDERR_HANDLER)
-            tlog.addHandler(STDERR_HANDLER)
-            wlog.addHandler(STDERR_HANDLER)
-            clog.addHandler(STDERR_HANDLER)
-            xlog.addHandler(STDERR_HANDLER)
+        if stderr_handler:
+            blog.addHandler(stderr_handler)
+            tlog.addHandler(stderr_handler)
+            wlog.addHandler(stderr_handler)
+            clog.addHandler(stderr_handler)
+            xlog.addHandler(stderr_handler)
+
+
+def queued(handler):
+    '''
+    a handler that adds messages to a queue, which are then passed to the given handler in a background thread.
+    '''
+    if not LISTENERS: register(stop_log)
+    records = SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.setLevel(handler.level)
+    queue_handler.addFilter(RateLimit())
+    listener = QueueListener(records, handler)
+    listener.start()
+    LISTENERS.append(listener)
+    return queue_handler
+
+
+def stop_log():
+    '''
+    write any queued messages (called on exit).
+    '''
+    while LISTENERS:
+        LISTENERS.pop().stop()
+
+
+class RateLimit(Filter):
+    '''
+    allow at most `limit` messages from any one line of code in each `period` seconds.
+    the number of messages dropped is noted on the next message from that line.
+    warnings and errors are never dropped.
+    '''
+
+    def __init__(self, limit=10, period=60):
+        super().__init__()
+        self.__limit = limit
+        self.__period = period
+        self.__lock = Lock()
+        self.__counts = {}
+
+    def filter(self, record):
+        if record.levelno >= WARNING: return True
+        key = (record.pathname, record.lineno)
+        now = monotonic()
+        with self.__lock:
+            start, count, dropped = self.__counts.get(key, (now, 0, 0))
+            if now - start > self.__period:
+                start, count = now, 0
+            if count < self.__limit:
+                self.__counts[key] = (start, count + 1, 0)
+                if dropped:
+                    record.msg = str(record.msg) + f' ({dropped} similar messages dropped)'
+                return True
+            else:
+                self.__counts[key] = (start, count, dropped + 1)
+                return False
 
 
 def set_log_color(args, sys):
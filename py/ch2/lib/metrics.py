@@ -0,0 +1,91 @@
+
+from contextlib import contextmanager
+from itertools import count
+from logging import getLogger
+from os import environ, getpid
+from time import perf_counter
+
+import psutil as ps
+
+from .date import now
+
+log = getLogger(__name__)
+
+RUN = 'CH2_METRICS_RUN'  # in the environment so that workers share the run
+COUNT = count()
+TOP_QUERIES = 20
+
+
+def new_run():
+    environ[RUN] = f'{now():%Y-%m-%dT%H:%M:%S}-{getpid()}-{next(COUNT)}'
+    log.debug(f'Metrics run {environ[RUN]}')
+    return environ[RUN]
+
+
+def current_run():
+    return environ[RUN] if RUN in environ else new_run()
+
+
+def peak_rss():
+    try:
+        from resource import getrusage, RUSAGE_SELF
+        return getrusage(RUSAGE_SELF).ru_maxrss * 1024  # kB on linux
+    except ImportError:
+        return ps.Process().memory_info().rss  # current rather than peak
+
+
+class Measurement:
+
+    def __init__(self):
+        from ..sql.database import query_count
+        self.__query_count = query_count
+        self.__process = ps.Process()
+        self.start = now()
+        self.__wall = perf_counter()
+        self.__cpu = self.__cpu_time()
+        self.__queries = query_count()
+        self.wall = self.cpu = self.rss = self.queries = None
+
+    def __cpu_time(self):
+        times = self.__process.cpu_times()
+        return times.user + times.system
+
+    def finish(self):
+        self.wall = perf_counter() - self.__wall
+        self.cpu = self.__cpu_time() - self.__cpu
+        self.rss = peak_rss()
+        self.queries = self.__query_count() - self.__queries
+        return self
+
+    def values(self):
+        return dict(start=self.start, wall=self.wall, cpu=self.cpu, rss=self.rss, queries=self.queries)
+
+
+@contextmanager
+def measure():
+    '''
+    Measure wall and cpu time, peak memory, and the number of sql queries (in this thread).
+    '''
+    measurement = Measurement()
+    try:
+        yield measurement
+    finally:
+        measurement.finish()
+
+
+def record_query_profile(data, context, run=None):
+    '''
+    If sql is being profiled, log and save the most expensive statements for the context.
+    '''
+    from ..sql.database import PROFILER
+    if PROFILER.enabled:
+        profiles = PROFILER.pop(context)
+        if profiles:
+            log.info(f'{context}: {sum(profile[1] for profile in profiles)} sql statements in '
+                     f'{sum(profile[2] for profile in profiles):.2f}s')
+            for statement, n, time in profiles[:3]:
+                log.info(f'{time:.2f}s for {n} x {statement[:200]}')
+            try:
+                data.sys.record_query_profiles(run or current_run(), context, getpid(), profiles[:TOP_QUERIES])
+            except Exception as e:
+                log.warning(f'Could not record sql profile for {context}: {e}')
@@ -1,7 +1,10 @@
 from contextlib import contextmanager
+from json import dumps, loads
 from logging import getLogger
 from os import getpid
+from socket import socket, AF_INET, SOCK_DGRAM
 from sys import argv
+from threading import Thread, Condition
 from time import sleep, time
 
 from math import floor
@@ -9,6 +12,7 @@ from math import floor
 from ..commands import args
 from ..commands.args import mm, BASE, VERBOSITY, WORKER, LOG, DEV
 from ..global_ import global_dev
+from ..sql.tables.system import SystemConstant
 from ..sql.types import short_cls
 
 log = getLogger(__name__)
@@ -16,6 +20,10 @@ log = getLogger(__name__)
 DELTA_TIME = 3
 SLEEP_TIME = 1
 REPORT_TIME = 60
+DB_INTERVAL = 5
+PUBLISH_RATE = 4
+STALE_TIME = 30
+LOCALHOST = '127.0.0.1'
 
 
 class Workers:
@@ -95,7 +103,7 @@ def command_root():
                 i = words.index(argv[1])
                 words = words[:i]
             ch2 = ' '.join(words)
-            if 'unittest' in ch2:
+            if 'unittest' in ch2 or 'pytest' in ch2:
                 log.warning(f'Appear to be inside test runner: {ch2}')
                 ch2 = 'python -m ch2'
             log.debug(f'Using command "{ch2}"')
@@ -172,18 +180,112 @@ class ProgressTree:
 
 
 class SystemProgressTree(ProgressTree):
+    '''
+    Progress is published (throttled) to the web server, if running, via ProgressPublisher.
+    The database is updated less often, for other readers and as a fallback.
+    '''
 
-    def __init__(self, system, name, size_or_weights):
+    def __init__(self, system, name, size_or_weights, db_interval=DB_INTERVAL):
         super().__init__(size_or_weights)
         self.system = system
         self.name = name
+        self.__db_interval = db_interval
+        self.__db_percent, self.__db_time = 0, time()
         system.create_progress(name)
+        self.__publisher = ProgressPublisher(system.get_constant(SystemConstant.PROGRESS_PORT, none=True))
 
     def progress(self):
         progress = super().progress()
-        self.system.update_progress(self.name, percent=floor(100 * progress))
+        percent = floor(100 * progress)
+        self.__publisher.publish(self.name, percent)
+        if percent != self.__db_percent and time() - self.__db_time > self.__db_interval:
+            self.system.update_progress(self.name, percent=percent)
+            self.__db_percent, self.__db_time = percent, time()
         return progress
 
     def complete(self):
         super().complete()
         self.system.remove_progress(self.name)
+        self.__publisher.publish(self.name, 100, force=True)
+        self.__publisher.close()
+
+
+class ProgressPublisher:
+    '''
+    Send progress to a ProgressListener over a local UDP socket.
+
+    Messages are dropped if sent faster than rate (per second) or if nothing is listening.
+    '''
+
+    def __init__(self, port, rate=PUBLISH_RATE):
+        self.__port = int(port) if port else None
+        self.__interval = 1 / rate
+        self.__last = {}
+        self.__socket = socket(AF_INET, SOCK_DGRAM) if self.__port else None
+
+    def publish(self, name, percent, force=False):
+        if self.__socket:
+            last_percent, last_time = self.__last.get(name, (None, 0))
+            if force or (percent != last_percent and time() - last_time > self.__interval):
+                try:
+                    message = dumps({'name': name, 'percent': percent, 'pid': getpid()})
+                    self.__socket.sendto(message.encode('utf8'), (LOCALHOST, self.__port))
+                except OSError as e:
+                    log.debug(f'Could not publish progress: {e}')
+                self.__last[name] = (percent, time())
+
+    def close(self):
+        if self.__socket:
+            self.__socket.close()
+            self.__socket = None
+
+
+class ProgressListener:
+    '''
+    Receive progress from ProgressPublisher (in a background thread) so that the web server
+    doesn't need to read the database.
+
+    Values that are not updated within stale seconds are discarded, since the publisher
+    may have died (callers should then fall back to the database).
+    '''
+
+    def __init__(self, stale=STALE_TIME):
+        self.__stale = stale
+        self.__progress = {}  # name -> (percent, time)
+        self.__condition = Condition()
+        self.__socket = socket(AF_INET, SOCK_DGRAM)
+        self.__socket.bind((LOCALHOST, 0))
+        self.port = self.__socket.getsockname()[1]
+        Thread(target=self.__listen, daemon=True, name='progress').start()
+        log.debug(f'Listening for progress on port {self.port}')
+
+    def __listen(self):
+        while True:
+            try:
+                message = loads(self.__socket.recv(1024).decode('utf8'))
+                with self.__condition:
+                    self.__progress[message['name']] = (message['percent'], time())
+                    self.__condition.notify_all()
+            except OSError:
+                return  # closed
+            except Exception as e:
+                log.warning(f'Bad progress message: {e}')
+
+    def __current(self, name):
+        percent, updated = self.__progress.get(name, (None, 0))
+        return percent if time() - updated < self.__stale else None
+
+    def get_percent(self, name):
+        with self.__condition:
+            return self.__current(name)
+
+    def wait_for_change(self, name, percent, timeout):
+        '''
+        Block until the percent differs from that given (or timeout), returning the current value.
+        '''
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__current(name) != percent, timeout=timeout)
+            return self.__current(name)
+
+    def close(self):
+        self.__socket.close()
@@ -13,8 +13,7 @@ from .utils import MultiProcCalculator, ActivityJournalCalculatorMixin, DataFram
 from ..pipeline import OwnerInMixin
 from ..read.segment import SegmentReader
 from ...data import Statistics
-from ...data.activity import active_stats, times_for_distance, hrz_stats, max_med_stats, max_mean_stats, \
-    direction_stats, copy_times
+from ...data.activity import active_stats, hrz_stats, direction_stats, copy_times, best_effort_stats
 from ...data.climb import find_climbs, Climb, add_climb_stats
 from ...data.frame import present
 from ...data.response import response_stats
@@ -23,7 +22,7 @@ from ...lib.data import safe_dict
 from ...lib.log import log_current_exception
 from ...names import N, T, Summaries as S, Units, titles_for_names, SPACE, simple_name
 from ...sql import StatisticJournalFloat, Constant, StatisticJournalText, StatisticJournalTimestamp, \
-    ActivityJournal, StatisticJournal
+    ActivityJournal, StatisticJournal, KitUse
 
 log = getLogger(__name__)
 
@@ -67,10 +66,8 @@ class ActivityCalculator(OwnerInMixin, ActivityJournalCalculatorMixin, DataFrame
         stats.update(copy_times(ajournal))
         stats.update(active_stats(adf))
         stats.update(self.__average_power(s, ajournal, stats[N.ACTIVE_TIME]))
-        stats.update(times_for_distance(adf))
+        stats.update(best_effort_stats(adf))
         stats.update(hrz_stats(adf))
-        stats.update(max_med_stats(adf))
-        stats.update(max_mean_stats(adf))
         stats.update(direction_stats(adf))
         if sdf is not None:
             stats.update(response_stats(sdf, delta))
@@ -92,6 +89,8 @@ class ActivityCalculator(OwnerInMixin, ActivityJournalCalculatorMixin, DataFrame
 
     def _copy_results(self, s, ajournal, loader, data):
         df, stats, climbs = data
+        # before __copy consumes the values
+        KitUse.update_activity(s, ajournal, stats.get(N.ACTIVE_TIME), stats.get(N.ACTIVE_DISTANCE))
         self.__copy(ajournal, loader, stats, T.START, None,
                     None, ajournal.start, type=StatisticJournalTimestamp)
         self.__copy(ajournal, loader, stats, T.FINISH, None,
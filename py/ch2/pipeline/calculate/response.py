@@ -3,21 +3,20 @@ from collections import namedtuple
 from json import loads
 from logging import getLogger
 
-import numpy as np
+import pandas as pd
 from math import log10
-from sqlalchemy import distinct
+from sqlalchemy import func, not_
 from sqlalchemy.sql.functions import count
 
 from .utils import UniProcCalculator
 from ..pipeline import LoaderMixin, OwnerInMixin
 from ..read.segment import SegmentReader
 from ...data import Statistics, present
-from ...data.response import sum_to_hour, calc_response
+from ...data.response import sum_to_hour, calc_response, extend_to_hour
 from ...lib.date import round_hour, to_time, local_date_to_time, now
 from ...names import Names as N, SPACE
 from ...sql import StatisticJournal, Composite, StatisticName, Source, Constant, CompositeComponent, \
     StatisticJournalFloat
-from ...sql.tables.source import SourceType
 from ...sql.utils import add
 
 log = getLogger(__name__)
@@ -29,15 +28,18 @@ SCALED = 'scaled'
 
 class ResponseCalculator(OwnerInMixin, LoaderMixin, UniProcCalculator):
     '''
-    this is hard to do correctly, incrementally.
-
-    for now, we do all or nothing.
+    the response is a simple decay model, so the (hourly) values already stored act as checkpoints:
+    new values can be calculated from the last stored value and any later impulses.
 
     first, we check if the current solution is complete:
     * all sources used (no need to check for gaps - composite chaining should do that)
-    * within 3 hours of the current time (if not, we regenerate, padding with zeroes)
+    * within 3 hours of the current time (if not, we extend, padding with zeroes)
+
+    if an unused source is found then we delete from that point (composite chaining removes everything
+    that follows) and extend from the latest remaining checkpoint.
 
-    if not complete, we regenerate the whole damn thing.
+    if there is no checkpoint (or the checkpoints for different constants disagree) we regenerate the
+    whole damn thing.
     '''
 
     def __init__(self, *args, response_constants=None, prefix=None, **kargs):
@@ -81,50 +83,47 @@ class ResponseCalculator(OwnerInMixin, LoaderMixin, UniProcCalculator):
         Composite.clean(s)
         # range we expect data for
         finish = round_hour(dt.datetime.now(tz=dt.timezone.utc), up=True)
-        missing_sources = self.__missing_sources(s)
-        missing_recent = any(self.__missing_recent(s, constant.short_name, finish)
-                             for constant in self.response_constants)
-        if missing_recent or missing_sources:
-            if missing_recent: log.info('Incomplete coverage (so will re-calculate)')
-            if missing_sources: log.info('Additional sources (so will re-calculate)')
+        unused = self.__first_unused_source(s)
+        if unused:
+            log.info(f'Additional sources from {unused} (so will re-calculate from there)')
+            self._delete_from(s, unused)
+        checkpoint = self.__checkpoint(s)
+        if checkpoint is None:
+            log.info('No consistent checkpoint (so will re-calculate all)')
             self._delete_from(s)
             start = round_hour(self.__start(s), up=False)
             return [(start, finish)]
+        elif unused or (finish - checkpoint).total_seconds() > 3 * 60 * 60:
+            log.info(f'Incomplete coverage (so will extend from {checkpoint})')
+            return [(checkpoint, finish)]
         else:
             return []
 
-    def __missing_recent(self, s, constant, now):
-        log.debug('Searching for missing recent')
-        finish = s.query(StatisticJournal.time). \
-            join(StatisticName, StatisticJournal.statistic_name_id == StatisticName.id). \
-            filter(StatisticName.name == self.prefix + SPACE + constant,
+    def __checkpoint(self, s):
+        # the time of the last value, if it is the same for all constants
+        names = [self.prefix + SPACE + constant.short_name for constant in self.response_constants]
+        latest = s.query(StatisticName.name, func.max(StatisticJournal.time)). \
+            join(StatisticJournal, StatisticJournal.statistic_name_id == StatisticName.id). \
+            filter(StatisticName.name.in_(names),
                    StatisticName.owner == self.owner_out). \
-            order_by(StatisticJournal.time.desc()).limit(1).one_or_none()
-        if finish is None:
-            log.debug(f'Missing data for {constant}')
-            return True
-        if (now - finish[0]).total_seconds() > 3 * 60 * 60:
-            log.debug(f'Insufficient data for {constant}')
-            return True
-        return False
-
-    def __missing_sources(self, s):
-        log.debug('Searching for missing sources')
-        available = s.query(count(distinct(Source.id))). \
-            join(StatisticJournal). \
-            join(StatisticName). \
-            filter(StatisticName.name == self.prefix + SPACE + N.HR_IMPULSE_10)
-        used = s.query(count(distinct(Source.id))). \
-            join(CompositeComponent, CompositeComponent.input_source_id == Source.id). \
-            join(Composite, Composite.id == CompositeComponent.output_source_id). \
-            join(StatisticJournal, StatisticJournal.source_id == Composite.id). \
-            join(StatisticName). \
-            filter(StatisticName.owner == self.owner_out,
-                   Source.type == SourceType.ACTIVITY)
-        n_avaialble = available.scalar()
-        n_used = used.scalar()
-        log.debug(f'Using {n_used} of {n_avaialble} sources')
-        return n_used != n_avaialble
+            group_by(StatisticName.name).all()
+        times = set(time for _, time in latest)
+        log.debug(f'Latest response times: {latest}')
+        if len(latest) == len(names) and len(times) == 1:
+            return times.pop()
+        else:
+            return None
+
+    def __first_unused_source(self, s):
+        log.debug('Searching for unused sources')
+        used = s.query(CompositeComponent.input_source_id). \
+            join(StatisticJournal, StatisticJournal.source_id == CompositeComponent.output_source_id). \
+            join(StatisticName, StatisticJournal.statistic_name_id == StatisticName.id). \
+            filter(StatisticName.owner == self.owner_out)
+        return s.query(func.min(StatisticJournal.time)). \
+            join(StatisticName, StatisticJournal.statistic_name_id == StatisticName.id). \
+            filter(StatisticName.name == self.prefix + SPACE + N.HR_IMPULSE_10,
+                   not_(StatisticJournal.source_id.in_(used))).scalar()
 
     def __start(self, s):
         # avoid constants defined at time 0
@@ -134,7 +133,9 @@ class ResponseCalculator(OwnerInMixin, LoaderMixin, UniProcCalculator):
             limit(1).one()[0]  # scalar can return None
 
     def _run_one(self, s, missed):
-        data = self.__read_data(s)
+        start, finish = missed
+        checkpoint = self.__read_checkpoint(s, start)
+        data = self.__read_data(s, start if checkpoint else None)
         if N.HR_IMPULSE_10 in data.columns and N.COVERAGE in data.columns:
             # coverage is calculated by the loader and seems to reflect records that have location data but not
             # HR data.  so i guess it makes sense to scale.
@@ -142,14 +143,17 @@ class ResponseCalculator(OwnerInMixin, LoaderMixin, UniProcCalculator):
             # it seems like a relatively small effect in most cases.
             data.loc[now()] = {N.HR_IMPULSE_10: 0.0, N._src(N.HR_IMPULSE_10): None, N.COVERAGE: 100}
             data[SCALED] = data[N.HR_IMPULSE_10] * 100 / data[N.COVERAGE]
-            all_sources = list(self.__make_sources(s, data))
-            for constant, response in zip(self.response_constants, self.responses):
+            all_sources = list(self.__make_sources(s, data, checkpoint[0] if checkpoint else None))
+            hr3600 = sum_to_hour(data, SCALED)
+            if checkpoint:
+                hr3600 = extend_to_hour(hr3600, start, hr3600.index[-1])
+            for i, (constant, response) in enumerate(zip(self.response_constants, self.responses)):
                 name = self.prefix + SPACE + constant.short_name
                 log.info(f'Creating values for {response.title} ({name})')
-                hr3600 = sum_to_hour(data, SCALED)
                 params = (log10(response.tau_days * 24),
                           log10(response.start) if response.start > 0 else 1)
-                result = calc_response(hr3600, params) * response.scale
+                initial = checkpoint[1][i] / response.scale if checkpoint else None
+                result = calc_response(hr3600, params, initial=initial) * response.scale
                 loader = self._get_loader(s, add_serial=False)
                 source, sources = None, list(all_sources)
                 for time, value in result.iteritems():
@@ -166,36 +170,65 @@ class ResponseCalculator(OwnerInMixin, LoaderMixin, UniProcCalculator):
                                description=f'The SHRIMP response for a decay of {response.tau_days} days')
                 loader.load()
 
-    def __read_data(self, s):
+    def __read_checkpoint(self, s, start):
+        # the composite source and values (one per constant) at the checkpoint, if available
+        values, source = [], None
+        for constant in self.response_constants:
+            journal = s.query(StatisticJournal). \
+                join(StatisticName, StatisticJournal.statistic_name_id == StatisticName.id). \
+                filter(StatisticName.name == self.prefix + SPACE + constant.short_name,
+                       StatisticName.owner == self.owner_out,
+                       StatisticJournal.time == start).one_or_none()
+            if journal is None:
+                return None
+            values.append(journal.value)
+            source = journal.source
+        log.debug(f'Extending from checkpoint at {start}: {values}')
+        return source, values
+
+    def __read_data(self, s, start=None):
         from ..owners import ImpulseCalculator
         name = self.prefix + SPACE + N.HR_IMPULSE_10
-        df = Statistics(s, with_source=True).by_name(ImpulseCalculator, name).with_. \
+        df = Statistics(s, start=start, with_source=True).by_name(ImpulseCalculator, name).with_. \
             rename({name: N.HR_IMPULSE_10, N._src(name): N._src(N.HR_IMPULSE_10)}).df
         name = N._cov(N.HEART_RATE)
-        df = Statistics(s).by_name(SegmentReader, name).with_. \
+        df = Statistics(s, start=start).by_name(SegmentReader, name).with_. \
             rename({name: N.COVERAGE}).into(df, tolerance='10s')
         if present(df, N.COVERAGE):
             df[N.COVERAGE].fillna(axis='index', method='ffill', inplace=True)
             df[N.COVERAGE].fillna(100, axis='index', inplace=True)
+        if start:
+            # when extending there may be no new data, but we still need to pad with zeroes
+            for column, value in ((N.HR_IMPULSE_10, 0.0), (N._src(N.HR_IMPULSE_10), None), (N.COVERAGE, 100)):
+                if column not in df.columns:
+                    df[column] = value
         return df
 
-    def __make_sources(self, s, data):
-        # this chains forwards from zero, adding a new composite for each new impulse source.
-        # in theory we could reconstruct only missing entries.
+    def __make_sources(self, s, data, checkpoint=None):
+        # this chains forwards, adding a new composite for each new impulse source.
+        # the chain starts from zero or continues from the source of an existing checkpoint.
         log.info('Creating sources')
         name = N._src(N.HR_IMPULSE_10)
-        prev = add(s, Composite(n_components=0))
+        if checkpoint:
+            prev = checkpoint
+            known = set(row[0] for row in s.query(CompositeComponent.input_source_id).
+                        filter(CompositeComponent.output_source_id == prev.id).all())
+        else:
+            prev, known = add(s, Composite(n_components=0)), set()
         yield to_time(0.0), prev
         # find times where the source changes
         changes = data.loc[data[name].ne(data[name].shift())]
         for time, row in changes.iterrows():
             id = row[name]
-            if not np.isnan(id):
-                composite = add(s, Composite(n_components=2))
-                add(s, CompositeComponent(input_source_id=id, output_source=composite))
-            else:
+            if pd.isnull(id):
                 composite = add(s, Composite(n_components=1))
+            elif int(id) in known:
+                # the checkpoint already includes this source (an activity that spans the checkpoint)
+                continue
+            else:
+                composite = add(s, Composite(n_components=2))
+                add(s, CompositeComponent(input_source_id=int(id), output_source=composite))
             add(s, CompositeComponent(input_source=prev, output_source=composite))
             yield time, composite
-            prev = composite
+            prev, known = composite, set()
         s.commit()
@@ -0,0 +1,52 @@
+
+from logging import getLogger
+from os import unlink
+from os.path import exists
+
+from .utils import MultiProcCalculator, ActivityJournalCalculatorMixin
+from ...commands.args import base_system_path, THUMBNAIL
+from ...lib import local_time_to_time, log_current_exception
+
+log = getLogger(__name__)
+
+PNG, SVG = 'png', 'svg'
+
+
+def thumbnail_path(base, activity_id, format=PNG, create=True):
+    return base_system_path(base, subdir=THUMBNAIL, file=f'{activity_id}.{format}', create=create)
+
+
+class ThumbnailCalculator(ActivityJournalCalculatorMixin, MultiProcCalculator):
+    '''
+    Render thumbnails for activities that don't have one in the cache, so that the web
+    interface only has to read files.
+
+    Nothing is written to the database - the files themselves indicate what is missing.
+    Rendering is fast compared to starting a worker, so the overhead is high.
+    '''
+
+    def __init__(self, *args, format=PNG, overhead=300, cost_calc=10, cost_write=1, **kargs):
+        self.format = format
+        super().__init__(*args, overhead=overhead, cost_calc=cost_calc, cost_write=cost_write, **kargs)
+
+    def _missing(self, s):
+        q = self._delimit_query(s.query(self._journal_type.id, self._journal_type.start).
+                                order_by(self._journal_type.start))
+        return [start for id, start in q
+                if not exists(thumbnail_path(self._data.base, id, format=self.format, create=False))]
+
+    def _delete(self, s):
+        start, finish = self._start_finish(type=local_time_to_time)
+        log.warning(f'Deleting thumbnails from {start} to {finish}')
+        for (id,) in self._delimit_query(s.query(self._journal_type.id)):
+            for format in (PNG, SVG):  # the web server may have cached either
+                path = thumbnail_path(self._data.base, id, format=format, create=False)
+                if exists(path): unlink(path)
+
+    def _run_one(self, s, time):
+        from ...commands.thumbnail import create_in_cache
+        try:
+            create_in_cache(self._data.base, s, self._get_source(s, time).id, format=self.format)
+        except Exception as e:
+            log.error(f'No thumbnail for {time}: {e}')
+            log_current_exception(traceback=False)
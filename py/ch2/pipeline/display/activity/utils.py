@@ -1,4 +1,5 @@
 import datetime as dt
+from collections import defaultdict
 from logging import getLogger
 from re import search
 
@@ -10,14 +11,15 @@ from ...calculate import SummaryCalculator
 from ...calculate.activity import ActivityCalculator
 from ...calculate.power import PowerCalculator
 from ....data.climb import climbs_for_activity
-from ....diary.database import summary_column, interval_column
+from ....diary.database import interval_column, statistic_names_like
 from ....diary.model import optional_text, text, from_field, value
-from ....lib import local_date_to_time, time_to_local_time, to_time, to_date, time_to_local_date, \
+from ....lib import local_date_to_time, time_to_local_time, to_time, to_date, \
     log_current_exception
 from ....lib.date import YMD_HM, HM, format_minutes, add_date, MONTH, YMD, YEAR, YM, DAY
 from ....names import Names as N
 from ....sql import ActivityGroup, ActivityJournal, ActivityTopicJournal, ActivityTopicField, StatisticName, \
-    ActivityTopic, StatisticJournal, Pipeline, PipelineType, Interval
+    ActivityTopic, StatisticJournal, Pipeline, PipelineType, Interval, ActivityDate
+from ....sql.utils import can_retry
 
 log = getLogger(__name__)
 
@@ -56,6 +58,7 @@ class ActivityDisplayer(Displayer):
                     entry = list(pipeline.read_journal_date(s, ajournal, date))
                     if entry: yield entry
             except Exception as e:
+                if can_retry(s, e): raise
                 log.warning(f'Error calling {pipeline}')
                 log_current_exception(traceback=True)
 
@@ -221,27 +224,18 @@ class ActivityDelegate(ActivityJournalDelegate):
             column = list(interval_column(s, interval, name, SummaryCalculator))
             if column: yield column
         for template in (N.MIN_KM_TIME_ANY, N.MED_KM_TIME_ANY, N.MAX_MED_HR_M_ANY):
-            for name in self.__sort_names(self.__names_like(s, template)):
+            for name in self.__sort_names(statistic_names_like(s, template, ActivityCalculator)):
                 column = list(interval_column(s, interval, name, SummaryCalculator))
                 if column: yield column
 
-    @staticmethod
-    def __names_like(s, name):
-        return [statistic_name.name
-                for statistic_name in s.query(StatisticName).
-                    filter(StatisticName.name.like(name),
-                           StatisticName.owner == ActivityCalculator).all()]
-
 
 def active_dates(s, start, range, fmt):
     date_start = to_date(start)
     date_end = add_date(date_start, (1, range))
-    time_start = local_date_to_time(date_start)
-    time_end = local_date_to_time(date_end)
-    times = s.query(distinct(ActivityJournal.start)). \
-        filter(ActivityJournal.start >= time_start,
-               ActivityJournal.start < time_end).all()
-    return list(set(time_to_local_date(row[0]).strftime(fmt) for row in times))
+    dates = s.query(distinct(ActivityDate.date)). \
+        filter(ActivityDate.date >= date_start,
+               ActivityDate.date < date_end).all()
+    return list(set(row[0].strftime(fmt) for row in dates))
 
 
 def active_days(s, month):
@@ -258,12 +252,9 @@ def latest_activity(s):
 
 
 def activity_times_by_group(s):
-    by_group = {}
-    for group in s.query(ActivityGroup).all():
-        activities = [time_to_local_time(activity.start)
-                      for activity in s.query(ActivityJournal).
-                          filter(ActivityJournal.activity_group == group).
-                          order_by(desc(ActivityJournal.start)).all()]
-        if activities:
-            by_group[group.name] = activities
-    return by_group
\ No newline at end of file
+    by_group = defaultdict(list)
+    for start, group in s.query(ActivityJournal.start, ActivityGroup.name). \
+            join(ActivityGroup, ActivityGroup.id == ActivityJournal.activity_group_id). \
+            order_by(desc(ActivityJournal.start)).all():
+        by_group[group].append(time_to_local_time(start))
+    return dict(by_group)
@@ -5,6 +5,7 @@ from logging import getLogger
 from ..pipeline import BasePipeline
 from ...lib import local_date_to_time, log_current_exception
 from ...sql import ActivityGroup, ActivityJournal
+from ...sql.utils import can_retry
 
 log = getLogger(__name__)
 
@@ -18,6 +19,7 @@ class Displayer(BasePipeline):
             else:
                 yield from self._read_date(s, date)
         except Exception as e:
+            if can_retry(s, e): raise
             log_current_exception(e)
 
     @abstractmethod
@@ -102,6 +102,11 @@ class BaseLoader(ABC):
         self._staging[journal_class].append(instance)
         self.__counts[name] += 1
 
+    def add_journal(self, journal):
+        # a complete journal (with statistic_name_id and source_id), bypassing the checks above.
+        # used when copying values from another database.
+        self._staging[type(journal)].append(journal)
+
     def _resolve_duplicate(self, name, instance, prev):
         raise Exception(f'Conflict at ({instance.time}) for {name} '
                         f'(values {instance.value}/{prev.value})')
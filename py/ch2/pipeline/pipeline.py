@@ -2,17 +2,19 @@
 from abc import abstractmethod
 from contextlib import nullcontext
 from logging import getLogger
+from os import getpid
 
 from psutil import cpu_count
 from sqlalchemy import text
 from sqlalchemy.sql.functions import count
 
 from .loader import SqliteLoader, PostgresqlLoader
-from ..commands.args import SQLITE, POSTGRESQL, BATCH, mm, KARG
+from ..commands.args import SQLITE, POSTGRESQL, BATCH, mm, KARG, CH2_VERSION
+from ..lib.metrics import measure, current_run, record_query_profile
 from ..lib.utils import timing
 from ..lib.workers import ProgressTree, Workers
 from ..sql import Pipeline, SystemConstant, Interval, PipelineType, StatisticJournal
-from ..sql.database import scheme
+from ..sql.database import scheme, PROFILER
 from ..sql.types import short_cls
 
 log = getLogger(__name__)
@@ -28,21 +30,36 @@ def count_statistics(s):
 def run_pipeline(data, type, like=tuple(), unlike=tuple(), id=None, progress=None, **extra_kargs):
     with data.db.session_context() as s:
         if id is None:  # don't run for each worker
+            current_run()  # before any workers are started, so that they share the run
             if type in (PipelineType.CALCULATE, PipelineType.READ_ACTIVITY, PipelineType.READ_MONITOR):
                 Interval.clean(s)
         local_progress = ProgressTree(Pipeline.count(s, type, like=like, unlike=unlike, id=id), parent=progress)
         for pipeline in Pipeline.all(s, type, like=like, unlike=unlike, id=id):
             kargs = dict(pipeline.kargs)
             kargs.update(extra_kargs)
-            msg = f'Ran {short_cls(pipeline.cls)}'
-            if 'activity_group' in kargs: msg += f' ({kargs["activity_group"]})'
+            name = short_cls(pipeline.cls)
+            label = kargs.get('activity_group', kargs.get('schedule'))
+            if label: name += f' ({label})'
+            msg = f'Ran {name}'
             log.debug(f'Running {pipeline.cls}({pipeline.args}, {kargs})')
-            with timing(msg):
+            with timing(msg), measure() as measurement, PROFILER.context(name):
                 before = None if id else count_statistics(s)
-                pipeline.cls(data, *pipeline.args, id=pipeline.id, progress=local_progress, **kargs).run()
+                instance = pipeline.cls(data, *pipeline.args, id=pipeline.id, progress=local_progress, **kargs)
+                instance.run()
                 after = None if id else count_statistics(s)
+            record_query_profile(data, name)
             if before or after:
                 log.info(f'{msg}: statistic count {before} -> {after} (change of {after - before})')
+            record_metric(data, pipeline.cls, label, id is not None, getattr(instance, 'n_missing', None),
+                          None if id else after - before, measurement)
+
+
+def record_metric(data, cls, label, worker, items, rows, measurement):
+    try:
+        data.sys.record_metric(run=current_run(), version=CH2_VERSION, owner=cls, label=label and str(label),
+                               worker=worker, pid=getpid(), items=items, rows=rows, **measurement.values())
+    except Exception as e:
+        log.warning(f'Could not record metrics for {short_cls(cls)}: {e}')
 
 
 class BasePipeline:
@@ -72,6 +89,7 @@ class MultiProcPipeline(BasePipeline):
         self.n_cpu = max(1, int(cpu_count() * CPU_FRACTION)) if n_cpu is None else n_cpu  # number of cpus available
         self.worker = worker  # if True, then we're in a sub-process
         self.id = id  # the id for the pipeline entry in the database (passed to sub-processes)
+        self.n_missing = None  # set on run (for metrics)
         super().__init__(*args, **kargs)
 
     def run(self):
@@ -84,6 +102,7 @@ class MultiProcPipeline(BasePipeline):
                 self._delete(s)
 
             missing = self._missing(s)
+            self.n_missing = len(missing)
             log.debug(f'Have {len(missing)} missing ranges')
 
             if self.worker:
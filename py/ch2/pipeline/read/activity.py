@@ -14,7 +14,7 @@ from ...lib.date import to_time, time_to_local_time
 from ...lib.io import split_fit_path
 from ...names import N, T, Units, Sports, Summaries as S
 from ...sql.database import Timestamp, StatisticJournalText
-from ...sql.tables.activity import ActivityGroup, ActivityJournal, ActivityTimespan
+from ...sql.tables.activity import ActivityGroup, ActivityJournal, ActivityTimespan, ActivityDate
 from ...sql.tables.statistic import StatisticJournalFloat, STATISTIC_JOURNAL_CLASSES, StatisticName, \
     StatisticJournalType, StatisticJournal
 from ...sql.tables.topic import ActivityTopicField, ActivityTopic, ActivityTopicJournal
@@ -105,6 +105,7 @@ class ActivityReader(MultiProcFitReader):
         ajournal = add(s, ActivityJournal(activity_group=activity_group,
                                           start=first_timestamp, finish=first_timestamp,  # will be over-written later
                                           file_hash_id=file_scan.file_hash_id))
+        ActivityDate.add(s, ajournal)
         return ajournal, activity_group, first_timestamp
 
     def _activity_group(self, s, path, sport, lookup, define):
@@ -243,7 +244,7 @@ class ActivityReader(MultiProcFitReader):
             event = False
             if record.name == 'event':
                 event = record.value.event == 'timer' and record.value.event_type in types
-                if event: log.debug(f'{types} at {record.timestamp}')
+                if event: log.debug('%s at %s', types, record.timestamp)  # lazy - called for every record
             return event
 
         have_timespan = any(is_event(record, 'start') for record in records)
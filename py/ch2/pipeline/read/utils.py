@@ -25,8 +25,9 @@ class AbortImportButMarkScanned(AbortImport):
 
 class FitReaderMixin(LoaderMixin):
 
-    def __init__(self, *args, paths=None, sub_dir=None, **kargs):
-        self.paths = paths
+    def __init__(self, *args, paths=None, hashes=None, sub_dir=None, **kargs):
+        self.paths = paths  # if given, only these are read (no scan)
+        self.hashes = hashes  # optional map from path to hash (avoids re-hashing)
         self.sub_dir = sub_dir
         super().__init__(*args, **kargs)
 
@@ -36,7 +37,7 @@ class FitReaderMixin(LoaderMixin):
 
     def _expand_paths(self, s, paths):
         from ...commands.read import DOT_FIT
-        if paths: return paths
+        if paths is not None: return paths
         data_dir = base_system_path(self._data.base, version=PERMANENT)
         if self.sub_dir:
             data_dir = join(data_dir, self.sub_dir)
@@ -45,7 +46,8 @@ class FitReaderMixin(LoaderMixin):
         return iglob(join(data_dir, '**/*' + DOT_FIT), recursive=True)
 
     def _missing(self, s):
-        return modified_file_scans(s, self._expand_paths(s, self.paths), self.owner_out, self.force)
+        return modified_file_scans(s, self._expand_paths(s, self.paths), self.owner_out, self.force,
+                                   hashes=self.hashes)
 
     def _run_one(self, s, file_scan):
         try:
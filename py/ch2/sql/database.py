@@ -1,17 +1,23 @@
 
+from collections import defaultdict
 from contextlib import contextmanager
 from logging import getLogger
+from os import environ
 from re import sub
 from sqlite3 import OperationalError, Connection
+from threading import local, Lock
+from time import perf_counter
 
 from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql.functions import count
 from uritools import urisplit
 
 from . import *
 from .support import Base
+from .utils import SNAPSHOT, NO_WAIT
 from ..commands.args import NamespaceWithVariables, NO_OP, make_parser, DB_EXTN, base_system_path, DATA, ACTIVITY, BASE, \
     DB_VERSION, POSTGRESQL, SQLITE
 from ..lib.io import data_hash
@@ -33,6 +39,9 @@ Timestamp
 
 log = getLogger(__name__)
 
+BUSY_TIMEOUT = 5 * 60 * 1000  # ms to wait for another connection that is writing to sqlite
+
+
 # https://stackoverflow.com/questions/13712381/how-to-turn-on-pragma-foreign-keys-on-in-sqlalchemy-migration-script-or-conf
 @event.listens_for(Engine, "connect")
 def fk_pragma_on_connect(dbapi_con, _con_record):
@@ -49,10 +58,129 @@ def fk_pragma_on_connect(dbapi_con, _con_record):
         pragma('cache_size=-1000000;')  # 1GB  https://www.sqlite.org/pragma.html#pragma_cache_size
         pragma('secure_delete=OFF;')  # https://www.sqlite.org/pragma.html#pragma_secure_delete
         pragma('journal_mode=WAL;')  # https://www.sqlite.org/wal.html
-        pragma(f'busy_timeout={5 * 60 * 1000};')  # https://www.sqlite.org/pragma.html#pragma_busy_timeout
+        pragma(f'busy_timeout={BUSY_TIMEOUT};')  # https://www.sqlite.org/pragma.html#pragma_busy_timeout
         cursor.close()
 
 
+QUERIES = local()
+PROFILE_SQL = 'CH2_PROFILE_SQL'  # in the environment so that workers also profile
+QUERY_START = 'query-start'
+
+
+def normalise_sql(statement):
+    '''
+    Replace literals and parameters so that statements that differ only in values are grouped together.
+    '''
+    statement = sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = sub(r'%\(\w+\)s|\b\d+(?:\.\d+)?\b', '?', statement)
+    statement = sub(r'\?(?:\s*,\s*\?)+', '?, ...', statement)
+    return sub(r'\s+', ' ', statement).strip()
+
+
+class QueryProfiler:
+    '''
+    Count and time sql statements, grouped by context (eg pipeline class or web route) and normalised text.
+
+    Statements outside any context are ignored.
+    Only enabled if PROFILE_SQL is set in the environment (see enable), because of the overhead.
+    '''
+
+    def __init__(self):
+        self.enabled = bool(environ.get(PROFILE_SQL))
+        self.__local = local()
+        self.__lock = Lock()
+        self.__statistics = defaultdict(lambda: [0, 0.0])
+
+    def enable(self):
+        environ[PROFILE_SQL] = '1'
+        self.enabled = True
+
+    def disable(self):
+        environ.pop(PROFILE_SQL, None)
+        self.enabled = False
+
+    @contextmanager
+    def context(self, name):
+        previous = getattr(self.__local, 'context', None)
+        self.__local.context = name
+        try:
+            yield
+        finally:
+            self.__local.context = previous
+
+    def add(self, statement, elapsed):
+        context = getattr(self.__local, 'context', None)
+        if context:
+            key = (context, normalise_sql(statement))
+            with self.__lock:
+                statistics = self.__statistics[key]
+                statistics[0] += 1
+                statistics[1] += elapsed
+
+    def pop(self, context):
+        '''
+        Remove and return (statement, count, time) for the context, most expensive first.
+        '''
+        with self.__lock:
+            keys = [key for key in self.__statistics if key[0] == context]
+            results = [(key[1], *self.__statistics.pop(key)) for key in keys]
+        return sorted(results, key=lambda result: -result[2])
+
+
+PROFILER = QueryProfiler()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_queries(conn, _cursor, _statement, _parameters, _context, _executemany):
+    QUERIES.count = getattr(QUERIES, 'count', 0) + 1
+    if PROFILER.enabled:
+        conn.info.setdefault(QUERY_START, []).append(perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def time_queries(conn, _cursor, statement, _parameters, _context, _executemany):
+    if PROFILER.enabled and conn.info.get(QUERY_START):
+        PROFILER.add(statement, perf_counter() - conn.info[QUERY_START].pop())
+
+
+def query_plan(s, statement):
+    '''
+    The (sqlite) query plan for a statement normalised as above, with a note for each step that reads
+    more than an index (full scans, table lookups after an index search, and sorts).
+    '''
+    statement = statement.replace('?, ...', '?')  # any list of values is a single parameter
+    cursor = s.connection().connection.cursor()
+    try:
+        # an explain does not check for schema changes by other connections (eg new indexes), so read
+        # the schema first, and pysqlite caches prepared statements by text, so include the version there
+        cursor.execute('SELECT count(*) FROM sqlite_master').fetchall()
+        version = cursor.execute('PRAGMA schema_version').fetchone()[0]
+        rows = cursor.execute(f'EXPLAIN QUERY PLAN /* schema {version} */ ' + statement,
+                              [None] * statement.count('?')).fetchall()
+    finally:
+        cursor.close()
+    for row in rows:
+        step = row[-1]
+        if 'COVERING INDEX' in step or 'PRIMARY KEY' in step:
+            note = None
+        elif step.startswith('SCAN'):
+            note = 'full scan'
+        elif step.startswith('SEARCH'):
+            note = 'table lookup'
+        elif 'TEMP B-TREE' in step:
+            note = 'sort'
+        else:
+            note = None
+        yield step, note
+
+
+def query_count():
+    '''
+    The number of sql statements executed (in this thread).
+    '''
+    return getattr(QUERIES, 'count', 0)
+
+
 @event.listens_for(Engine, 'close')
 def analyze_pragma_on_close(dbapi_con, _con_record):
     if isinstance(dbapi_con, Connection):
@@ -124,6 +252,90 @@ class DatabaseBase:
         return f'{self.__class__.__name__} at {self.uri}'
 
 
+def read_only_uri(uri):
+    '''
+    The same (sqlite) database, opened so that any attempt to write fails immediately.
+    '''
+    if scheme(uri) != SQLITE: raise Exception(f'Read-only connections are only supported for {SQLITE}')
+    path = uri[len(f'{SQLITE}:///'):].split('?')[0]
+    return f'{SQLITE}:///file:{path}?mode=ro&uri=true'
+
+
+@contextmanager
+def no_wait(s):
+    '''
+    Within the context, writes to sqlite fail immediately (rather than waiting) if another connection
+    is writing.
+    '''
+    connection = s.connection().connection  # the dbapi connection, outside the session's transaction
+
+    def busy_timeout(timeout):
+        cursor = connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout={timeout};')
+        cursor.close()
+
+    busy_timeout(0)
+    s.info[NO_WAIT] = True
+    try:
+        yield s
+    finally:
+        del s.info[NO_WAIT]
+        busy_timeout(BUSY_TIMEOUT)
+
+
+class SessionPool:
+
+    '''
+    Sessions from a fixed number of (already open) connections that can be shared between threads
+    (one thread at a time).
+
+    This avoids opening (and configuring) a new connection for each request in the web server.
+    '''
+
+    def __init__(self, db, size, read_only=False):
+        self.uri = db.uri
+        options = {'poolclass': QueuePool, 'pool_size': size, 'max_overflow': 0}
+        # connections are created in one thread but used by whichever thread takes the session
+        if scheme(db.uri) == SQLITE: options['connect_args'] = {'check_same_thread': False}
+        self.engine = create_engine(read_only_uri(db.uri) if read_only else db.uri, **options)
+        self.session = sessionmaker(bind=self.engine)
+        for connection in [self.engine.connect() for _ in range(size)]:
+            connection.close()  # returned to the pool, ready for use
+        log.info(f'Opened {size} {"read-only " if read_only else ""}connections for {db}')
+
+    @contextmanager
+    def session_context(self):
+        session = self.session()
+        try:
+            yield session
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @contextmanager
+    def snapshot_context(self):
+        '''
+        A session that sees the database as it was when the first query was made, ignoring any
+        later commits (sqlite in wal mode).  Nothing is committed, and objects that would normally be
+        added on first display are left unsaved.
+        '''
+        session = self.session()
+        session.info[SNAPSHOT] = True  # see sql.utils.unsaved
+        try:
+            session.execute('BEGIN')  # otherwise pysqlite runs each select in a separate transaction
+            yield session
+        finally:
+            session.rollback()
+            session.close()
+
+    def close(self):
+        # connections still in use are closed when returned
+        self.engine.dispose()
+
+
 class MappedDatabase(DatabaseBase):
 
     def __init__(self, uri, table, base):
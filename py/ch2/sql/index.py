@@ -0,0 +1,211 @@
+from collections import namedtuple, defaultdict
+from logging import getLogger
+from re import compile
+
+from sqlalchemy import Integer, inspect
+
+from .database import query_plan
+from .support import Base
+from ..commands.args import SQLITE, POSTGRESQL
+from ..lib.io import data_hash
+
+log = getLogger(__name__)
+
+PREFIX = 'ix_cover'
+MAX_NAME = 63  # postgresql truncates longer identifiers
+MAX_INCLUDE = 3
+
+Index = namedtuple('Index', 'table, key, include')
+Advice = namedtuple('Advice', 'index, time, statements')
+
+SEARCH = compile(r'^SEARCH "?(\w+)"?(?: AS "?(\w+)"?)? USING (COVERING )?(?:INDEX \w+|INTEGER PRIMARY KEY) \((.*)\)')
+REFERENCE = compile(r'"?(\w+)"?\."?(\w+)"?')
+CONDITION = compile(r'(\w+)\s*[=<>]')
+ROWID = 'rowid'
+
+
+def primary_key(table):
+    return tuple(column.name for column in Base.metadata.tables[table].primary_key)
+
+
+def rowid(table):
+    '''
+    the name of the column that is the sqlite rowid (a single integer primary key), if any.
+    the table is stored in rowid order and every index includes the rowid.
+    '''
+    columns = list(Base.metadata.tables[table].primary_key)
+    if len(columns) == 1 and isinstance(columns[0].type, Integer): return columns[0].name
+
+
+def workload(profiles):
+    '''
+    total time for each (normalised) select statement in the profiles (see ch2 --profile-sql).
+    '''
+    times = defaultdict(float)
+    for profile in profiles:
+        if profile.statement.upper().startswith('SELECT'):
+            times[profile.statement] += profile.time
+    return times
+
+
+def referenced_columns(statement, table, alias):
+    columns = Base.metadata.tables[table].columns
+    return set(column for name, column in REFERENCE.findall(statement)
+               if name == (alias or table) and column in columns)
+
+
+def is_useful(index):
+    # an index with the whole row is a second copy of the table, except when the row is just a key and value
+    n_other = len(Base.metadata.tables[index.table].columns) - len(index.key)
+    return 0 < len(index.include) <= MAX_INCLUDE and (len(index.include) < n_other or n_other == 1)
+
+
+def access_paths(s, statement):
+    '''
+    the (sqlite) plan for a statement, as Index tuples for each table that is read after an index search.
+    the key is the part of the index used in the search and include is the other columns that the
+    statement needs from that table.
+    '''
+    try:
+        plan = list(query_plan(s, statement))
+    except Exception as e:
+        log.debug(f'Cannot explain {statement[:100]}: {e}')  # eg a system table
+        return
+    for step, note in plan:
+        match = SEARCH.match(step)
+        if match:
+            table, alias, covering, conditions = match.groups()
+            if covering or table not in Base.metadata.tables: continue
+            if note:
+                key = tuple(dict.fromkeys(rowid(table) if name == ROWID else name
+                                          for name in CONDITION.findall(conditions)))
+            else:
+                key = primary_key(table)  # values read by primary key (no note since sqlite has no better path)
+            index = Index(table, key, tuple(sorted(referenced_columns(statement, table, alias) - set(key))))
+            if is_useful(index):
+                yield index
+            else:
+                log.debug(f'No covering index for {step} ({len(index.include)} other columns)')
+
+
+def advise(s, profiles):
+    '''
+    suggest covering indexes for the statements in a profiled workload, most expensive first.
+
+    the workload is explained by sqlite and, for each table that is read after an index search,
+    an index is proposed with the searched columns as the key, plus the other columns the statement uses.
+    lookups by primary key (eg the typed values joined to statistic_journal) are included because postgresql
+    can then read the value from the index alone (sqlite already stores these tables in key order).
+    indexes with the same key are merged.
+
+    sqlite only (postgresql plans need values for the parameters), but the advice can be used with either.
+    '''
+    if s.get_bind().dialect.name != SQLITE:
+        raise Exception('Index advice needs a sqlite database (with the same data)')
+    includes, times, statements = defaultdict(set), defaultdict(float), defaultdict(list)
+    for statement, time in workload(profiles).items():
+        for index in access_paths(s, statement):
+            key = (index.table, index.key)
+            includes[key].update(index.include)
+            times[key] += time
+            statements[key].append(statement)
+    return sorted((Advice(Index(*key, tuple(sorted(includes[key]))), times[key], statements[key])
+                   for key in includes), key=lambda advice: -advice.time)
+
+
+def describe(index):
+    return f'{index.table} ({", ".join(index.key)}) INCLUDE ({", ".join(index.include)})'
+
+
+def index_name(index):
+    name = '_'.join((PREFIX, index.table) + index.key)
+    if len(name) > MAX_NAME:
+        name = name[:MAX_NAME - 9] + '_' + data_hash(name)[:8]
+    return name
+
+
+def applies(dialect, index):
+    # sqlite stores the table in rowid order, so an index on that alone adds nothing
+    return dialect.name != SQLITE or index.key != (rowid(index.table),)
+
+
+def index_ddl(dialect, index):
+    '''
+    sql to create the index.  postgresql has INCLUDE for non-key columns.  sqlite does not, so those are
+    appended to the key (except the rowid, which is in every index).
+    '''
+    quote = dialect.identifier_preparer.quote
+    columns = lambda names: ', '.join(quote(name) for name in names)
+    if dialect.name == POSTGRESQL:
+        return f'CREATE INDEX IF NOT EXISTS {quote(index_name(index))} ON {quote(index.table)} ' \
+               f'({columns(index.key)}) INCLUDE ({columns(index.include)})'
+    else:
+        key = index.key + tuple(name for name in index.include if name != rowid(index.table))
+        return f'CREATE INDEX IF NOT EXISTS {quote(index_name(index))} ON {quote(index.table)} ({columns(key)})'
+
+
+def create_indexes(engine, indexes):
+    '''
+    create the indexes that apply to the database, returning those created.
+    '''
+    created = []
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        for index in indexes:
+            if applies(engine.dialect, index):
+                ddl = index_ddl(engine.dialect, index)
+                log.info(ddl)
+                connection.execute(ddl)
+                if engine.dialect.name == SQLITE:
+                    # without statistics the planner prefers existing (analyzed) indexes
+                    connection.execute(f'ANALYZE {quote(index_name(index))}')
+                created.append(index)
+            else:
+                log.info(f'Skipping {index_name(index)} (no benefit for {engine.dialect.name})')
+    return created
+
+
+def drop_indexes(engine, indexes=None):
+    '''
+    drop the given indexes, or all that were created here (found by name) if none given.
+    '''
+    if indexes is None:
+        inspector = inspect(engine)
+        names = [index['name'] for table in inspector.get_table_names()
+                 for index in inspector.get_indexes(table) if index['name'].startswith(PREFIX)]
+    else:
+        names = [index_name(index) for index in indexes]
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        for name in names:
+            log.info(f'Dropping {name}')
+            connection.execute(f'DROP INDEX IF EXISTS {quote(name)}')
+    return names
+
+
+def is_valid(s, advice):
+    '''
+    for sqlite, check that the plan for at least one of the statements uses the index (as a covering index).
+    for postgresql, check that the index was built (plans cannot be checked without values).
+    '''
+    name = index_name(advice.index)
+    if s.get_bind().dialect.name == POSTGRESQL:
+        return bool(s.execute('SELECT indisvalid FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+                              'WHERE pg_class.relname = :name', {'name': name}).scalar())
+    else:
+        return any(f'COVERING INDEX {name} ' in step + ' '
+                   for statement in advice.statements for step, _ in query_plan(s, statement))
+
+
+def create_and_validate(db, advice):
+    '''
+    create the advised indexes and check that they are used, dropping any that are not.
+    returns the advice for the indexes that remain.
+    '''
+    created = create_indexes(db.engine, [entry.index for entry in advice])
+    created = [entry for entry in advice if entry.index in created]
+    with db.session_context() as s:
+        valid = [entry for entry in created if is_valid(s, entry)]
+    unused = [entry.index for entry in created if entry not in valid]
+    if unused: drop_indexes(db.engine, unused)
+    return valid
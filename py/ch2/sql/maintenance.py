@@ -0,0 +1,89 @@
+
+from logging import getLogger
+
+from .database import scheme
+from ..commands.args import SQLITE, POSTGRESQL
+
+log = getLogger(__name__)
+
+ANALYZE = 'analyze'
+OPTIMIZE = 'optimize'
+VACUUM = 'vacuum'
+CHECKPOINT = 'checkpoint'
+CHECK = 'check'
+
+STEPS = (ANALYZE, OPTIMIZE, VACUUM, CHECKPOINT, CHECK)
+DEFAULT_STEPS = (ANALYZE, OPTIMIZE, CHECKPOINT, CHECK)
+INGEST_STEPS = (OPTIMIZE, CHECKPOINT)  # cheap enough to run after loading data
+
+# statistic journal rows added by a single read before INGEST_STEPS are run automatically
+LARGE_INGEST = 100000
+
+# the sql for each step, by engine.  steps that are missing are skipped.
+SQL = {SQLITE: {ANALYZE: 'ANALYZE',
+                OPTIMIZE: 'PRAGMA optimize',  # https://www.sqlite.org/pragma.html#pragma_optimize
+                VACUUM: 'VACUUM',
+                CHECKPOINT: 'PRAGMA wal_checkpoint(TRUNCATE)',  # https://www.sqlite.org/pragma.html#pragma_wal_checkpoint
+                CHECK: 'PRAGMA integrity_check'},  # includes indices, unlike quick_check
+       POSTGRESQL: {ANALYZE: 'ANALYZE',
+                    OPTIMIZE: 'ANALYZE',  # autovacuum does the rest
+                    VACUUM: 'VACUUM ANALYZE',
+                    CHECKPOINT: 'CHECKPOINT'}}
+
+
+class Maintenance:
+    '''
+    Database housekeeping - updating planner statistics, reclaiming space, truncating the write-ahead log
+    and checking integrity - for both the activity and system databases.
+
+    Each step is timed and recorded as a pipeline metric (so appears in ch2 metrics).
+    '''
+
+    def __init__(self, data, steps=DEFAULT_STEPS):
+        for step in steps:
+            if step not in STEPS: raise Exception(f'Unknown maintenance step {step} (not one of {STEPS})')
+        self.__data = data
+        self.__steps = [step for step in STEPS if step in steps]  # sensible order
+
+    def run(self):
+        from ..lib.metrics import measure
+        from ..pipeline.pipeline import record_metric
+        problems = []
+        for name, db in (('activity', self.__data.db), ('system', self.__data.sys)):
+            sql = SQL.get(scheme(db.uri), {})
+            for step in self.__steps:
+                if step in sql:
+                    with measure() as measurement:
+                        result = self.__execute(db, sql[step])
+                    log.info(f'{step} {name}: {measurement.wall:.1f}s')
+                    if step == CHECK and result != [('ok',)]:
+                        problems.append(f'{name}: {result}')
+                    record_metric(self.__data, Maintenance, f'{step} {name}', False, None, None, measurement)
+                else:
+                    log.debug(f'No {step} for {db}')
+        if problems:
+            raise Exception(f'Integrity check failed: {"; ".join(problems)}')
+
+    @staticmethod
+    def __execute(db, sql):
+        connection = db.engine.connect()
+        try:
+            if scheme(db.uri) == POSTGRESQL:
+                # vacuum cannot run inside a transaction
+                connection = connection.execution_options(isolation_level='AUTOCOMMIT')
+            result = connection.execute(sql)
+            return [tuple(row) for row in result] if result.returns_rows else None
+        finally:
+            connection.close()
+
+
+def maintain_after_ingest(data, rows):
+    '''
+    Called after reading data.  Does nothing unless many statistics were added.
+    '''
+    if rows and rows >= LARGE_INGEST:
+        log.info(f'Running database maintenance after {rows} new statistics')
+        try:
+            Maintenance(data, steps=INGEST_STEPS).run()
+        except Exception as e:
+            log.warning(f'Database maintenance failed: {e}')
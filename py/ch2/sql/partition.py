@@ -0,0 +1,107 @@
+
+import datetime as dt
+from logging import getLogger
+
+from sqlalchemy import create_engine, UniqueConstraint
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from .support import Base
+from .tables.statistic import StatisticJournal
+
+log = getLogger(__name__)
+
+FIRST_YEAR = 1990
+YEARS_AHEAD = 10
+CASCADE = 'statistic_journal_cascade'
+
+
+def journal_table():
+    return StatisticJournal.__table__
+
+
+def dependent_tables():
+    '''
+    tables with foreign keys to statistic_journal (the typed values, measures, kit use).
+    '''
+    journal = journal_table()
+    return [table for table in Base.metadata.sorted_tables
+            if any(fk.column.table is journal for fk in table.foreign_keys)]
+
+
+def year_start(year):
+    return dt.datetime(year, 1, 1, tzinfo=dt.timezone.utc).timestamp()
+
+
+def partitioned_schema_ddl(dialect, first_year, last_year):
+    '''
+    sql to create statistic_journal partitioned by time (one partition per year, plus a default for
+    anything outside that range - eg constants at time zero).
+
+    postgresql requires the partition key in every unique constraint, so the primary key becomes (id, time)
+    and time is added to the other unique constraints.  in particular (serial, source_id, statistic_name_id)
+    is widened to (serial, source_id, statistic_name_id, time), so duplicate serials are only rejected
+    when the times also match.
+    the tables that reference statistic_journal.id cannot have foreign keys, so the cascade on delete is
+    replaced by a trigger.
+    '''
+    journal = journal_table()
+    compiler = dialect.ddl_compiler(dialect, None)
+    key = journal.c.time.name
+    lines = [compiler.get_column_specification(column) for column in journal.columns]
+    lines.append(f'PRIMARY KEY ({", ".join(column.name for column in journal.primary_key)}, {key})')
+    uniques = sorted([column.name for column in constraint.columns] for constraint in journal.constraints
+                     if isinstance(constraint, UniqueConstraint))
+    lines.extend(f'UNIQUE ({", ".join(columns + ([] if key in columns else [key]))})' for columns in uniques)
+    lines.extend(compiler.process(fk) for fk in
+                 sorted(journal.foreign_key_constraints, key=lambda fk: fk.column_keys))
+    columns = ',\n    '.join(lines)
+    yield f'''CREATE TABLE {journal.name} (
+    {columns}
+) PARTITION BY RANGE ({key})'''
+    for year in range(first_year, last_year + 1):
+        yield f'CREATE TABLE {journal.name}_y{year} PARTITION OF {journal.name} ' \
+              f'FOR VALUES FROM ({year_start(year)}) TO ({year_start(year + 1)})'
+    yield f'CREATE TABLE {journal.name}_default PARTITION OF {journal.name} DEFAULT'
+    for index in journal.indexes:
+        yield str(CreateIndex(index).compile(dialect=dialect)).strip()
+    deletes = []
+    for table in dependent_tables():
+        fks = [fk for fk in table.foreign_key_constraints if fk.referred_table is not journal]
+        yield str(CreateTable(table, include_foreign_key_constraints=fks).compile(dialect=dialect)).strip()
+        for index in table.indexes:
+            yield str(CreateIndex(index).compile(dialect=dialect)).strip()
+        for fk in table.foreign_keys:
+            if fk.column.table is journal:
+                deletes.append(f'    DELETE FROM {table.name} WHERE {fk.parent.name} = OLD.{fk.column.name};')
+    deletes = '\n'.join(deletes)
+    yield f'''CREATE FUNCTION {CASCADE}() RETURNS TRIGGER AS $$
+BEGIN
+{deletes}
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql'''
+    yield f'CREATE TRIGGER {CASCADE} AFTER DELETE ON {journal.name} ' \
+          f'FOR EACH ROW EXECUTE PROCEDURE {CASCADE}()'
+
+
+def create_partitioned_schema(uri, first_year=FIRST_YEAR, last_year=None):
+    '''
+    create an (empty) schema in which statistic_journal is partitioned by time.
+    queries that constrain time (most of them) then only read the relevant partitions.
+
+    postgresql only.  this must be called before the database is first used (which creates the normal schema).
+    '''
+    if last_year is None: last_year = dt.date.today().year + YEARS_AHEAD
+    engine = create_engine(uri)
+    try:
+        journal, dependents = journal_table(), dependent_tables()
+        others = [table for table in Base.metadata.sorted_tables
+                  if table is not journal and table not in dependents]
+        Base.metadata.create_all(engine, tables=others)
+        with engine.begin() as connection:
+            for statement in partitioned_schema_ddl(engine.dialect, first_year, last_year):
+                log.debug(statement)
+                connection.execute(statement)
+        log.info(f'Created {journal.name} with partitions for {first_year} - {last_year}')
+    finally:
+        engine.dispose()
@@ -1,11 +1,12 @@
 from logging import getLogger
 
+from sqlalchemy import func
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql.functions import count
 
 from .database import SystemConstant, Process, MappedDatabase, sqlite_uri, Database, Interval
 from .support import SystemBase
-from .tables.system import Progress, DirtyInterval
+from .tables.system import Progress, DirtyInterval, PipelineMetric, QueryProfile
 from ..commands.args import SYSTEM, DB_EXTN, DATA
 from ..lib.utils import grouper
 
@@ -21,6 +22,9 @@ class System(MappedDatabase):
             log.info(f'Database version {version}')
         else:
             log.warning('Database unconfigured')
+        # added without a version change, so may be missing from existing databases
+        PipelineMetric.__table__.create(self.engine, checkfirst=True)
+        QueryProfile.__table__.create(self.engine, checkfirst=True)
 
     def _sessionmaker(self):
         return sessionmaker(bind=self.engine, expire_on_commit=False)
@@ -82,6 +86,32 @@ class System(MappedDatabase):
         with self.session_context() as s:
             return Progress.wait_for_progress(s, name, timeout=timeout)
 
+    def record_metric(self, **kargs):
+        with self.session_context() as s:
+            s.add(PipelineMetric(**kargs))
+
+    def get_metrics(self, run=None):
+        with self.session_context() as s:
+            q = s.query(PipelineMetric)
+            if run: q = q.filter(PipelineMetric.run == run)
+            return q.order_by(PipelineMetric.id).all()
+
+    def record_query_profiles(self, run, context, pid, profiles):
+        with self.session_context() as s:
+            for statement, count, time in profiles:
+                s.add(QueryProfile(run=run, context=context, pid=pid, statement=statement, count=count, time=time))
+
+    def get_query_profile_runs(self):
+        with self.session_context() as s:
+            return [run for (run,) in s.query(QueryProfile.run).group_by(QueryProfile.run).
+                    order_by(func.min(QueryProfile.id)).all()]
+
+    def get_query_profiles(self, run=None):
+        with self.session_context() as s:
+            q = s.query(QueryProfile)
+            if run: q = q.filter(QueryProfile.run == run)
+            return q.order_by(QueryProfile.id).all()
+
     def get_database(self, uri=None):
         if not uri: uri = self.get_constant(SystemConstant.DB_URI, none=True)
         if uri:
@@ -1,9 +1,9 @@
 
 from .achievement import Achievement
-from .activity import ActivityGroup, ActivityTimespan, ActivityJournal, ActivityBookmark
+from .activity import ActivityGroup, ActivityTimespan, ActivityJournal, ActivityBookmark, ActivityDate
 from .constant import Constant
 from .file import FileScan, FileHash
-from .kit import KitGroup, KitItem, KitComponent, KitModel
+from .kit import KitGroup, KitItem, KitComponent, KitModel, KitUse
 from .monitor import MonitorJournal
 from .nearby import ActivitySimilarity, ActivityNearby
 from .pipeline import Pipeline, PipelineType
@@ -7,8 +7,9 @@ from sqlalchemy.orm import relationship, backref
 
 from .source import Source, SourceType, GroupedSource
 from ..support import Base
-from ..types import Time, Sort, ShortCls, NullText, Name, name_and_title
-from ...lib.date import format_time, local_date_to_time, local_time_to_time
+from ..types import Time, Sort, ShortCls, NullText, Name, name_and_title, Date
+from ..utils import add
+from ...lib.date import format_time, local_date_to_time, local_time_to_time, time_to_local_date
 from ...lib.utils import timing
 from ...names import Titles, UNDEF, simple_name
 
@@ -162,6 +163,31 @@ class ActivityTimespan(Base):
         return 'ActivityTimespan from %s - %s' % (format_time(self.start), format_time(self.finish))
 
 
+class ActivityDate(Base):
+    '''
+    the local date of each activity, so that calendar navigation can scan an index rather than convert
+    every start time.  the date is fixed (using the current timezone) when the activity is read.
+    '''
+
+    __tablename__ = 'activity_date'
+
+    id = Column(Integer, ForeignKey('source.id', ondelete='cascade'), primary_key=True)
+    activity_journal = relationship('ActivityJournal',
+                                    backref=backref('activity_date', cascade='all, delete-orphan',
+                                                    passive_deletes=True, uselist=False))
+    activity_group_id = Column(Integer, ForeignKey('activity_group.id', ondelete='cascade'), nullable=False)
+    activity_group = relationship('ActivityGroup')
+    date = Column(Date, nullable=False, index=True)
+
+    @classmethod
+    def add(cls, s, ajournal):
+        return add(s, ActivityDate(activity_journal=ajournal, activity_group=ajournal.activity_group,
+                                   date=time_to_local_date(ajournal.start)))
+
+    def __str__(self):
+        return 'ActivityDate %s' % self.date
+
+
 class ActivityBookmark(Base):
 
     __tablename__ = 'activity_bookmark'
@@ -1,15 +1,15 @@
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from logging import getLogger
 
-from sqlalchemy import Column, Integer, ForeignKey, desc, or_
+from sqlalchemy import Column, Integer, ForeignKey, Float, desc, or_, func
 from sqlalchemy.orm import relationship, aliased, backref
 from sqlalchemy.orm.exc import NoResultFound
 
 from .source import SourceType, Composite, CompositeComponent, UngroupedSource
 from .statistic import StatisticJournal, StatisticName, StatisticJournalTimestamp
 from ..support import Base
-from ..types import Name
+from ..types import Name, Time
 from ..utils import add
 from ...commands.args import FORCE, mm
 from ...diary.model import TYPE, DB, UNITS
@@ -168,7 +168,9 @@ class StatisticsMixin:
             return None
 
     def add_use(self, s, time, source=None, owner=None):
-        self._add_timestamp(s, Titles.KIT_USED, time, source=source, owner=owner)
+        statistic = self._add_timestamp(s, Titles.KIT_USED, time, source=source, owner=owner)
+        if source:
+            KitUse.add(s, statistic, self, source)
 
     def active_times(self, s):
         return self._base_use_query(s, Names.ACTIVE_TIME).all()
@@ -181,19 +183,22 @@ class StatisticsMixin:
         expired = expired or now()
         return expired - added
 
+    def usage(self, s):
+        return KitUse.usage(s, self)
+
     def _add_individual_statistics(self, s, model):
         model_statistics = []
-        self._calculate_individual_statistics(model_statistics, Titles.ACTIVE_DISTANCE, self.active_distances(s), Units.KM)
-        self._calculate_individual_statistics(model_statistics, Titles.ACTIVE_TIME, self.active_times(s), Units.S)
+        usage = self.usage(s)
+        self._calculate_individual_statistics(model_statistics, Titles.ACTIVE_DISTANCE,
+                                              usage.n_active_distance, usage.active_distance, Units.KM)
+        self._calculate_individual_statistics(model_statistics, Titles.ACTIVE_TIME,
+                                              usage.n_active_time, usage.active_time, Units.S)
         expire = self.time_expired(s) or now()
         model_statistics.append({NAME: Titles.AGE, N: 1, SUM: (expire - self.time_added(s)).days, UNITS: Units.D})
         model[STATISTICS] = model_statistics
 
-    def _calculate_individual_statistics(self, model_statistics, name, values, units):
-        n = len(values)
+    def _calculate_individual_statistics(self, model_statistics, name, n, total, units):
         if n:
-            values = [value.value for value in values]
-            total = sum(values)
             # had mean and median, but they were pointless
             model_statistics.append({NAME: name, N: n, SUM: total, UNITS: units})
 
@@ -580,3 +585,57 @@ class KitModel(ModelMixin, StatisticsMixin, UngroupedSource):
 
     def __str__(self):
         return f'KitModel "{self.name}"'
+
+
+Usage = namedtuple('Usage', 'n, n_active_time, active_time, n_active_distance, active_distance, first, last')
+
+
+class KitUse(Base):
+    '''
+    a single use of a kit item or model, with the active time and distance of the activity.
+
+    this duplicates values available via statistics (the kit used timestamp on a composite source and
+    the activity statistics) so that the kit statistics can be read from one small table.
+    the active time and distance are updated when the activity statistics are (re)calculated.
+    rows are deleted (via cascade) with the timestamp and so disappear along with the kit or activity.
+    '''
+
+    __tablename__ = 'kit_use'
+
+    id = Column(Integer, ForeignKey('statistic_journal.id', ondelete='cascade'), primary_key=True)
+    statistic_journal = relationship('StatisticJournal')
+    kit_id = Column(Integer, ForeignKey('source.id', ondelete='cascade'), nullable=False, index=True)
+    kit = relationship('Source', foreign_keys=[kit_id])
+    activity_journal_id = Column(Integer, ForeignKey('source.id', ondelete='cascade'), nullable=False, index=True)
+    time = Column(Time, nullable=False)
+    active_time = Column(Float)
+    active_distance = Column(Float)
+
+    @classmethod
+    def add(cls, s, statistic, kit, source):
+        s.add(KitUse(statistic_journal=statistic, kit=kit, activity_journal_id=source.id, time=statistic.time,
+                     active_time=cls._activity_value(s, source, Names.ACTIVE_TIME),
+                     active_distance=cls._activity_value(s, source, Names.ACTIVE_DISTANCE)))
+
+    @staticmethod
+    def _activity_value(s, source, statistic):
+        journal = s.query(StatisticJournal). \
+            join(StatisticName). \
+            filter(StatisticName.name == statistic,
+                   StatisticJournal.source_id == source.id).first()
+        return journal.value if journal else None
+
+    @classmethod
+    def update_activity(cls, s, source, active_time, active_distance):
+        # called by ActivityCalculator so that the totals follow the current activity statistics
+        s.query(KitUse).filter(KitUse.activity_journal_id == source.id). \
+            update({KitUse.active_time: active_time, KitUse.active_distance: active_distance},
+                   synchronize_session=False)
+
+    @classmethod
+    def usage(cls, s, kit):
+        return Usage(*s.query(func.count(KitUse.id),
+                              func.count(KitUse.active_time), func.sum(KitUse.active_time),
+                              func.count(KitUse.active_distance), func.sum(KitUse.active_distance),
+                              func.min(KitUse.time), func.max(KitUse.time)).
+                     filter(KitUse.kit_id == kit.id).one())
@@ -1,9 +1,10 @@
 
 import datetime as dt
+from collections import defaultdict
 from enum import IntEnum
 from logging import getLogger
 
-from sqlalchemy import Column, Integer, ForeignKey, Text, UniqueConstraint, Float, desc, asc, Index
+from sqlalchemy import Column, Integer, ForeignKey, Text, UniqueConstraint, Float, desc, asc, Index, bindparam
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import relationship, backref, synonym
 from sqlalchemy.orm.exc import NoResultFound
@@ -13,8 +14,8 @@ from ..support import Base
 from ..types import Time, ShortCls, Name, name_and_title
 from ..utils import add
 from ...diary.model import TYPE, MEASURES, SCHEDULES
-from ...lib.date import format_seconds, local_date_to_time, time_to_local_time
-from ...lib.utils import sigfig
+from ...lib.date import format_seconds, local_date_to_time, time_to_local_time, extend_range
+from ...lib.utils import sigfig, grouper
 from ...names import Units, simple_name
 
 log = getLogger(__name__)
@@ -194,6 +195,45 @@ class StatisticJournal(Base):
         s.add(journal)
         return journal
 
+    @classmethod
+    def set_values(cls, s, values):
+        '''
+        update existing values in bulk (values is a map from id to new value), with a single update
+        for each subtype, and record the affected (dirty) intervals once.  returns the ids updated.
+
+        the updates bypass the session, so any of the journals that are already loaded are expired.
+        '''
+        updates, found, start, finish = defaultdict(list), set(), None, None
+        for ids in grouper(values.keys(), 900):  # avoid sqlite limit
+            for id, type, time in s.query(StatisticJournal.id, StatisticJournal.type, StatisticJournal.time). \
+                    filter(StatisticJournal.id.in_(list(ids))).all():
+                found.add(id)
+                journal_class = STATISTIC_JOURNAL_CLASSES[type]
+                try:
+                    value = journal_class.parse(values[id])
+                    if value is None: raise Exception('Missing value')
+                except Exception as e:
+                    log.error(f'Could not save {id}:{values[id]}: {e}')
+                    continue
+                updates[journal_class].append({'_id': id, '_value': value})
+                # ignore constants as time 0 and textual values (as in Source.before_flush)
+                if time and journal_class != StatisticJournalText:
+                    start, finish = extend_range(start, finish, time)
+        for id in values.keys() - found:
+            log.error(f'Could not save {id}:{values[id]}: no statistic with that id')
+        saved = set()
+        for journal_class, params in updates.items():
+            table = journal_class.__table__
+            s.execute(table.update().where(table.c.id == bindparam('_id')).values(value=bindparam('_value')),
+                      params)
+            saved.update(param['_id'] for param in params)
+        for instance in list(s.identity_map.values()):
+            if isinstance(instance, StatisticJournal) and instance.id in saved:
+                s.expire(instance)
+        if start is not None:
+            Interval.record_dirty_times(s, start, finish)
+        return saved
+
     def formatted(self):
         if self.value is None:
             return None
@@ -344,7 +384,11 @@ class StatisticJournalInteger(StatisticJournal):
     }
 
     def set(self, value):
-        self.value = value if value is None else int(value)
+        self.value = self.parse(value)
+
+    @staticmethod
+    def parse(value):
+        return value if value is None else int(value)
 
     @classmethod
     def add(cls, s, name, units, summary, owner, source, value, time, serial=None, description=None):
@@ -360,7 +404,11 @@ class StatisticJournalFloat(StatisticJournal):
     value = Column(Float, nullable=False)
 
     def set(self, value):
-        self.value = value if value is None else float(value)
+        self.value = self.parse(value)
+
+    @staticmethod
+    def parse(value):
+        return value if value is None else float(value)
 
     @classmethod
     def add(cls, s, name, units, summary, owner, source, value, time, serial=None, description=None):
@@ -409,7 +457,11 @@ class StatisticJournalText(StatisticJournal):
     value = Column(Text, nullable=False)
 
     def set(self, value):
-        self.value = value if value is None else str(value)
+        self.value = self.parse(value)
+
+    @staticmethod
+    def parse(value):
+        return value if value is None else str(value)
 
     @classmethod
     def add(cls, s, name, units, summary, owner, source, value, time, serial=None, description=None):
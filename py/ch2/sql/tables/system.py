@@ -4,7 +4,7 @@ from os import getpid
 from time import time, sleep
 
 import psutil as ps
-from sqlalchemy import Column, Text, Integer
+from sqlalchemy import Column, Text, Integer, Float, Boolean
 
 from ..support import SystemBase
 from ..types import Time, ShortCls, Name
@@ -51,6 +51,7 @@ class SystemConstant(SystemBase):
     TIMEZONE = 'timezone'
     JUPYTER_URL = 'jupyter-url'
     WEB_URL = 'web-url'
+    PROGRESS_PORT = 'progress-port'
     LAST_GARMIN = 'last-garmin'
     DB_VERSION = 'db-version'
     LOG_COLOR = 'log-color'
@@ -227,3 +228,52 @@ class DirtyInterval(SystemBase):
 
     id = Column(Integer, primary_key=True)
     interval_id = Column(Integer, nullable=False)   # not unique!  allows for easy inserts
+
+
+class PipelineMetric(SystemBase):
+    '''
+    Resources used by a single pipeline (in a single process).
+
+    All pipelines started by one command (including those in worker processes) share a run.
+    '''
+
+    __tablename__ = 'pipeline_metric'
+
+    id = Column(Integer, primary_key=True)
+    run = Column(Text, nullable=False, index=True)
+    version = Column(Text, nullable=False)
+    owner = Column(ShortCls, nullable=False)
+    label = Column(Text, nullable=True)  # eg activity group
+    worker = Column(Boolean, nullable=False, default=False)
+    pid = Column(Integer, nullable=False)
+    start = Column(Time, nullable=False)
+    wall = Column(Float, nullable=False)  # seconds
+    cpu = Column(Float, nullable=False)  # seconds (this process only)
+    rss = Column(Integer, nullable=False)  # peak for process so far, in bytes
+    items = Column(Integer, nullable=True)  # number of missing items processed
+    rows = Column(Integer, nullable=True)  # change in statistic journal count (not measured in workers)
+    queries = Column(Integer, nullable=False)  # number of sql statements executed
+
+    def __str__(self):
+        return f'PipelineMetric {self.owner} / {self.run}'
+
+
+class QueryProfile(SystemBase):
+    '''
+    Count and time of a (normalised) sql statement, for a pipeline or web route (in a single process).
+
+    Only recorded when profiling is enabled (see QueryProfiler).
+    '''
+
+    __tablename__ = 'query_profile'
+
+    id = Column(Integer, primary_key=True)
+    run = Column(Text, nullable=False, index=True)
+    context = Column(Text, nullable=False)  # eg pipeline class and label
+    pid = Column(Integer, nullable=False)
+    statement = Column(Text, nullable=False)
+    count = Column(Integer, nullable=False)
+    time = Column(Float, nullable=False)  # seconds
+
+    def __str__(self):
+        return f'QueryProfile {self.context} / {self.run}'
@@ -12,7 +12,7 @@ from .statistic import StatisticJournal, STATISTIC_JOURNAL_CLASSES
 from .system import SystemConstant
 from ..support import Base
 from ..types import Date, Json, Sched, Sort
-from ..utils import add
+from ..utils import add, add_or_read, unsaved
 from ...lib.date import local_date_to_time
 from ...lib.schedule import Schedule
 
@@ -157,9 +157,10 @@ class Cache:
         if field.id not in self.__cache:
             log.debug(f'Creating {field}')
             name = field.statistic_name
-            self.__cache[field.id] = add(self.__session,
-                                         STATISTIC_JOURNAL_CLASSES[name.statistic_journal_type](
-                                             statistic_name=name, source=self.__source, time=self.__time))
+            statistic = STATISTIC_JOURNAL_CLASSES[name.statistic_journal_type](
+                statistic_name=name, source=self.__source, time=self.__time)
+            if not unsaved(self.__session): add(self.__session, statistic)
+            self.__cache[field.id] = statistic
         log.debug(f'Returning {field}')
         return self.__cache[field.id]
 
@@ -181,10 +182,8 @@ class DiaryTopicJournal(UngroupedSource):
 
     @classmethod
     def get_or_add(cls, s, date):
-        instance = s.query(DiaryTopicJournal).filter(DiaryTopicJournal.date == date).one_or_none()
-        if not instance:
-            instance = add(s, DiaryTopicJournal(date=date))
-        return instance
+        q = s.query(DiaryTopicJournal).filter(DiaryTopicJournal.date == date)
+        return q.one_or_none() or add_or_read(s, DiaryTopicJournal(date=date), q)
 
     def cache(self, s):
         return Cache(s, self, local_date_to_time(self.date),
@@ -233,10 +232,10 @@ class ActivityTopicJournal(GroupedSource):
 
     @classmethod
     def get_or_add(cls, s, file_hash, activity_group):
-        instance = s.query(ActivityTopicJournal).filter(ActivityTopicJournal.file_hash == file_hash).one_or_none()
-        if not instance:
-            instance = add(s, ActivityTopicJournal(file_hash=file_hash, activity_group=activity_group))
-        return instance
+        q = s.query(ActivityTopicJournal).filter(ActivityTopicJournal.file_hash == file_hash)
+        # file_hash_id because the file_hash backref would add the instance to the session
+        return q.one_or_none() or \
+               add_or_read(s, ActivityTopicJournal(file_hash_id=file_hash.id, activity_group=activity_group), q)
 
     def cache(self, s):
         return Cache(s, self, self.file_hash.activity_journal.start,
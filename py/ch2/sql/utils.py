@@ -1,8 +1,17 @@
 
+from logging import getLogger
+
 from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, OperationalError
 
 from ..lib.data import dict_to_attr
 
+log = getLogger(__name__)
+
+SNAPSHOT = 'snapshot'  # in session.info for a read-only snapshot (see database.SessionPool.snapshot_context)
+UNSAVED = 'unsaved'  # in session.info when objects were not saved because the session is a snapshot
+NO_WAIT = 'no-wait'  # in session.info when writes fail rather than wait (see database.no_wait)
+
 
 def tables(*classes):
     return dict_to_attr(dict((cls.__name__, inspect(cls).local_table) for cls in classes))
@@ -11,3 +20,41 @@ def tables(*classes):
 def add(s, instance):
     s.add(instance)
     return instance
+
+
+def unsaved(s):
+    '''
+    true if the session is a read-only snapshot, so new objects cannot be saved.  the session is then
+    marked as unsaved so that the caller knows to repeat the work with a normal session if possible.
+    '''
+    if s.info.get(SNAPSHOT):
+        s.info[UNSAVED] = True
+        return True
+    return False
+
+
+def can_retry(s, e):
+    '''
+    true if the error is from a session that is a snapshot or does not wait for other writers, so might be
+    avoided by repeating the work with a normal session.  these errors should not be caught and logged.
+    '''
+    return isinstance(e, OperationalError) and s is not None and bool(s.info.get(SNAPSHOT) or s.info.get(NO_WAIT))
+
+
+def add_or_read(s, instance, query):
+    '''
+    add an instance that the query did not find.  another thread or process may add the same
+    instance at the same time, in which case the insert fails on a unique constraint, the savepoint
+    is rolled back (leaving the rest of the transaction intact), and the other instance is read instead.
+    in a snapshot the instance is not added, but can still load relationships.
+    '''
+    if unsaved(s):
+        s.enable_relationship_loading(instance)
+        return instance
+    try:
+        with s.begin_nested():
+            s.add(instance)
+        return instance
+    except IntegrityError as e:
+        log.debug(f'Reading {type(instance).__name__} added in parallel ({e.orig})')
+        return query.one()
@@ -0,0 +1,44 @@
+
+from collections import namedtuple
+from concurrent.futures.thread import ThreadPoolExecutor
+from logging import getLogger
+from time import perf_counter
+from urllib.request import urlopen
+
+log = getLogger(__name__)
+
+
+LoadResult = namedtuple('LoadResult', 'path, concurrency, requests, errors, rps, p50, p90, p99')
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def load_test(url, path, concurrency=4, requests=100, timeout=60):
+    '''
+    Request url+path repeatedly from concurrent clients, returning requests per second and
+    latency percentiles (in seconds).
+    '''
+
+    def request(_):
+        start = perf_counter()
+        try:
+            with urlopen(url + path, timeout=timeout) as response:
+                response.read()
+                ok = response.status == 200
+        except Exception as e:
+            log.warning(f'{path}: {e}')
+            ok = False
+        return perf_counter() - start, ok
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, range(requests)))
+    elapsed = perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    result = LoadResult(path, concurrency, requests, sum(not ok for _, ok in results), requests / elapsed,
+                        percentile(latencies, 0.5), percentile(latencies, 0.9), percentile(latencies, 0.99))
+    log.info(f'{path} x{concurrency}: {result.rps:.1f} req/s; p50 {1000 * result.p50:.0f}ms, '
+             f'p90 {1000 * result.p90:.0f}ms, p99 {1000 * result.p99:.0f}ms; {result.errors} errors')
+    return result
@@ -1,7 +1,11 @@
 
+from concurrent.futures.thread import ThreadPoolExecutor
 from logging import getLogger
+from threading import Lock
 
+from sqlalchemy.exc import OperationalError
 from werkzeug import Request, run_simple
+from werkzeug.serving import BaseWSGIServer
 from werkzeug.exceptions import HTTPException, BadRequest
 from werkzeug.routing import Map, Rule
 from werkzeug.wrappers.json import JSONMixin
@@ -16,16 +20,24 @@ from .servlets.kit import Kit
 from .servlets.search import Search
 from .servlets.upload import Upload
 from .static import Static
-from ..commands.args import mm, BASE, LOG, WEB, SERVICE, VERBOSITY, BIND, PORT, DEV, READ, URI, JUPYTER, WARN, SECURE
+from ..commands.args import mm, BASE, LOG, WEB, SERVICE, VERBOSITY, BIND, PORT, DEV, READ, URI, JUPYTER, WARN, SECURE, \
+    THREADS, SNAPSHOT, SQLITE
 from ..jupyter.server import JupyterController
 from ..lib.log import log_current_exception
+from ..lib.metrics import new_run, record_query_profile
 from ..lib.server import BaseController
+from ..lib.workers import ProgressListener
 from ..sql import SystemConstant
+from ..sql.database import SessionPool, PROFILER, scheme, no_wait
+from ..sql.utils import UNSAVED, can_retry
 
 log = getLogger(__name__)
 
 
 MAX_MSG = 1000
+BUSY_WAIT = 20
+READ_ONLY = 'readonly'  # in the sqlite error when writing to a read-only connection
+LOCKED = 'locked'  # in the sqlite error when another connection is writing
 
 DATA = 'data'
 REDIRECT = 'redirect'
@@ -51,13 +63,17 @@ class WebController(BaseController):
         self.__uri = args[URI]
         self.__warn_data = args[WARN + '-' + DATA]
         self.__warn_secure = args[WARN + '-' + SECURE]
+        self.__threads = args[WEB + '-' + THREADS]
+        self.__snapshot = args[WEB + '-' + SNAPSHOT]
         self.__jupyter = JupyterController(args, data)
 
     def _build_cmd_and_log(self, ch2):
         log_name = 'web-service.log'
         cmd = f'{ch2} {mm(VERBOSITY)} 0 {mm(LOG)} {log_name} {mm(BASE)} {self._data.base} ' \
-              f'{WEB} {SERVICE} {mm(WEB + "-" + BIND)} {self._bind} {mm(WEB + "-" + PORT)} {self._port}' \
+              f'{WEB} {SERVICE} {mm(WEB + "-" + BIND)} {self._bind} {mm(WEB + "-" + PORT)} {self._port} ' \
               f'{mm(JUPYTER + "-" + BIND)} {self.__jupyter._bind} {mm(JUPYTER + "-" + PORT)} {self.__jupyter._port}'
+        if self.__threads: cmd += f' {mm(WEB + "-" + THREADS)} {self.__threads}'
+        if self.__snapshot: cmd += f' {mm(WEB + "-" + SNAPSHOT)}'
         if self.__warn_data: cmd += f' {mm(WARN + "-" + DATA)}'
         if self.__warn_secure: cmd += f' {mm(WARN + "-" + SECURE)}'
         return cmd, log_name
@@ -65,13 +81,18 @@ class WebController(BaseController):
     def _run(self):
         self._data.sys.set_constant(SystemConstant.WEB_URL, 'http://%s:%d' % (self._bind, self._port), force=True)
         log.debug(f'Binding to {self._bind}:{self._port} with URI {self.__uri}')
-        run_simple(self._bind, self._port,
-                   WebServer(self._data, self.__jupyter, self.__uri,
-                             warn_data=self.__warn_data, warn_secure=self.__warn_secure),
-                   use_debugger=self._dev, use_reloader=self._dev)
+        server = WebServer(self._data, self.__jupyter, self.__uri, warn_data=self.__warn_data,
+                           warn_secure=self.__warn_secure, sessions=self.__threads, snapshot=self.__snapshot)
+        self._data.sys.set_constant(SystemConstant.PROGRESS_PORT, server.progress_port, force=True)
+        if self.__threads:
+            log.info(f'Serving with {self.__threads} threads')
+            PooledWSGIServer(self._bind, self._port, server, threads=self.__threads).serve_forever()
+        else:
+            run_simple(self._bind, self._port, server, use_debugger=self._dev, use_reloader=self._dev)
 
     def _cleanup(self):
         self._data.sys.delete_constant(SystemConstant.WEB_URL)
+        self._data.sys.delete_constant(SystemConstant.PROGRESS_PORT)
 
     def _status(self, running):
         if running:
@@ -82,6 +103,36 @@ class WebController(BaseController):
         return self._data.sys.get_constant(SystemConstant.WEB_URL, none=True)
 
 
+class PooledWSGIServer(BaseWSGIServer):
+
+    '''
+    Handle requests with a fixed pool of threads (werkzeug's threaded server starts a new thread
+    for each request).
+    '''
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=4, **kargs):
+        super().__init__(host, port, app, **kargs)
+        self.__executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='web')
+
+    def process_request(self, request, client_address):
+        self.__executor.submit(self.__process_request, request, client_address)
+
+    def __process_request(self, request, client_address):
+        # as socketserver.ThreadingMixIn.process_request_thread
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.__executor.shutdown()
+
+
 def error(exception):
     def handler(*args, **kwargs):
         raise exception()
@@ -90,10 +141,18 @@ def error(exception):
 
 class WebServer:
 
-    def __init__(self, data, jcontrol, uri, warn_data=False, warn_secure=False):
+    def __init__(self, data, jcontrol, uri, warn_data=False, warn_secure=False, sessions=0, snapshot=False):
         self.__data = data
         self.__warn_data = warn_data
         self.__warn_secure = warn_secure
+        self.__sessions = sessions
+        self.__session_pool = None
+        self.__snapshot = snapshot
+        self.__snapshot_pool = None
+        self.__session_lock = Lock()
+        self.__progress = ProgressListener()
+        self.progress_port = self.__progress.port
+        self.__profile_run = f'{WEB}-{new_run()}'
 
         analysis = Analysis()
         configure = Configure(data, uri)
@@ -158,16 +217,70 @@ class WebServer:
     def dispatch_request(self, request):
         adapter = self.url_map.bind_to_environ(request.environ)
         try:
-            endpoint, values = adapter.match()
+            rule, values = adapter.match(return_rule=True)
             values.pop('_', None)
-            if self.__data.db:
-                with self.__data.db.session_context() as s:
-                    return endpoint(request, s, **values)
-            else:
-                return endpoint(request, None, **values)
+            context = f'{request.method} {rule.rule}'
+            try:
+                with PROFILER.context(context):
+                    db = self.__data.db
+                    if db:
+                        if self.__use_snapshot(request, db):
+                            response = self.__read_snapshot(context, rule, request, db, values)
+                            if response is not None: return response
+                        with self.__session_context(db) as s:
+                            return rule.endpoint(request, s, **values)
+                    else:
+                        return rule.endpoint(request, None, **values)
+            finally:
+                record_query_profile(self.__data, context, run=self.__profile_run)
         except HTTPException as e:
             return e
 
+    def __session_context(self, db):
+        if self.__sessions:
+            with self.__session_lock:
+                # the database changes after configuration
+                if not self.__session_pool or self.__session_pool.uri != db.uri:
+                    if self.__session_pool: self.__session_pool.close()
+                    self.__session_pool = SessionPool(db, self.__sessions)
+            return self.__session_pool.session_context()
+        else:
+            return db.session_context()
+
+    def __use_snapshot(self, request, db):
+        # requests that change data write to the database, so need a normal session
+        return self.__snapshot and request.method == GET and scheme(db.uri) == SQLITE
+
+    def __read_snapshot(self, context, rule, request, db, values):
+        # returns None if the request must be repeated with a normal session
+        try:
+            with self.__snapshot_context(db) as s:
+                snapshot = rule.endpoint(request, s, **values)
+                if not s.info.get(UNSAVED): return snapshot
+        except OperationalError as e:
+            if READ_ONLY not in str(e): raise
+            log.debug(f'{context} writes to the database so cannot use a snapshot')
+            return None
+        # some new objects (eg diary entries on first display) were not saved, so save them now, unless
+        # that means waiting for another writer, in which case the (unsaved) snapshot is returned
+        try:
+            with self.__session_context(db) as s:
+                with no_wait(s):
+                    response = rule.endpoint(request, s, **values)
+                    s.flush()  # any writes must happen here, without waiting
+                return response
+        except OperationalError as e:
+            if LOCKED not in str(e): raise
+            log.debug(f'{context} cannot write to the database so using a snapshot')
+            return snapshot
+
+    def __snapshot_context(self, db):
+        with self.__session_lock:
+            if not self.__snapshot_pool or self.__snapshot_pool.uri != db.uri:
+                if self.__snapshot_pool: self.__snapshot_pool.close()
+                self.__snapshot_pool = SessionPool(db, max(1, self.__sessions), read_only=True)
+        return self.__snapshot_pool.snapshot_context()
+
     def wsgi_app(self, environ, start_response):
         request = JSONRequest(environ)
         response = self.dispatch_request(request)
@@ -176,8 +289,13 @@ class WebServer:
     def __call__(self, environ, start_response):
         return self.wsgi_app(environ, start_response)
 
-    def get_busy(self):
-        percent = self.__data.sys.get_percent(READ)
+    def get_busy(self, percent=None, wait=0):
+        if wait:
+            percent = self.__progress.wait_for_change(READ, percent, wait)
+        else:
+            percent = self.__progress.get_percent(READ)
+        # the listener knows nothing if the reader has died or if the web server is not running
+        if percent is None: percent = self.__data.sys.get_percent(READ)
         if percent is None: percent = 100
         # the client uses the complete message when the problem has passed
         return {MESSAGE: 'Loading data and recalculating statistics.',
@@ -185,7 +303,10 @@ class WebServer:
                 PERCENT: percent}
 
     def read_busy(self, request, s):
-        return JsonResponse({BUSY: self.get_busy()})
+        # with the current percent this is a long poll, returning on change (if other requests can be handled)
+        percent = request.args.get(PERCENT, type=int)
+        wait = BUSY_WAIT if percent is not None and request.environ.get('wsgi.multithread') else 0
+        return JsonResponse({BUSY: self.get_busy(percent=percent, wait=wait)})
 
     def read_warnings(self, request, s):
         warnings = []
@@ -222,6 +343,7 @@ class WebServer:
                     log.debug(msg)
                     return JsonResponse({DATA: data})
                 except Exception as e:
+                    if can_retry(s, e): raise  # handled in dispatch_request
                     log_current_exception()
                     # maybe some errors are redirects?
                     error = str(e).strip()
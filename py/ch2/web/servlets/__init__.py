@@ -8,7 +8,8 @@ class ContentType:
         'js': 'text/javascript',
         'html': 'text/html',
         'css': 'text/css',
-        'png': 'image/png'
+        'png': 'image/png',
+        'svg': 'image/svg+xml'
     })
 
     def set_content_type(self, response, name):
@@ -56,17 +56,15 @@ class Diary:
         # used to write modified fields back to the database
         data = request.json
         log.info(data)
-        n = 0
+        values = {}
         for key, value in data.items():
             try:
-                id = int(key)
-                journal = s.query(StatisticJournal).filter(StatisticJournal.id == id).one()
-                journal.set(value)
-                n += 1
+                values[int(key)] = value
             except Exception as e:
                 log.error(f'Could not save {key}:{value}: {e}')
+        saved = StatisticJournal.set_values(s, values)
         s.commit()
-        log.info(f'Saved {n} values')
+        log.info(f'Saved {len(saved)} values')
 
 
 def parse_date(date):
@@ -1,6 +1,8 @@
+from collections import defaultdict
 from logging import getLogger
 
-from sqlalchemy import func, distinct
+from sqlalchemy import distinct
+from sqlalchemy.orm import joinedload
 
 from ..json import JsonResponse
 from ...commands.search import text_search
@@ -11,7 +13,8 @@ from ...lib import time_to_local_time
 from ...lib.utils import parse_bool
 from ...names import N
 from ...pipeline.calculate import ActivityCalculator
-from ...sql import StatisticName, ActivityGroup, StatisticJournal, Source, ActivityTopicField, ActivityTopic
+from ...sql import StatisticName, StatisticJournal, StatisticJournalFloat, StatisticJournalText, Source, \
+    ActivityJournal, ActivityTopic, ActivityTopicJournal
 from ...sql.tables.source import SourceType
 
 log = getLogger(__name__)
@@ -57,32 +60,42 @@ def search(s, query, advanced):
         activities = constrained_sources(s, query, conversion=activity_conversion)
     else:
         activities = text_search(s, query)
-    return [expand_activity(s, activity) for activity in sorted(activities, key=lambda x: x.start)]
-
-
-def expand_activity(s, activity_journal):
-
-    topic_journal = activity_journal.get_activity_topic_journal(s)
-
-    def format(statistic):
-        if statistic:
-            return {VALUE: statistic.value, UNITS: statistic.statistic_name.units}
-        else:
-            return None
-
-    def value(statistic):
-        if statistic:
-            return statistic.value
-        else:
-            return None
-
+    return expand_activities(s, [activity.id for activity in activities])
+
+
+def expand_activities(s, ids, chunk=500):
+    '''
+    Expand all activities together (with a few queries per chunk of ids) rather than one at a time
+    (with several queries per activity).
+    '''
+    journals, names, statistics = [], {}, defaultdict(dict)
+    for lo in range(0, len(ids), chunk):
+        chunk_ids = ids[lo:lo+chunk]
+        journals.extend(s.query(ActivityJournal).
+                        options(joinedload(ActivityJournal.activity_group)).
+                        filter(ActivityJournal.id.in_(chunk_ids)).all())
+        names.update(s.query(ActivityJournal.id, StatisticJournalText.value).
+                     join(ActivityTopicJournal, ActivityTopicJournal.file_hash_id == ActivityJournal.file_hash_id).
+                     join(StatisticJournalText, StatisticJournalText.source_id == ActivityTopicJournal.id).
+                     join(StatisticName, StatisticName.id == StatisticJournalText.statistic_name_id).
+                     filter(StatisticName.name == N.NAME,
+                            StatisticName.owner == ActivityTopic,
+                            ActivityJournal.id.in_(chunk_ids)).all())
+        for id, name, units, value in s.query(StatisticJournalFloat.source_id, StatisticName.name,
+                                              StatisticName.units, StatisticJournalFloat.value). \
+                join(StatisticName, StatisticName.id == StatisticJournalFloat.statistic_name_id). \
+                filter(StatisticName.name.in_([N.ACTIVE_TIME, N.ACTIVE_DISTANCE]),
+                       StatisticName.owner == ActivityCalculator,
+                       StatisticJournalFloat.source_id.in_(chunk_ids)).all():
+            statistics[id][name] = {VALUE: value, UNITS: units}
+    return [expand_activity(activity_journal, names.get(activity_journal.id), statistics[activity_journal.id])
+            for activity_journal in sorted(journals, key=lambda journal: journal.start)]
+
+
+def expand_activity(activity_journal, name, statistics):
     return {DB: activity_journal.id,
-            'name': {VALUE: value(StatisticJournal.for_source(s, topic_journal.id, N.NAME,
-                                                              ActivityTopic, topic_journal.activity_group)),
-                     UNITS: None},
+            'name': {VALUE: name, UNITS: None},
             'group': {VALUE: activity_journal.activity_group.name, UNITS: None},
             'start': {VALUE: time_to_local_time(activity_journal.start), UNITS: 'date'},
-            'time': format(StatisticJournal.for_source(s, activity_journal.id, N.ACTIVE_TIME,
-                                                       ActivityCalculator, activity_journal.activity_group)),
-            'distance': format(StatisticJournal.for_source(s, activity_journal.id, N.ACTIVE_DISTANCE,
-                                                           ActivityCalculator, activity_journal.activity_group))}
+            'time': statistics.get(N.ACTIVE_TIME),
+            'distance': statistics.get(N.ACTIVE_DISTANCE)}
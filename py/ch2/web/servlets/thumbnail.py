@@ -1,11 +1,13 @@
 from logging import getLogger
 
 from werkzeug import Response
+from werkzeug.exceptions import BadRequest
 from werkzeug.wrappers import ETagResponseMixin
 
 from . import ContentType
 from ...commands.args import base_system_path, THUMBNAIL
 from ...commands.thumbnail import parse_activity, create_in_cache
+from ...pipeline.calculate.thumbnail import PNG, SVG
 
 log = getLogger(__name__)
 
@@ -20,8 +22,11 @@ class Thumbnail(ContentType):
         self._base = base
 
     def __call__(self, request, s, activity):
+        # svg is much faster to generate (files are about the same size), but the route is simplified
+        format = request.args.get('format', PNG)
+        if format not in (PNG, SVG): raise BadRequest(f'Unsupported format {format}')
         activity_id = parse_activity(s, activity)
-        file = create_in_cache(self._base, s, activity_id)
+        file = create_in_cache(self._base, s, activity_id, format=format)
         try:
             path = base_system_path(self._base, subdir=THUMBNAIL, file=file)
             log.debug(f'Reading {path}')
@@ -1,13 +1,11 @@
+from concurrent.futures.thread import ThreadPoolExecutor
 from logging import getLogger
+from threading import Event
 
-import psutil as ps
-
-from ...commands.args import mm, WEB, READ, LOG, BASE, VERBOSITY, FORCE, DEV
-from ...commands.read import STREAM, NAME, upload_files
-from ...global_ import global_dev
-from ...lib.log import Record
+from ...commands.args import READ
+from ...commands.read import STREAM, NAME, upload_files, read_progress, update
+from ...lib.log import Record, log_current_exception
 from ...lib.utils import parse_bool
-from ...lib.workers import command_root
 
 log = getLogger(__name__)
 
@@ -16,6 +14,8 @@ class Upload:
 
     def __init__(self, data):
         self.__data = data
+        # a single thread so that uploads are read in order, one at a time
+        self.__reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix=READ)
 
     def __call__(self, request, s):
         files = [{NAME: file.filename, STREAM: file.stream} for file in request.files.getlist('files')]
@@ -23,13 +23,23 @@ class Upload:
         force = parse_bool(request.form.get('force'))
         # we do this in two stages
         # first, immediate saving of files while web browser waiting for response
-        upload_files(Record(log), self.__data, files=files, nfiles=len(files), items=items)
-        # second, start rest of ingest process in background
-        cmd = f'{command_root()} {mm(VERBOSITY)} 0 {mm(BASE)} {self.__data.base} {mm(LOG)} {WEB}-{READ}.log'
-        if global_dev(): cmd += f' {mm(DEV)}'
-        cmd += f' {READ}'
-        if force: cmd += f' {mm(FORCE)}'
-        log.info(f'Starting {cmd}')
-        ps.Popen(args=cmd, shell=True)
-        # wait so that the progress has time to kick in
-        self.__data.sys.wait_for_progress(READ)
+        uploaded = upload_files(Record(log), self.__data, files=files, nfiles=len(files), items=items)
+        # second, read the new files (only) and calculate statistics in the background
+        started = Event()
+        self.__reader.submit(self.__read, started, uploaded, force)
+        # wait so that the progress is visible (unless queued behind an earlier upload, which is visible)
+        started.wait(timeout=1)
+
+    def __read(self, started, uploaded, force):
+        progress = None
+        try:
+            flags, progress = read_progress(self.__data)
+            started.set()
+            log.info(f'Reading {len(uploaded)} uploaded file(s)')
+            update(self.__data, progress, force=force, flags=flags, uploaded=uploaded)
+        except Exception as e:
+            log.warning(f'Error reading uploaded files: {e}')
+            log_current_exception()
+        finally:
+            started.set()
+            if progress: progress.complete()
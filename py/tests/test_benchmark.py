@@ -0,0 +1,50 @@
+
+import datetime as dt
+from tempfile import TemporaryDirectory
+
+from ch2.commands.args import make_parser, NamespaceWithVariables, BENCHMARK, ACTIVITIES, ACTIVITY_RECORDS, \
+    MONITORS, MONITOR_RECORDS, REQUESTS, THREADS, INDEXES, mm
+from ch2.commands.benchmark import run_benchmark, compare_indexes, WRITES
+from ch2.sql.database import PROFILER
+from ch2.fit.synthetic import synthetic_activity, synthetic_monitor
+from ch2.pipeline.read.activity import ActivityReader
+from ch2.pipeline.read.monitor import MonitorReader
+from tests import LogTestCase
+
+
+class TestBenchmark(LogTestCase):
+
+    def test_synthetic(self):
+        start = dt.datetime(2020, 1, 1, 12, tzinfo=dt.timezone.utc)
+        records = ActivityReader.parse_records(synthetic_activity(start, 100))
+        self.assertEqual(ActivityReader.read_sport('x', records), 'cycling')
+        self.assertEqual(ActivityReader.read_first_timestamp('x', records), start)
+        self.assertEqual(len([record for record in records if record.name == 'record']), 100)
+        records = MonitorReader.parse_records(synthetic_monitor(start, 100))
+        self.assertEqual(MonitorReader.read_first_timestamp('x', records), start)
+        self.assertEqual(MonitorReader.read_last_timestamp('x', records), start + dt.timedelta(minutes=99))
+
+    def test_benchmark(self):
+        args = NamespaceWithVariables(make_parser().parse_args(
+            [BENCHMARK, mm(ACTIVITIES), '1', mm(ACTIVITY_RECORDS), '300', mm(MONITORS), '1',
+             mm(MONITOR_RECORDS), '120', mm(REQUESTS), '4', mm(THREADS), '2']))
+        with TemporaryDirectory() as base:
+            results = run_benchmark(base, args)
+        self.assertEqual(results['phases']['upload']['items'], 2)
+        self.assertEqual(results['phases']['read-activity']['records'], 300)
+        self.assertEqual(results['phases']['search']['items'], 2)
+        self.assertTrue(any(name.startswith('calculate:') for name in results['pipelines']))
+        for result in results['web']:
+            self.assertEqual(result['errors'], 0, result['path'])
+
+    def test_indexes(self):
+        args = NamespaceWithVariables(make_parser().parse_args(
+            [BENCHMARK, mm(INDEXES), mm(ACTIVITIES), '1', mm(ACTIVITY_RECORDS), '300', mm(MONITORS), '1',
+             mm(MONITOR_RECORDS), '120', mm(REQUESTS), '4', mm(THREADS), '2']))
+        with TemporaryDirectory() as base:
+            results = compare_indexes(base, args)
+        self.assertFalse(PROFILER.enabled)
+        self.assertTrue(results['indexes'])
+        self.assertTrue(any(index['used'] for index in results['indexes']))
+        self.assertEqual(sorted(results['comparison']['write']), sorted(WRITES))
+        self.assertIn('search', results['comparison']['read'])
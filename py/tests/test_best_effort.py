@@ -0,0 +1,47 @@
+
+import numpy as np
+import pandas as pd
+
+from ch2.data.activity import times_for_distance, max_mean_stats, max_med_stats, best_effort_stats
+from ch2.names import Names as N
+from tests import LogTestCase
+
+
+class TestBestEffort(LogTestCase):
+
+    def frame(self, n=4 * 3600, speed=36):
+        # one sample per second at constant speed (km/h), with a pause in the middle
+        index = pd.date_range(start='2020-01-01 10:00:00', periods=n, freq='1S', tz='UTC')
+        df = pd.DataFrame({N.DISTANCE: np.arange(n) * speed / 3600,
+                           N.HEART_RATE: 100 + (np.arange(n) // 600) % 50,
+                           N.POWER_ESTIMATE: 200.0,
+                           N.TIMESPAN_ID: np.where(np.arange(n) < n // 2, 1.0, 2.0)},
+                          index=index)
+        return df.drop(index=index[n // 2 - 600:n // 2])
+
+    def test_times_for_distance(self):
+        stats = times_for_distance(self.frame(), km=(5, 10, 1000))
+        self.assertAlmostEqual(stats[N.MIN_KM_TIME % 5], 500, places=3)
+        self.assertAlmostEqual(stats[N.MED_KM_TIME % 10], 1000, places=3)
+        self.assertFalse(N.MIN_KM_TIME % 1000 in stats)
+
+    def test_max_mean(self):
+        stats = max_mean_stats(self.frame(), mins=(5, 60, 1000))
+        self.assertAlmostEqual(stats[N.MAX_MEAN_PE_M % 5], 200)
+        self.assertAlmostEqual(stats[N.MAX_MEAN_PE_M % 60], 200)
+        self.assertFalse(N.MAX_MEAN_PE_M % 1000 in stats)
+
+    def test_max_med(self):
+        stats = max_med_stats(self.frame(), mins=(5, 60))
+        self.assertEqual(stats[N.MAX_MED_HR_M % 5], 123)
+        self.assertEqual(stats[N.MAX_MED_HR_M % 60], 120.5)
+
+    def test_shared_resample(self):
+        df = self.frame()
+        stats = best_effort_stats(df)
+        for name, value in max_med_stats(df).items():
+            self.assertEqual(stats[name], value)
+        for name, value in max_mean_stats(df).items():
+            self.assertEqual(stats[name], value)
+        for name, value in times_for_distance(df).items():
+            self.assertEqual(stats[name], value)
@@ -0,0 +1,43 @@
+
+import numpy as np
+import pandas as pd
+
+from ch2.data.climb import find_climbs, search, biggest_reversal
+from ch2.names import Names as N
+from tests import LogTestCase
+
+
+class TestClimb(LogTestCase):
+
+    def ride(self, n=4 * 3600, speed=24):
+        # a single 200m climb over 4km in the middle of an otherwise flat ride (1 sample/sec)
+        index = pd.date_range(start='2020-01-01 10:00:00', periods=n, freq='1S', tz='UTC')
+        distance = np.arange(n) * speed / 3600
+        elevation = 100 + 50 * np.clip(distance - 40, 0, 4)
+        return pd.DataFrame({N.DISTANCE: distance, N.ELEVATION: elevation}, index=index)
+
+    def test_search(self):
+        distance = np.arange(10) * 0.1
+        elevation = np.array([0, 0, 10, 30, 60, 90, 100, 100, 90, 90], dtype=float)
+        score, lo, hi = search(distance, elevation)
+        self.assertTrue(score)
+        self.assertEqual((lo, hi), (1, 5))
+
+    def test_reversal(self):
+        elevation = np.array([0, 10, 20, 15, 12, 30, 40], dtype=float)
+        self.assertEqual(biggest_reversal(elevation), (8, 4, 2))
+
+    def test_single_climb(self):
+        climbs = list(find_climbs(self.ride()))
+        self.assertEqual(len(climbs), 1)
+        climb = climbs[0]
+        # constant gradient, so any section above the minimum elevation scores equally
+        self.assertGreater(climb[N.CLIMB_ELEVATION], 80)
+        self.assertLess(climb[N.CLIMB_ELEVATION], 201)
+        self.assertAlmostEqual(climb[N.CLIMB_GRADIENT], 5, delta=0.1)
+        self.assertEqual(climb[N.CLIMB_CATEGORY], '4')
+
+    def test_flat(self):
+        df = self.ride()
+        df[N.ELEVATION] = 100
+        self.assertEqual(list(find_climbs(df)), [])
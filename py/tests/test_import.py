@@ -0,0 +1,104 @@
+
+import datetime as dt
+from logging import getLogger
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+from ch2.commands.args import bootstrap_dir, m, V
+from ch2.commands.import_ import import_source
+from ch2.config.profile.default import default
+from ch2.import_ import read_statistic_journals, copy_statistic_journals
+from ch2.lib import local_date_to_time
+from ch2.lib.log import Record
+from ch2.sql import DiaryTopicField, DiaryTopicJournal, StatisticJournal, StatisticName
+from ch2.sql.database import ReflectedDatabase
+from ch2.sql.tables.statistic import STATISTIC_JOURNAL_CLASSES, StatisticJournalType
+from tests import LogTestCase
+
+log = getLogger(__name__)
+
+DAYS = 20
+START = dt.date(2020, 1, 1)
+
+
+class TestImport(LogTestCase):
+
+    def make_old(self, dir):
+        # a small database with diary entries to import (the schema is current, but the import
+        # only uses what has not changed between versions)
+        args, old = bootstrap_dir(dir, m(V), '5', configurator=default)
+        with old.db.session_context() as s:
+            fields = s.query(DiaryTopicField).join(StatisticName). \
+                filter(StatisticName.name.in_(['notes', 'weight', 'mood'])).all()
+            for day in range(DAYS):
+                date = START + dt.timedelta(days=day)
+                journal = DiaryTopicJournal.get_or_add(s, date)
+                for field in fields:
+                    type = StatisticJournalType(field.statistic_name.statistic_journal_type)
+                    value = f'day {day}' if type == StatisticJournalType.TEXT else 60.0 + day
+                    s.add(STATISTIC_JOURNAL_CLASSES[type](statistic_name=field.statistic_name, source=journal,
+                                                          value=value, time=local_date_to_time(date)))
+            s.commit()
+        return old
+
+    def read_values(self, data):
+        with data.db.session_context() as s:
+            return sorted((journal.statistic_name.name, str(journal.source.date), journal.value)
+                          for journal in s.query(StatisticJournal).join(DiaryTopicJournal).
+                          filter(StatisticJournal.time > 0.0).all())
+
+    def test_diary(self):
+        with TemporaryDirectory() as old_dir, TemporaryDirectory() as new_dir:
+            old = self.make_old(old_dir)
+            expected = self.read_values(old)
+            self.assertEqual(len(expected), 3 * DAYS)
+            reflected = ReflectedDatabase(old.db.uri)
+            with reflected.session_context() as old_s:
+                statistic_name = reflected.meta.tables['statistic_name']
+                weight = old_s.query(statistic_name).filter(statistic_name.c.name == 'weight').one()
+                journals = read_statistic_journals(old_s, reflected, weight)
+                self.assertEqual(sorted(journal.value for journal in journals), [60.0 + day for day in range(DAYS)])
+            args, new = bootstrap_dir(new_dir, m(V), '5', configurator=default)
+            inserts = []
+
+            def count_inserts(conn, cursor, statement, parameters, context, executemany):
+                if executemany and statement.startswith('INSERT INTO statistic_journal'): inserts.append(statement)
+
+            event.listen(new.db.engine, 'before_cursor_execute', count_inserts)
+            try:
+                import_source(new, Record(log), old.db.uri)
+            finally:
+                event.remove(new.db.engine, 'before_cursor_execute', count_inserts)
+            # values are bulk inserted (executemany) - two tables for each of three fields
+            self.assertEqual(len(inserts), 2 * 3)
+            self.assertEqual(self.read_values(new), expected)
+            with new.db.session_context() as s:
+                self.assertEqual(s.query(DiaryTopicJournal).count(), DAYS)
+            # a second import changes nothing
+            import_source(new, Record(log), old.db.uri)
+            self.assertEqual(self.read_values(new), expected)
+
+    def test_rollback(self):
+        with TemporaryDirectory() as old_dir, TemporaryDirectory() as new_dir:
+            old = self.make_old(old_dir)
+            args, new = bootstrap_dir(new_dir, m(V), '5', configurator=default)
+            failed = []
+
+            def fail_once(record, old_journals, new_s, new_statistic_name, new_source_id, name=None):
+                if not failed:
+                    # create some sources, then fail, so that the new sources are rolled back
+                    failed.append(new_statistic_name.name)
+                    for old_journal in old_journals[:3]: new_source_id(old_journal)
+                    raise Exception('Failed copy')
+                copy_statistic_journals(record, old_journals, new_s, new_statistic_name, new_source_id, name=name)
+
+            with patch('ch2.import_.diary.copy_statistic_journals', side_effect=fail_once):
+                import_source(new, Record(log), old.db.uri)
+            # the other fields still refer to valid sources, created after the rollback
+            expected = [value for value in self.read_values(old) if value[0] not in failed]
+            self.assertEqual(len(expected), 2 * DAYS)
+            self.assertEqual(self.read_values(new), expected)
+            with new.db.session_context() as s:
+                self.assertEqual(s.query(DiaryTopicJournal).count(), DAYS)
@@ -8,8 +8,8 @@ from ch2.config.profile.default import default
 from ch2.diary.model import TYPE
 from ch2.lib import now, local_date_to_time
 from ch2.pipeline.pipeline import run_pipeline
-from ch2.sql import KitModel, KitItem, KitComponent, PipelineType
-from ch2.sql.tables.kit import get_name, KitGroup, NAME, ITEMS, COMPONENTS, MODELS, STATISTICS, INDIVIDUAL
+from ch2.sql import KitModel, KitItem, KitComponent, KitUse, PipelineType
+from ch2.sql.tables.kit import get_name, KitGroup, NAME, ITEMS, COMPONENTS, MODELS, STATISTICS, INDIVIDUAL, N
 from tests import LogTestCase
 
 
@@ -213,3 +213,21 @@ class TestKit(LogTestCase):
                 self.assertEqual(chain[NAME], 'chain')
                 self.assertEqual(len(chain[MODELS]), 6)
                 self.assertFalse(STATISTICS in bike)
+                item = KitItem.get(s, 'cotic')
+                usage = item.usage(s)
+                self.assertEqual(usage.n, 2)
+                self.assertEqual(usage.n_active_time, 2)
+                self.assertAlmostEqual(usage.active_time, sum(value.value for value in item.active_times(s)))
+                self.assertAlmostEqual(usage.active_distance,
+                                       sum(value.value for value in item.active_distances(s)))
+                self.assertTrue(usage.first < usage.last)
+                cotic = item.to_model(s, statistics=INDIVIDUAL)
+                self.assertEqual([statistic[N] for statistic in cotic[STATISTICS]], [2, 2, 1])
+                # stale totals (eg before fixing elevation or distance)
+                s.query(KitUse).update({KitUse.active_time: None, KitUse.active_distance: None})
+                self.assertEqual(item.usage(s).n_active_time, 0)
+
+            # activity statistics recalculated
+            run_pipeline(data, PipelineType.CALCULATE, like=['%Activity%'], force=True, n_cpu=1)
+            with data.db.session_context() as s:
+                self.assertEqual(KitItem.get(s, 'cotic').usage(s), usage)
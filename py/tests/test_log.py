@@ -0,0 +1,62 @@
+
+from logging import getLogger, Handler, DEBUG, INFO
+from threading import get_ident
+from time import sleep
+
+from tests import LogTestCase
+
+from ch2.lib.log import queued, stop_log, RateLimit
+
+
+class Collect(Handler):
+
+    def __init__(self, level=DEBUG):
+        super().__init__(level=level)
+        self.messages = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.threads.add(get_ident())
+
+
+class TestLog(LogTestCase):
+
+    def test_rate_limit(self):
+        collect = Collect()
+        collect.addFilter(RateLimit(limit=3, period=0.1))
+        log = getLogger('ch2.test_rate_limit')
+        log.addHandler(collect)
+
+        def repeat():
+            for i in range(10):
+                log.info('repeated %d', i)
+
+        try:
+            repeat()
+            log.info('different')
+            self.assertEqual(collect.messages, ['repeated 0', 'repeated 1', 'repeated 2', 'different'])
+            sleep(0.2)
+            repeat()
+            self.assertEqual(collect.messages[-3:],
+                             ['repeated 0 (7 similar messages dropped)', 'repeated 1', 'repeated 2'])
+            for i in range(5):
+                log.warning('warning %d', i)
+            self.assertEqual(collect.messages[-5:], [f'warning {i}' for i in range(5)])
+        finally:
+            log.removeHandler(collect)
+
+    def test_queue(self):
+        collect = Collect(level=INFO)
+        handler = queued(collect)
+        log = getLogger('ch2.test_queue')
+        log.addHandler(handler)
+        try:
+            log.debug('ignored')
+            for i in range(5):
+                log.info(f'message {i}')
+            stop_log()
+            self.assertEqual(collect.messages, [f'message {i}' for i in range(5)])
+            self.assertNotIn(get_ident(), collect.threads)
+        finally:
+            log.removeHandler(handler)
@@ -0,0 +1,155 @@
+
+from collections import namedtuple
+from contextlib import redirect_stdout
+from io import StringIO, BytesIO
+from logging import getLogger
+from os import environ
+from tempfile import TemporaryDirectory
+
+from sqlalchemy.dialects import postgresql
+
+from ch2 import COMMANDS
+from ch2.commands.args import bootstrap_dir, m, V, METRICS, mm, PROFILE_SQL, PLAN, MAINTAIN, ADVISE, CREATE
+from ch2.config.profile.default import default
+from ch2.commands.read import upload_files, uploaded_paths, NAME, STREAM, ACTIVITY
+from ch2.fit.synthetic import synthetic_files
+from ch2.lib.log import Record
+from ch2.lib.metrics import new_run, RUN
+from ch2.pipeline.pipeline import run_pipeline
+from ch2.sql import PipelineType
+from ch2.sql.database import normalise_sql, query_plan, PROFILER, PROFILE_SQL as PROFILE_SQL_ENV
+from ch2.sql.index import advise, Index, applies, create_and_validate, index_ddl, index_name, drop_indexes
+from tests import LogTestCase
+
+log = getLogger(__name__)
+
+Profile = namedtuple('Profile', 'statement, time')
+
+
+class TestMetrics(LogTestCase):
+
+    def test_metrics(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            runs = []
+            for _ in range(2):
+                runs.append(new_run())
+                run_pipeline(data, PipelineType.CALCULATE, like=['%Activity%'], n_cpu=1)
+            metrics = data.sys.get_metrics(run=runs[0])
+            self.assertEqual([metric.owner for metric in metrics], ['ActivityCalculator'])
+            self.assertEqual(metrics[0].items, 0)
+            self.assertTrue(metrics[0].queries > 0)
+            self.assertTrue(metrics[0].rss > 0)
+            for extra in ([], ['-1'], ['-2', '-1']):
+                args, data = bootstrap_dir(f, m(V), '5', METRICS, *extra)
+                output = StringIO()
+                with redirect_stdout(output):
+                    COMMANDS[METRICS](args, data)
+                self.assertTrue((runs[-1] if not extra else 'ActivityCalculator') in output.getvalue(),
+                                output.getvalue())
+
+    def test_workers(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            files = [{NAME: name, STREAM: BytesIO(contents)}
+                     for name, contents in synthetic_files(3, 60, 0, 0)]
+            uploaded = upload_files(Record(log), data, files=files, nfiles=len(files))
+            run_pipeline(data, PipelineType.READ_ACTIVITY, n_cpu=1, **uploaded_paths(uploaded, ACTIVITY))
+            environ.pop(RUN, None)  # no new_run(), as in ch2 calculate
+            run_pipeline(data, PipelineType.CALCULATE, like=['%ActivityCalculator%'],
+                         n_cpu=2, overhead=1, cost_calc=100, cost_write=1)
+            metrics = [metric for metric in data.sys.get_metrics() if metric.owner == 'ActivityCalculator']
+            self.assertTrue(any(metric.worker for metric in metrics))
+            self.assertEqual(len(set(metric.run for metric in metrics)), 1)
+            self.assertEqual(metrics[0].run, environ[RUN])
+
+    def test_normalise(self):
+        self.assertEqual(normalise_sql("SELECT a_1 FROM t\n WHERE t.id IN (?, ?, ?) AND t.name = 'it''s' AND x > 1.5"),
+                         'SELECT a_1 FROM t WHERE t.id IN (?, ...) AND t.name = ? AND x > ?')
+        self.assertEqual(normalise_sql('SELECT * FROM t WHERE t.id IN (%(id_1)s, %(id_2)s)'),
+                         'SELECT * FROM t WHERE t.id IN (?, ...)')
+
+    def test_profile(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            try:
+                args, data = bootstrap_dir(f, m(V), '5', mm(PROFILE_SQL))
+                self.assertTrue(PROFILER.enabled)
+                run = new_run()
+                run_pipeline(data, PipelineType.CALCULATE, like=['%Activity%'], n_cpu=1)
+            finally:
+                PROFILER.enabled = False
+                del environ[PROFILE_SQL_ENV]
+            profiles = data.sys.get_query_profiles(run=run)
+            self.assertTrue(profiles)
+            self.assertEqual(set(profile.context for profile in profiles), {'ActivityCalculator'})
+            args, data = bootstrap_dir(f, m(V), '5', METRICS, '-1')
+            output = StringIO()
+            with redirect_stdout(output):
+                COMMANDS[METRICS](args, data)
+            self.assertTrue(profiles[0].statement in output.getvalue(), output.getvalue())
+            args, data = bootstrap_dir(f, m(V), '5', METRICS, '-1', mm(PLAN))
+            output = StringIO()
+            with redirect_stdout(output):
+                COMMANDS[METRICS](args, data)
+            self.assertTrue('USING' in output.getvalue(), output.getvalue())
+            args, data = bootstrap_dir(f, m(V), '5', METRICS, '-1', mm(ADVISE), mm(CREATE))
+            output = StringIO()
+            with redirect_stdout(output):
+                COMMANDS[METRICS](args, data)
+            self.assertTrue('index' in output.getvalue(), output.getvalue())
+
+    def test_plan(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            with data.db.session_context() as s:
+                plan = dict(query_plan(s, normalise_sql(
+                    'SELECT statistic_journal.time FROM statistic_journal '
+                    'WHERE statistic_journal.source_id IN (1, 2) AND statistic_journal.statistic_name_id = 3')))
+                self.assertEqual(list(plan.values()), [None], plan)
+                plan = dict(query_plan(s, 'SELECT statistic_journal.type FROM statistic_journal '
+                                          'ORDER BY statistic_journal.time + statistic_journal.serial'))
+                self.assertEqual(set(plan.values()), {'full scan', 'sort'}, plan)
+
+    def test_advise(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            values = normalise_sql(
+                'SELECT statistic_journal.time, statistic_journal_float.value FROM statistic_journal '
+                'JOIN statistic_journal_float ON statistic_journal.id = statistic_journal_float.id '
+                'WHERE statistic_journal.statistic_name_id = 1 AND statistic_journal.time >= 2')
+            names = normalise_sql('SELECT statistic_name.name FROM statistic_name WHERE statistic_name.owner = 1')
+            profiles = [Profile(values, 2.0), Profile(names, 1.0), Profile(names, 0.5)]
+            with data.db.session_context() as s:
+                advice = advise(s, profiles)
+            # statistic_journal is already covered (by the unique constraint) but the value is read by primary key
+            self.assertEqual([entry.index for entry in advice],
+                             [Index('statistic_journal_float', ('id',), ('value',)),
+                              Index('statistic_name', ('owner',), ('name',))])
+            self.assertEqual([entry.time for entry in advice], [2.0, 1.5])
+            values_index, names_index = [entry.index for entry in advice]
+            self.assertEqual(index_ddl(postgresql.dialect(), values_index),
+                             'CREATE INDEX IF NOT EXISTS ix_cover_statistic_journal_float_id '
+                             'ON statistic_journal_float (id) INCLUDE (value)')
+            self.assertEqual(index_ddl(data.db.engine.dialect, names_index),
+                             'CREATE INDEX IF NOT EXISTS ix_cover_statistic_name_owner ON statistic_name (owner, name)')
+            # sqlite stores the values in primary key order, so only the second index is created
+            self.assertFalse(applies(data.db.engine.dialect, values_index))
+            valid = create_and_validate(data.db, advice)
+            self.assertEqual([entry.index for entry in valid], [names_index])
+            with data.db.session_context() as s:
+                self.assertEqual([step for step, _ in query_plan(s, names)],
+                                 ['SEARCH statistic_name USING COVERING INDEX ix_cover_statistic_name_owner (owner=?)'])
+            self.assertEqual(drop_indexes(data.db.engine), [index_name(names_index)])
+
+    def test_maintain(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            args, data = bootstrap_dir(f, m(V), '5', MAINTAIN, 'check', 'vacuum')
+            run = new_run()
+            COMMANDS[MAINTAIN](args, data)
+            metrics = data.sys.get_metrics()
+            self.assertTrue(all(metric.run != run for metric in metrics))  # command starts a new run
+            self.assertEqual([metric.label for metric in metrics],
+                             ['vacuum activity', 'check activity', 'vacuum system', 'check system'])
+            self.assertEqual(set(metric.owner for metric in metrics), {'Maintenance'})
@@ -1,7 +1,7 @@
 
 from tests import LogTestCase
 
-from ch2.data.constraint import constraint
+from ch2.data.constraint import constraint, parse_constraint, normalise
 from ch2.lib.peg import literal, drop, sequence, choice, pattern
 
 
@@ -36,3 +36,12 @@ class TestPeg(LogTestCase):
                          [(('a', '=', 'b'), 'and', (('c', '<=', 2.0), 'or', ('e', '<', 1.2)))])
         self.assertEqual(list(constraint('a = "b" and c <= 2 or 1.2 > e')),
                          [((('a', '=', 'b'), 'and', ('c', '<=', 2.0)), 'or', ('e', '<', 1.2))])
+
+    def test_normalise(self):
+        self.assertEqual(normalise(' a  =  "b  c"\tand d>1 '), 'a = "b  c" and d>1')
+
+    def test_template(self):
+        template, values = parse_constraint('a = "b" and (c <= 2 or 1.2 > e)')
+        self.assertEqual(values, {'p0': 'b', 'p1': 2, 'p2': 1.2})
+        self.assertEqual(template, parse_constraint('a="x"  and (c <= 3 or 0 > e)')[0])
+        self.assertNotEqual(template, parse_constraint('a = 1 and (c <= 2 or 1.2 > e)')[0])
@@ -1,12 +1,15 @@
 from logging import getLogger
 from tempfile import TemporaryDirectory
 
+import numpy as np
 import pandas as pd
 
 from ch2.commands.read import read
 from ch2.commands.args import bootstrap_dir, mm, DEV, V, m
 from ch2.config.profile.default import default
 from ch2.data import Names as N, Statistics
+from ch2.data.frame import linear_resample_time
+from ch2.data.power import add_differentials, evaluate, evaluate_activities, unstack_activities, PowerModel
 from ch2.pipeline.read import SegmentReader
 from tests import LogTestCase
 
@@ -40,3 +43,32 @@ class TestPower(LogTestCase):
                 both = both.loc[both['keep'] == True].drop(columns=['keep'])
                 both = both.loc[both[N.TIMESPAN_ID].isin(stats[N.TIMESPAN_ID].unique())]
                 both.describe()
+
+    def activity(self, start, n=3600, seed=1):
+        rng = np.random.default_rng(seed)
+        index = pd.date_range(start=start, periods=n, freq='1S', tz='UTC')
+        speed = 8 + rng.normal(0, 1, n)
+        df = pd.DataFrame({N.SPEED: speed, N.DISTANCE: np.cumsum(speed),
+                           N.ELEVATION: np.cumsum(rng.normal(0, 0.1, n)),
+                           N.LATITUDE: -33 + np.cumsum(rng.normal(0, 1e-5, n)),
+                           N.LONGITUDE: -70 + np.cumsum(rng.normal(0, 1e-5, n)),
+                           N.CADENCE: rng.uniform(0, 90, n)}, index=index)
+        return linear_resample_time(df.drop(index=index[1000:1010]))
+
+    def test_differentials(self):
+        df = add_differentials(self.activity('2020-01-01 10:00'), max_gap=1.5)
+        self.assertTrue(np.isnan(df[N.DELTA_DISTANCE].iloc[0]))
+        self.assertTrue(np.isnan(df[N.AVG_SPEED_2].iloc[0]))
+        speed = df[N.SPEED].values
+        self.assertAlmostEqual(df[N.AVG_SPEED_2].iloc[1], (speed[0] ** 2 + speed[0] * speed[1] + speed[1] ** 2) / 3)
+        self.assertAlmostEqual(df[N.DELTA_DISTANCE].iloc[1], df[N.DISTANCE].iloc[1] - df[N.DISTANCE].iloc[0])
+
+    def test_batch(self):
+        dfs = [self.activity(f'2020-01-0{i} 10:00', seed=i) for i in range(1, 4)]
+        model = PowerModel()
+        single = [evaluate(add_differentials(df.copy(), max_gap=1.5), model) for df in dfs]
+        df, starts = evaluate_activities(dfs, model, max_gap=1.5)
+        self.assertEqual(starts.sum(), 3)
+        for a, b in zip(single, unstack_activities(df, starts)):
+            for name in (N.DELTA_DISTANCE, N.AVG_AIR_SPEED_2, N.POWER_ESTIMATE, N.ENERGY):
+                self.assertTrue(np.allclose(a[name].values, b[name].values, equal_nan=True), name)
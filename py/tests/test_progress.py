@@ -0,0 +1,58 @@
+
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import sleep
+
+from ch2.commands.args import bootstrap_dir, m, V
+from ch2.lib.workers import ProgressListener, ProgressPublisher, SystemProgressTree
+from ch2.sql import SystemConstant
+from tests import LogTestCase
+
+
+class TestProgress(LogTestCase):
+
+    def test_channel(self):
+        listener = ProgressListener()
+        publisher = ProgressPublisher(listener.port, rate=1000)
+        self.assertIsNone(listener.get_percent('x'))
+
+        def publish():
+            for percent in range(0, 101, 20):
+                publisher.publish('x', percent)
+                sleep(0.01)
+
+        Thread(target=publish).start()
+        seen = [None]
+        while seen[-1] != 100 and len(seen) < 10:
+            seen.append(listener.wait_for_change('x', seen[-1], 5))
+        # messages may be dropped (udp), but each is the latest value
+        seen = seen[1:]
+        self.assertTrue(set(seen) <= {0, 20, 40, 60, 80, 100}, seen)
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(seen[-1], 100)
+        listener.close()
+
+    def test_throttle(self):
+        listener = ProgressListener()
+        publisher = ProgressPublisher(listener.port, rate=1)
+        for percent in range(10):
+            publisher.publish('x', percent)
+        self.assertEqual(listener.wait_for_change('x', None, 5), 0)
+        publisher.publish('x', 99, force=True)
+        self.assertEqual(listener.wait_for_change('x', 0, 5), 99)
+        listener.close()
+
+    def test_system(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5')
+            listener = ProgressListener()
+            data.sys.set_constant(SystemConstant.PROGRESS_PORT, listener.port, force=True)
+            progress = SystemProgressTree(data.sys, 'x', 10, db_interval=60)
+            progress.increment()
+            # published but not written to the database
+            self.assertEqual(listener.wait_for_change('x', None, 5), 10)
+            self.assertEqual(data.sys.get_percent('x'), 0)
+            progress.complete()
+            self.assertEqual(listener.wait_for_change('x', 10, 5), 100)
+            self.assertIsNone(data.sys.get_percent('x'))
+            listener.close()
@@ -0,0 +1,52 @@
+
+import datetime as dt
+from math import log10
+
+import numpy as np
+import pandas as pd
+
+from ch2.data.lib import inplace_decay
+from ch2.data.response import calc_response, sum_to_hour, extend_to_hour, IMPULSE_3600, RESPONSE, fit_ff_params
+from tests import LogTestCase
+
+
+class TestResponse(LogTestCase):
+
+    def impulses(self, days=100, seed=1):
+        rng = np.random.default_rng(seed)
+        index = pd.date_range('2020-01-01', periods=days * 24 * 6, freq='10min', tz='UTC')
+        keep = rng.random(len(index)) < 0.02
+        return pd.DataFrame({'hr': rng.uniform(0, 10, keep.sum())}, index=index[keep])
+
+    def test_matches_decay(self):
+        hr3600 = sum_to_hour(self.impulses(), 'hr')
+        period = 42 * 24
+        expected = hr3600.rename(columns={IMPULSE_3600: RESPONSE})
+        inplace_decay(expected, RESPONSE, period)
+        response = calc_response(hr3600, (log10(period),))
+        self.assertTrue(np.allclose(response.values, expected[RESPONSE].values))
+
+    def test_checkpoint(self):
+        impulses = self.impulses()
+        params = (log10(7 * 24), log10(100))
+        full = calc_response(sum_to_hour(impulses, 'hr'), params)
+        checkpoint = full.index[len(full) // 3]
+        later = sum_to_hour(impulses.loc[checkpoint:], 'hr')
+        later = extend_to_hour(later, checkpoint, full.index[-1] + dt.timedelta(hours=5))
+        extended = calc_response(later, params, initial=full.loc[checkpoint])
+        self.assertEqual(extended.index[0], checkpoint + dt.timedelta(hours=1))
+        self.assertEqual(len(extended), len(full.loc[checkpoint:]) - 1 + 5)
+        self.assertTrue(np.allclose(extended.loc[:full.index[-1]].values,
+                                    full.loc[checkpoint + dt.timedelta(hours=1):].values))
+        # padded with zeroes, so decays
+        self.assertTrue(extended.iloc[-1] < extended.iloc[-6])
+
+    def test_fit(self):
+        hr3600 = sum_to_hour(self.impulses(days=300), 'hr')
+        period = 20 * 24
+        response = calc_response(hr3600, (log10(period),))
+        times = response.index[24 * 30::24 * 7]
+        performances = [pd.Series(3 + 2 * response.loc[times].values, index=times)]
+        result, rejected = fit_ff_params(hr3600, (log10(42 * 24),), performances, method='L2', tol=1e-6)
+        self.assertAlmostEqual(10 ** result.x[0] / 24, 20, delta=1)
+        self.assertEqual(rejected, [])
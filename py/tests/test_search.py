@@ -0,0 +1,56 @@
+
+import datetime as dt
+from tempfile import TemporaryDirectory
+
+from ch2.commands.args import bootstrap_dir, m, V
+from ch2.config.profile.default import default
+from ch2.names import N, Units
+from ch2.pipeline.calculate import ActivityCalculator
+from ch2.sql import ActivityJournal, ActivityGroup, ActivityTopicJournal, ActivityTopic, FileHash, \
+    StatisticJournalFloat, StatisticJournalText
+from ch2.sql.database import query_count
+from ch2.web.servlets.search import expand_activities
+from tests import LogTestCase
+
+
+class TestSearch(LogTestCase):
+
+    def test_expand_chunks(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            with data.db.session_context() as s:
+                bike = ActivityGroup.from_name(s, 'bike')
+                start = dt.datetime(2020, 1, 1, 12, tzinfo=dt.timezone.utc)
+                ids = []
+                for i in range(5):
+                    time = start + dt.timedelta(days=i)
+                    file_hash = FileHash.get_or_add(s, f'hash-{i}')
+                    ajournal = ActivityJournal(file_hash=file_hash, activity_group=bike, start=time,
+                                               finish=time + dt.timedelta(hours=1))
+                    s.add(ajournal)
+                    tjournal = ActivityTopicJournal.get_or_add(s, file_hash, bike)
+                    if i % 2: StatisticJournalText.add(s, N.NAME, None, None, ActivityTopic, tjournal,
+                                                       f'ride {i}', time)
+                    StatisticJournalFloat.add(s, N.ACTIVE_TIME, Units.S, None, ActivityCalculator, ajournal,
+                                              3600.0 + i, time)
+                    if i != 2: StatisticJournalFloat.add(s, N.ACTIVE_DISTANCE, Units.KM, None, ActivityCalculator,
+                                                         ajournal, 20.0 + i, time)
+                    s.flush()
+                    ids.append(ajournal.id)
+                s.commit()
+            ids = list(reversed(ids))
+            with data.db.session_context() as s:
+                before = query_count()
+                whole = expand_activities(s, ids)
+                whole_queries = query_count() - before
+            with data.db.session_context() as s:
+                before = query_count()
+                chunked = expand_activities(s, ids, chunk=2)
+                chunked_queries = query_count() - before
+            self.assertEqual(chunked, whole)
+            self.assertEqual([result['db'] for result in whole], list(reversed(ids)))
+            self.assertEqual(whole[1]['name']['value'], 'ride 1')
+            self.assertIsNone(whole[2]['distance'])
+            self.assertEqual(whole[4]['time']['value'], 3604.0)
+            self.assertEqual(whole_queries, 3)
+            self.assertEqual(chunked_queries, 3 * 3)  # 5 ids in chunks of 2
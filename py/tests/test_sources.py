@@ -7,6 +7,8 @@ from sqlalchemy.sql.functions import count
 
 from ch2.commands.args import m, V, bootstrap_dir
 from ch2.config.profile.acooke import acooke
+from ch2.diary.database import interval_column
+from ch2.diary.model import VALUE, LABEL
 from ch2.lib.date import to_date
 from ch2.sql.tables.source import Source, Interval
 from ch2.sql.tables.statistic import StatisticJournalText, StatisticJournal, StatisticJournalFloat, StatisticName, \
@@ -93,6 +95,24 @@ class TestSources(LogTestCase):
                 month = s.query(Interval).filter(Interval.schedule == 'm').first()
                 self.assertEqual(month.start, to_date('2018-09-01'), month.start)
                 self.assertEqual(month.finish, to_date('2018-10-01'), month.finish)
+                column = list(interval_column(s, month, 'weight', SummaryCalculator))
+                self.assertEqual(column[0][VALUE], 'Weight')
+                self.assertEqual({entry[LABEL]: entry[VALUE] for entry in column[1:]}['Avg'], 64.5)
+
+            with data.db.session_context() as s:
+
+                # bulk update the diary entry (as from the web editor)
+
+                journal = DiaryTopicJournal.get_or_add(s, '2018-09-29')
+                cache = journal.cache(s)
+                diary = s.query(DiaryTopic).filter(DiaryTopic.title == 'Status').one()
+                notes, weight = [cache[field] for field in diary.fields[:2]]
+                self.assertFalse(data.sys.get_dirty_intervals())
+                saved = StatisticJournal.set_values(s, {weight.id: '65', notes.id: 'goodbye', -1: 1.0})
+                self.assertEqual(saved, {weight.id, notes.id})
+                self.assertEqual(weight.value, 65)
+                self.assertEqual(notes.value, 'goodbye')
+                self.assertTrue(data.sys.get_dirty_intervals())
 
             with data.db.session_context() as s:
 
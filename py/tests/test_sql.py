@@ -39,3 +39,24 @@ class TestName(LogTestCase):
         self.assertEqual(simple_name('****'), SPACE)
         self.assertEqual(simple_name('123'), '-123')
         self.assertEqual(simple_name('Fitness 7d'), 'fitness-7d')
+
+
+class TestPartition(LogTestCase):
+
+    def test_ddl(self):
+        from sqlalchemy.dialects import postgresql
+        import ch2.sql.database  # all tables
+        from ch2.sql.partition import partitioned_schema_ddl
+        ddl = list(partitioned_schema_ddl(postgresql.dialect(), 2019, 2020))
+        self.assertTrue(ddl[0].endswith('PARTITION BY RANGE (time)'))
+        from ch2.sql import StatisticJournal
+        for column in StatisticJournal.__table__.columns:
+            self.assertIn(f'\n    {column.name} ', ddl[0])
+        self.assertIn('PRIMARY KEY (id, time)', ddl[0])
+        self.assertIn('UNIQUE (statistic_name_id, time, source_id)', ddl[0])
+        self.assertIn('UNIQUE (serial, source_id, statistic_name_id, time)', ddl[0])  # widened
+        self.assertIn('REFERENCES source (id) ON DELETE cascade', ddl[0])
+        self.assertEqual(len([statement for statement in ddl if 'PARTITION OF statistic_journal' in statement]), 3)
+        value = [statement for statement in ddl if statement.startswith('CREATE TABLE statistic_journal_float')][0]
+        self.assertNotIn('REFERENCES statistic_journal', value)
+        self.assertIn('DELETE FROM statistic_journal_float WHERE id = OLD.id', ddl[-2])
@@ -0,0 +1,44 @@
+
+import sys
+from logging import getLogger
+from os.path import dirname
+from subprocess import run
+
+from ch2.commands.args import HELP, CONSTANTS, CALCULATE, UNLOCK, DATABASE, READ, WEB
+from tests import LogTestCase
+
+log = getLogger(__name__)
+
+HEAVY = ('pandas', 'bokeh', 'matplotlib', 'scipy', 'sklearn')
+
+# run in a separate process so that nothing is already imported
+STARTUP = '''
+import sys
+from time import time
+start = time()
+import ch2
+ch2.COMMANDS[%r]
+print(time() - start, ' '.join(name for name in %r if name in sys.modules))
+'''
+
+
+class TestStartup(LogTestCase):
+
+    def startup(self, command):
+        result = run([sys.executable, '-c', STARTUP % (command, HEAVY)], cwd=dirname(dirname(__file__)),
+                     capture_output=True, text=True, check=True)
+        elapsed, *heavy = result.stdout.split()
+        log.info(f'Startup for {command}: {float(elapsed):.2f}s (loaded {", ".join(heavy) or "nothing heavy"})')
+        return float(elapsed), heavy
+
+    def test_light_commands(self):
+        for command in (HELP, CONSTANTS, CALCULATE, UNLOCK):
+            elapsed, heavy = self.startup(command)
+            self.assertEqual(heavy, [], command)
+
+    def test_benchmark(self):
+        # timings are logged so that regressions are visible; only the import of plotting is checked
+        for command in (DATABASE, READ, WEB):
+            elapsed, heavy = self.startup(command)
+            if command != WEB:
+                self.assertFalse('bokeh' in heavy, command)
@@ -0,0 +1,45 @@
+
+import numpy as np
+import pandas as pd
+
+from ch2.commands.thumbnail import normalize, fig_from_df, simplify, svg_from_df
+from ch2.names import Names
+from tests import LogTestCase
+
+
+class TestThumbnail(LogTestCase):
+
+    def test_normalize(self):
+        xs, ys, side = normalize(np.array([0.0, 4.0, 2.0]), np.array([10.0, 11.0, 12.0]))
+        self.assertEqual(side, 4)
+        self.assertEqual(list(xs), [-0.5, 0.5, 0.0])
+        self.assertEqual(list(ys), [-0.25, 0.0, 0.25])
+
+    def test_figure(self):
+        from matplotlib import use
+        from matplotlib.pyplot import close
+        use('agg')
+        df = pd.DataFrame({Names.SPHERICAL_MERCATOR_X: [0.0, 100.0, np.nan, 200.0],
+                           Names.SPHERICAL_MERCATOR_Y: [0.0, 50.0, 10.0, 0.0]})
+        for data in (df, df.iloc[:0]):
+            close(fig_from_df(data))
+
+    def test_simplify(self):
+        # a dense sampling of a path with four vertices
+        xs = np.linspace(0, 10, 101)
+        ys = np.interp(xs, [0, 3, 7, 10], [0, 1, -2, 0])
+        sx, sy = simplify(xs, ys, 4)
+        self.assertTrue(np.allclose(sx, [0, 3, 7, 10]))
+        self.assertTrue(np.allclose(sy, [0, 1, -2, 0]))
+        sx, sy = simplify(xs, ys, 3)
+        self.assertTrue(np.allclose(sx, [0, 7, 10]))
+        sx, sy = simplify(xs, ys, 1000)
+        self.assertEqual(len(sx), 101)
+
+    def test_svg(self):
+        df = pd.DataFrame({Names.SPHERICAL_MERCATOR_X: np.linspace(0, 5000, 1000),
+                           Names.SPHERICAL_MERCATOR_Y: np.sin(np.linspace(0, 10, 1000)) * 1000})
+        svg = svg_from_df(df, budget=50)
+        self.assertTrue(svg.startswith('<svg'))
+        self.assertEqual(len(svg.split('polyline points="')[1].split('"')[0].split()), 50)
+        self.assertTrue(svg_from_df(df.iloc[:0]).startswith('<svg'))
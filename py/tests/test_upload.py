@@ -0,0 +1,107 @@
+
+from os import stat, utime
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import sleep, time
+from unittest.mock import patch
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from ch2.commands.args import bootstrap_dir, m, V, READ, ACTIVITIES, CALCULATE, PERMANENT, base_system_path
+from ch2.commands.read import update, hash_file, parse_fit_data, build_path, write_file, DATA, NAME, MONITOR, \
+    WRITE_PATH
+from ch2.config.profile.default import default
+from ch2.lib.io import modified_file_scans
+from ch2.pipeline.read.activity import ActivityReader
+from ch2.pipeline.display.activity.utils import active_days, active_months, activity_times_by_group
+from ch2.pipeline.pipeline import run_pipeline
+from ch2.sql import ActivityJournal, FileScan, ActivityDate, MonitorJournal, PipelineType
+from ch2.web.servlets.upload import Upload
+from tests import LogTestCase
+
+FILES = ('data/test/source/personal/2018-03-04-qdp.fit', 'data/test/source/personal/2018-08-27-rec.fit')
+MONITOR_FILE = 'data/test/source/personal/25822184777.fit'
+
+
+class TestUpload(LogTestCase):
+
+    def upload(self, upload, data, path):
+        with open(path, 'rb') as input:
+            builder = EnvironBuilder(method='POST', data={'files': FileStorage(input, filename=path)})
+            upload(Request(builder.get_environ()), None)
+        for _ in range(3000):
+            if data.sys.get_percent(READ) is None: return
+            sleep(0.1)
+        raise Exception('Read did not finish')
+
+    def test_upload(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            upload = Upload(data)
+            for i, path in enumerate(FILES):
+                self.upload(upload, data, path)
+                with data.db.session_context() as s:
+                    self.assertEqual(s.query(ActivityJournal).count(), i + 1)
+                    self.assertEqual(s.query(ActivityDate).count(), i + 1)
+                    for file_scan in s.query(FileScan).all():
+                        # nothing to do on a rescan
+                        self.assertEqual(modified_file_scans(s, [file_scan.path], file_scan.owner), [])
+            with data.db.session_context() as s:
+                self.assertEqual(active_days(s, '2018-03'), ['2018-03-04'])
+                self.assertEqual(sorted(active_months(s, '2018')), ['2018-03', '2018-08'])
+                self.assertEqual(len(activity_times_by_group(s)['bike']), 2)
+
+    def test_preserved_mtime(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            path = join(f, 'data.fit')
+            with open(path, 'w') as output: output.write('original')
+            mtime = stat(path).st_mtime
+            with data.db.session_context() as s:
+                file_scans = modified_file_scans(s, [path], ActivityReader)
+                self.assertEqual(len(file_scans), 1)
+                file_scans[0].last_scan = time()
+                s.commit()
+                self.assertEqual(modified_file_scans(s, [path], ActivityReader), [])
+                # as after cp -p or rsync -t
+                with open(path, 'w') as output: output.write('changed')
+                utime(path, (mtime, mtime))
+                self.assertEqual(len(modified_file_scans(s, [path], ActivityReader)), 1)
+
+    def test_garmin(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            flags = {ACTIVITIES: False, MONITOR: True, CALCULATE: False}
+            downloaded = []
+
+            def download(sys, s, base=None, progress=None):
+                # as GarminConnect.get_monitoring_to_fit_file
+                with open(MONITOR_FILE, 'rb') as input:
+                    file = {DATA: input.read(), NAME: MONITOR_FILE}
+                hash_file(file)
+                parse_fit_data(file)
+                build_path(base_system_path(base, version=PERMANENT), file)
+                write_file(file)
+                downloaded.append(file[WRITE_PATH])
+                return [file]
+
+            def monitor_paths(spy):
+                return [call[1].get('paths') for call in spy.call_args_list if call[0][1] == PipelineType.READ_MONITOR]
+
+            with patch('ch2.commands.read.run_garmin', side_effect=download), \
+                    patch('ch2.commands.read.run_pipeline', wraps=run_pipeline) as spy:
+                update(data, None, flags=flags, n_cpu=1)
+                # the second pass reads only the downloaded file
+                paths = monitor_paths(spy)
+                self.assertEqual(len(paths), 2)
+                self.assertEqual(paths[0], None)
+                self.assertEqual(paths[1], downloaded)
+            with data.db.session_context() as s:
+                self.assertEqual(s.query(MonitorJournal).count(), 1)
+            with patch('ch2.commands.read.run_garmin', return_value=[]), \
+                    patch('ch2.commands.read.run_pipeline', wraps=run_pipeline) as spy:
+                update(data, None, flags=flags, n_cpu=1)
+                # nothing downloaded so no second pass
+                self.assertEqual(monitor_paths(spy), [None])
@@ -0,0 +1,127 @@
+
+import datetime as dt
+from contextlib import contextmanager
+from json import dumps, loads
+from sqlite3 import connect
+from tempfile import TemporaryDirectory
+from threading import Thread, Barrier
+from unittest.mock import patch
+from urllib.request import urlopen
+
+from sqlalchemy.exc import OperationalError
+
+from ch2.commands.args import bootstrap_dir, m, V, DB_VERSION
+from ch2.config.profile.default import default
+from ch2.sql import SystemConstant, StatisticName, DiaryTopicJournal, ActivityJournal, ActivityGroup, FileHash, \
+    ActivityTopicJournal
+from ch2.sql.database import SessionPool
+from ch2.sql.utils import add_or_read
+from ch2.web.load import load_test
+from ch2.web.server import WebServer, PooledWSGIServer
+from tests import LogTestCase
+
+
+class TestWebLoad(LogTestCase):
+
+    def test_pooled(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            data.sys.set_constant(SystemConstant.DB_VERSION, DB_VERSION, force=True)
+            server = PooledWSGIServer('localhost', 0, WebServer(data, None, None, sessions=4), threads=4)
+            Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                url = f'http://localhost:{server.server_port}'
+                for path in ('/api/diary/2020-01-01', '/api/search/activity/ActivityJournal.start%20%3E%202020'):
+                    result = load_test(url, path, concurrency=4, requests=20)
+                    self.assertEqual(result.errors, 0, path)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    def test_first_requests(self):
+        with TemporaryDirectory() as f:
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            date = dt.date(2020, 1, 1)
+            with data.db.session_context() as s1, data.db.session_context() as s2:
+                q = s2.query(DiaryTopicJournal).filter(DiaryTopicJournal.date == date)
+                self.assertIsNone(q.one_or_none())
+                journal = DiaryTopicJournal.get_or_add(s1, date)
+                s1.commit()
+                # s2 missed the journal, so tries to add it too
+                self.assertEqual(add_or_read(s2, DiaryTopicJournal(date=date), q).id, journal.id)
+                s2.commit()
+            # concurrent first requests for a date (as from the pooled server) all add the journal
+            errors, threads = [], 8
+            for day in range(2, 6):
+                date, barrier = dt.date(2020, 1, day), Barrier(threads)
+
+                def read():
+                    try:
+                        with data.db.session_context() as s:
+                            barrier.wait()
+                            DiaryTopicJournal.get_or_add(s, date)
+                            s.commit()
+                    except Exception as e:
+                        errors.append(e)
+
+                readers = [Thread(target=read) for _ in range(threads)]
+                for reader in readers: reader.start()
+                for reader in readers: reader.join()
+            self.assertEqual(errors, [])
+            with data.db.session_context() as s:
+                self.assertEqual(s.query(DiaryTopicJournal).count(), 5)
+
+    def test_snapshot(self):
+        with TemporaryDirectory() as f, patch('ch2.sql.database.BUSY_TIMEOUT', 100):
+            args, data = bootstrap_dir(f, m(V), '5', configurator=default)
+            data.sys.set_constant(SystemConstant.DB_VERSION, DB_VERSION, force=True)
+            with data.db.session_context() as s:
+                # without any activities the diary redirects to the upload page
+                start = dt.datetime(2019, 1, 1, 12, tzinfo=dt.timezone.utc)
+                s.add(ActivityJournal(file_hash=FileHash.get_or_add(s, 'hash'), start=start,
+                                      finish=start + dt.timedelta(hours=1),
+                                      activity_group=ActivityGroup.from_name(s, 'bike')))
+            pool = SessionPool(data.db, 1, read_only=True)
+            with self.assertRaises(OperationalError):
+                with pool.snapshot_context() as s:
+                    s.query(StatisticName).delete()
+            pool.close()
+            path = '/api/diary/2020-01-01'  # never displayed, so normally adds diary entries
+            writer = connect(data.db.uri.split(':///')[1])
+            try:
+                writer.execute('BEGIN IMMEDIATE')  # as when loading data
+                with serve(data, snapshot=False) as url:
+                    # the diary cannot be written so is dropped (after the busy timeout)
+                    self.assertNotIn('"label": "Weight"', dumps(read_json(url + path)['data']))
+                with serve(data, snapshot=True) as url:
+                    self.assertEqual(load_test(url, path, concurrency=4, requests=20).errors, 0)
+                    self.assertIn('"label": "Weight"', dumps(read_json(url + path)['data']))
+                    # activity topics are not saved either
+                    self.assertIn('"label": "Route"', dumps(read_json(url + '/api/diary/2019-01-01')['data']))
+            finally:
+                writer.rollback()
+                writer.close()
+            with data.db.session_context() as s:
+                self.assertEqual(s.query(DiaryTopicJournal).count(), 0)
+                self.assertEqual(s.query(ActivityTopicJournal).count(), 0)
+            with serve(data, snapshot=True) as url:
+                self.assertIn('"label": "Weight"', dumps(read_json(url + path)['data']))
+            with data.db.session_context() as s:
+                self.assertEqual(s.query(DiaryTopicJournal).count(), 1)
+
+
+def read_json(url):
+    with urlopen(url) as response:
+        return loads(response.read())
+
+
+@contextmanager
+def serve(data, snapshot):
+    server = PooledWSGIServer('localhost', 0, WebServer(data, None, None, sessions=4, snapshot=snapshot),
+                              threads=4)
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f'http://localhost:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()